@@ -17,6 +17,7 @@ import time
 import traceback
 import os
 from dateutil.parser import parse
+from threading import Lock
 
 if sys.version_info < (3, 6):
     print("CRITICAL - radiosonde_auto_rx requires Python 3.6 or newer!")
@@ -24,8 +25,12 @@ if sys.version_info < (3, 6):
 
 import autorx
 from autorx.scan import SondeScanner
+from autorx.sdr_server import SDRServer
+from autorx.telemetry_bus import TelemetryBus
 from autorx.decode import SondeDecoder, VALID_SONDE_TYPES, DRIFTY_SONDE_TYPES
 from autorx.logger import TelemetryLogger
+from autorx.log_archive import LogArchiver
+from autorx.log_files import start_log_catalog_backfill
 from autorx.email_notification import EmailNotification
 from autorx.habitat import HabitatUploader
 from autorx.aprs import APRSUploader
@@ -80,7 +85,10 @@ exporter_objects = (
 )  # This list will hold references to each exporter instance that is created.
 exporter_functions = (
     []
-)  # This list will hold references to the exporter add functions, which will be passed onto the decoders.
+)  # This list holds the telemetry bus publish function, which will be passed onto the decoders.
+
+# Telemetry Bus, which passes telemetry from the decoders onto each exporter.
+telemetry_bus = None
 
 # Separate reference to the e-mail exporter, as we may want to use this for error notifications.
 email_exporter = None
@@ -88,41 +96,92 @@ email_exporter = None
 # GPSDAdaptor Instance, if used.
 gpsd_adaptor = None
 
+# Log Archiver
+log_archiver = None
+
 # Temporary frequency block list
 # This contains frequncies that should be blocked for a short amount of time.
 temporary_block_list = {}
 
+# Lock on SDR allocation, as SDRs may be borrowed by the scanner thread for parallel detection.
+sdr_allocation_lock = Lock()
 
-def allocate_sdr(check_only=False, task_description=""):
+
+def allocate_sdr(check_only=False, task_description="", reserve=0):
     """Allocate an un-used SDR for a task.
 
     Args:
         check_only (bool) : If True, don't set the free SDR as in-use. Used to check if there are any free SDRs.
+        reserve (int): Only allocate a SDR if this many SDRs would still be free afterwards.
 
     Returns:
         (str): The device index/serial number of the free/allocated SDR, if one is free, else None.
     """
 
-    for _idx in sorted(autorx.sdr_list.keys()):
-        if autorx.sdr_list[_idx]["in_use"] == False:
-            # Found a free SDR!
-            if check_only:
-                # If we are just checking to see if there are any SDRs free, we don't allocate it.
-                pass
-            else:
-                # Otherwise, set the SDR as in-use.
-                autorx.sdr_list[_idx]["in_use"] = True
-                logging.info(
-                    "Task Manager - SDR #%s has been allocated to %s."
-                    % (str(_idx), task_description)
-                )
+    with sdr_allocation_lock:
+        _free = [_idx for _idx in autorx.sdr_list if autorx.sdr_list[_idx]["in_use"] == False]
+        if len(_free) <= reserve:
+            return None
 
-            return _idx
+        for _idx in sorted(autorx.sdr_list.keys()):
+            if autorx.sdr_list[_idx]["in_use"] == False:
+                # Found a free SDR!
+                if check_only:
+                    # If we are just checking to see if there are any SDRs free, we don't allocate it.
+                    pass
+                else:
+                    # Otherwise, set the SDR as in-use.
+                    autorx.sdr_list[_idx]["in_use"] = True
+                    logging.info(
+                        "Task Manager - SDR #%s has been allocated to %s."
+                        % (str(_idx), task_description)
+                    )
+
+                return _idx
 
     # Otherwise, no SDRs are free.
     return None
 
 
+def allocate_detection_sdr():
+    """Allocate an un-used SDR to the scanner, for running detection on multiple peaks in parallel.
+
+    One SDR is always left free, so a decoder can be started as soon as a sonde is detected, without having to
+    stop the scanner (and wait for its detections to finish) to free up a SDR.
+
+    Returns:
+        (dict): The device_idx, ppm, gain and bias settings of the allocated SDR, if one is free, else None.
+    """
+    _device_idx = allocate_sdr(task_description="Scanner (Detection)", reserve=1)
+
+    if _device_idx is None:
+        return None
+
+    return {
+        "device_idx": _device_idx,
+        "ppm": autorx.sdr_list[_device_idx]["ppm"],
+        "gain": autorx.sdr_list[_device_idx]["gain"],
+        "bias": autorx.sdr_list[_device_idx]["bias"],
+        "sdr_server": autorx.sdr_list[_device_idx].get("server"),
+    }
+
+
+def release_detection_sdr(device_idx):
+    """Release a SDR that was allocated to the scanner for parallel detection.
+
+    Args:
+        device_idx (str): The device index/serial number of the SDR to release.
+    """
+    with sdr_allocation_lock:
+        # The SDR may have been removed from the SDR list in the meantime.
+        if device_idx in autorx.sdr_list:
+            autorx.sdr_list[device_idx]["in_use"] = False
+            logging.info(
+                "Task Manager - SDR #%s has been released by Scanner (Detection)."
+                % str(device_idx)
+            )
+
+
 def start_scanner():
     """Start a scanner thread on the first available SDR"""
     global config, RS_PATH, temporary_block_list
@@ -164,6 +223,7 @@ def start_scanner():
             rs_path=RS_PATH,
             sdr_power=config["sdr_power"],
             sdr_fm=config["sdr_fm"],
+            sdr_rx=config["sdr_rx"],
             device_idx=_device_idx,
             gain=autorx.sdr_list[_device_idx]["gain"],
             ppm=autorx.sdr_list[_device_idx]["ppm"],
@@ -171,6 +231,12 @@ def start_scanner():
             save_detection_audio=config["save_detection_audio"],
             temporary_block_list=temporary_block_list,
             temporary_block_time=config["temporary_block_time"],
+            detect_sdr_allocate=allocate_detection_sdr
+            if config["parallel_detection"]
+            else None,
+            detect_sdr_release=release_detection_sdr,
+            wideband_detection=config["wideband_detection"],
+            sdr_server=autorx.sdr_list[_device_idx].get("server"),
         )
 
         # Add a reference into the sdr_list entry
@@ -214,6 +280,14 @@ def start_decoder(freq, sonde_type):
         task_description="Decoder (%s, %.3f MHz)" % (sonde_type, freq / 1e6)
     )
 
+    if (_device_idx is None) and ("SCAN" in autorx.task_list):
+        # The free SDR may have been borrowed by the scanner for detection in the meantime.
+        # Stop the scanner (which returns any borrowed SDRs) and try again.
+        stop_scanner()
+        _device_idx = allocate_sdr(
+            task_description="Decoder (%s, %.3f MHz)" % (sonde_type, freq / 1e6)
+        )
+
     if _device_idx is None:
         logging.error("Could not allocate SDR for decoder!")
         return
@@ -247,7 +321,8 @@ def start_decoder(freq, sonde_type):
             rs92_ephemeris=rs92_ephemeris,
             rs41_drift_tweak=config["rs41_drift_tweak"],
             experimental_decoder=config["experimental_decoders"][_exp_sonde_type],
-            save_raw_hex=config["save_raw_hex"]
+            save_raw_hex=config["save_raw_hex"],
+            sdr_server=autorx.sdr_list[_device_idx].get("server"),
         )
         autorx.sdr_list[_device_idx]["task"] = autorx.task_list[freq]["task"]
 
@@ -444,6 +519,51 @@ def clean_task_list():
         start_scanner()
 
 
+def start_sdr_servers():
+    """Start a persistent SDR Server on each SDR, for use by the scanner and decoders."""
+    global config
+
+    for _n, _idx in enumerate(sorted(autorx.sdr_list.keys())):
+        _server = SDRServer(
+            device_idx=_idx,
+            port=config["sdr_server_base_port"] + _n,
+            rtl_tcp=config["sdr_tcp_path"],
+            ppm=autorx.sdr_list[_idx]["ppm"],
+            gain=autorx.sdr_list[_idx]["gain"],
+            bias=autorx.sdr_list[_idx]["bias"],
+        )
+        _server.start()
+        autorx.sdr_list[_idx]["server"] = _server
+        logging.info(
+            "Task Manager - Started SDR Server for SDR #%s on port %d."
+            % (str(_idx), _server.port)
+        )
+
+
+def stop_sdr_servers():
+    """Stop any running SDR Servers."""
+    for _idx in autorx.sdr_list.keys():
+        _server = autorx.sdr_list[_idx].get("server")
+        if _server is not None:
+            try:
+                _server.stop()
+            except Exception as e:
+                logging.error("Error stopping SDR Server - %s" % str(e))
+
+
+def add_exporter(exporter, name):
+    """Add an exporter to the telemetry bus.
+
+    Args:
+        exporter (object): An exporter object, with an add function and an input_queue.
+        name (str): Exporter name, used in logging and metrics.
+    """
+    global exporter_objects, telemetry_bus
+
+    exporter_objects.append(exporter)
+    telemetry_bus.subscribe(name, exporter.add, backlog=exporter.input_queue.qsize)
+
+
 def stop_all():
     """Shut-down all decoders, scanners, and exporters."""
     global exporter_objects
@@ -454,15 +574,23 @@ def stop_all():
         except Exception as e:
             logging.error("Error stopping task - %s" % str(e))
 
+    if telemetry_bus is not None:
+        telemetry_bus.close()
+
     for _exporter in exporter_objects:
         try:
             _exporter.close()
         except Exception as e:
             logging.error("Error stopping exporter - %s" % str(e))
 
+    stop_sdr_servers()
+
     if gpsd_adaptor != None:
         gpsd_adaptor.close()
 
+    if log_archiver != None:
+        log_archiver.close()
+
 
 def telemetry_filter(telemetry):
     """Filter incoming radiosonde telemetry based on various factors,
@@ -648,7 +776,7 @@ def email_error(message="foo"):
 
 def main():
     """Main Loop"""
-    global config, exporter_objects, exporter_functions, logging_level, rs92_ephemeris, gpsd_adaptor, email_exporter
+    global config, exporter_objects, exporter_functions, logging_level, rs92_ephemeris, gpsd_adaptor, email_exporter, telemetry_bus, log_archiver
 
     # Command line arguments.
     parser = argparse.ArgumentParser()
@@ -778,6 +906,10 @@ def main():
     if not check_rs_utils():
         sys.exit(1)
 
+    # Start up persistent SDR Servers, if enabled.
+    if config["sdr_server"]:
+        start_sdr_servers()
+
     # If a sonde type has been provided, insert an entry into the scan results,
     # and immediately start a decoder. This also sets the decoder time to 0, which
     # allows it to run indefinitely.
@@ -794,19 +926,48 @@ def main():
 
     # Start up the flask server.
     # This needs to occur AFTER logging is setup, else logging breaks horribly for some reason.
-    start_flask(host=config["web_host"], port=config["web_port"])
+    start_flask(
+        host=config["web_host"],
+        port=config["web_port"],
+        refresh_rate=config["web_client_refresh_rate"],
+    )
 
     # If we have been supplied a frequency via the command line, override the only_scan list settings
     # to only include the supplied frequency.
     if args.frequency != 0.0:
         config["only_scan"] = [args.frequency]
 
+    # Start up the telemetry bus, which passes telemetry from the decoders to each exporter.
+    telemetry_bus = TelemetryBus(
+        max_size=config["exporter_queue_size"],
+        policy=config["exporter_overflow_policy"],
+    )
+    autorx.telemetry_bus = telemetry_bus
+    exporter_functions.append(telemetry_bus.publish)
+
     # Start our exporter options
     # Telemetry Logger
     if config["per_sonde_log"]:
-        _logger = TelemetryLogger(log_directory=logging_path)
-        exporter_objects.append(_logger)
-        exporter_functions.append(_logger.add)
+        _logger = TelemetryLogger(
+            log_directory=logging_path,
+            flush_interval=config["log_flush_interval"],
+            flush_size=config["log_flush_size"],
+            coverage_map=config["coverage_map"],
+            journal=config["log_journal"],
+        )
+        add_exporter(_logger, "TelemetryLogger")
+
+    # Log Archiver - compress and bundle old log files.
+    if (config["log_compress_days"] > 0) or (config["log_bundle_days"] > 0):
+        log_archiver = LogArchiver(
+            log_directory=logging_path,
+            compress_days=config["log_compress_days"],
+            compression=config["log_compression"],
+            bundle_days=config["log_bundle_days"],
+        )
+
+    # Summarise any log files which have not been summarised yet, so they are ready for log queries.
+    start_log_catalog_backfill()
 
     if config["email_enabled"]:
 
@@ -831,8 +992,7 @@ def main():
         )
         email_exporter = _email_notification
 
-        exporter_objects.append(_email_notification)
-        exporter_functions.append(_email_notification.add)
+        add_exporter(_email_notification, "EmailNotification")
 
     # Habitat Uploader - DEPRECATED - Sondehub DB now in use (>1.5.0)
     # if config["habitat_enabled"]:
@@ -889,8 +1049,7 @@ def main():
             station_beacon_icon=config["station_beacon_icon"],
         )
 
-        exporter_objects.append(_aprs)
-        exporter_functions.append(_aprs.add)
+        add_exporter(_aprs, "APRSUploader")
 
     # OziExplorer
     if config["ozi_enabled"] or config["payload_summary_enabled"]:
@@ -911,8 +1070,7 @@ def main():
             station=config["habitat_uploader_callsign"],
         )
 
-        exporter_objects.append(_ozimux)
-        exporter_functions.append(_ozimux.add)
+        add_exporter(_ozimux, "OziUploader")
 
     # Rotator
     if config["rotator_enabled"]:
@@ -934,8 +1092,7 @@ def main():
             ],
         )
 
-        exporter_objects.append(_rotator)
-        exporter_functions.append(_rotator.add)
+        add_exporter(_rotator, "Rotator")
 
     # Sondehub v2 Database
     if config["sondehub_enabled"]:
@@ -956,12 +1113,10 @@ def main():
             upload_rate=config["sondehub_upload_rate"],
         )
 
-        exporter_objects.append(_sondehub)
-        exporter_functions.append(_sondehub.add)
+        add_exporter(_sondehub, "SondehubUploader")
 
     _web_exporter = WebExporter(max_age=config["web_archive_age"])
-    exporter_objects.append(_web_exporter)
-    exporter_functions.append(_web_exporter.add)
+    add_exporter(_web_exporter, "WebExporter")
 
     # GPSD Startup
     if config["gpsd_enabled"]:
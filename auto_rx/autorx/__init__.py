@@ -50,5 +50,8 @@ scan_results = Queue()
 # Global scan inhibit flag, used by web interface.
 scan_inhibit = False
 
+# Telemetry Bus, which passes telemetry from the decoders to the exporters. Set on startup.
+telemetry_bus = None
+
 # Logging Directory
 logging_path = "./log/"
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+#
+#   radiosonde_auto_rx - Batch Log Processing
+#
+#   Copyright (C) 2021  Mark Jessop <vk5qi@rfhead.net>
+#   Released under GNU GPL v3 or later
+#
+#   Runs per-flight analysis (reading, decimation, geometry, plotting, KML generation, etc) over a set of
+#   log files using a pool of worker processes, passing results back as they complete so they can be
+#   aggregated. Progress can be recorded in a status file, so an interrupted run can be resumed.
+#
+#   Status file format (JSON), compatible with the utils/plot_sonde_log.py plot_status.txt file:
+#       {"<log file name>": {"complete": true}, ...}
+#
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+
+def read_batch_status(filename):
+    """ Read in a batch status file. Returns an empty status if the file does not exist. """
+    if not os.path.isfile(filename):
+        return {}
+
+    with open(filename, "r") as _f:
+        return json.loads(_f.read())
+
+
+def write_batch_status(filename, status):
+    """ Write out a batch status file. The file is replaced atomically, so it is never left half-written. """
+    _dir = os.path.dirname(os.path.abspath(filename))
+    _fd, _temp_filename = tempfile.mkstemp(dir=_dir, suffix=".tmp")
+    try:
+        with os.fdopen(_fd, "w") as _f:
+            _f.write(json.dumps(status))
+        os.chmod(_temp_filename, 0o644)
+        os.replace(_temp_filename, filename)
+    except Exception:
+        os.unlink(_temp_filename)
+        raise
+
+
+def batch_process(
+    function,
+    filenames,
+    args=(),
+    workers=None,
+    status_file=None,
+    progress_interval=10.0,
+    status_interval=5.0,
+):
+    """ Run a function over a set of log files, using a pool of worker processes.
+
+    Results are produced as each file is processed (in completion order, not the order provided).
+    Only a few files per worker are queued at any time, so memory usage does not grow with the number of files.
+
+    Args:
+        function (function): Called as function(filename, *args) in a worker process. Must be a module-level
+            function, and return a picklable result. If the result is a dict with a 'complete' field, this is
+            recorded in the status file (else the file is considered complete once processed).
+        filenames (list): Log files to process.
+        args (tuple): Additional arguments to pass to function.
+        workers (int): Number of worker processes. Defaults to the number of CPUs.
+        status_file (str): If provided, files marked as complete in this file are skipped, and the status file is
+            updated as files are processed.
+        progress_interval (float): Log progress every X seconds.
+        status_interval (float): Write out the status file at most every X seconds.
+
+    Returns:
+        generator: Produces (filename, result) tuples. Files which could not be processed are not included.
+    """
+
+    if status_file:
+        _status = read_batch_status(status_file)
+    else:
+        _status = {}
+
+    _pending = []
+    for _file in filenames:
+        _basename = os.path.basename(_file)
+        if _status.get(_basename, {}).get("complete", False):
+            logging.debug("Batch - Already finished processing %s" % _basename)
+        else:
+            _pending.append(_file)
+
+    _total = len(_pending)
+    logging.info(
+        "Batch - Processing %d files (%d already complete)."
+        % (_total, len(filenames) - _total)
+    )
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    _start = time.time()
+    _last_progress = _start
+    _last_status = _start
+    _done = 0
+    _errors = 0
+
+    _executor = ProcessPoolExecutor(max_workers=workers)
+    _futures = {}
+    _files = iter(_pending)
+
+    def submit_next():
+        _file = next(_files, None)
+        if _file is not None:
+            _futures[_executor.submit(function, _file, *args)] = _file
+
+    try:
+        for _i in range(workers * 2):
+            submit_next()
+
+        while _futures:
+            (_completed, _) = wait(list(_futures.keys()), return_when=FIRST_COMPLETED)
+
+            for _future in _completed:
+                _file = _futures.pop(_future)
+                _basename = os.path.basename(_file)
+                submit_next()
+                _done += 1
+
+                try:
+                    _result = _future.result()
+                except Exception as e:
+                    _errors += 1
+                    logging.error("Batch - Error processing %s - %s" % (_basename, str(e)))
+                    # Leave this file as incomplete, so it is retried next time.
+                    _status[_basename] = {"complete": False}
+                    continue
+
+                if isinstance(_result, dict):
+                    _status[_basename] = {"complete": bool(_result.get("complete", True))}
+                else:
+                    _status[_basename] = {"complete": True}
+
+                yield (_file, _result)
+
+            _now = time.time()
+            if status_file and (_now > (_last_status + status_interval)):
+                write_batch_status(status_file, _status)
+                _last_status = _now
+
+            if _now > (_last_progress + progress_interval):
+                _rate = _done / (_now - _start)
+                logging.info(
+                    "Batch - Processed %d/%d files (%.1f%%), %.1f files/sec, %d seconds remaining."
+                    % (
+                        _done,
+                        _total,
+                        100.0 * _done / _total,
+                        _rate,
+                        (_total - _done) / _rate,
+                    )
+                )
+                _last_progress = _now
+
+    finally:
+        # Don't start any more work if we are stopping early.
+        for _future in _futures:
+            _future.cancel()
+        _executor.shutdown(wait=True)
+
+        if status_file:
+            write_batch_status(status_file, _status)
+
+    logging.info(
+        "Batch - Processed %d files in %.1f seconds (%d errors)."
+        % (_done, time.time() - _start, _errors)
+    )
@@ -59,6 +59,13 @@ def read_auto_rx_config(filename, no_sdr_test=False):
     auto_rx_config = {
         # Log Settings
         "per_sonde_log": True,
+        "log_flush_interval": 0,
+        "log_flush_size": 65536,
+        "coverage_map": True,
+        "log_compress_days": 0,
+        "log_compression": "gzip",
+        "log_bundle_days": 0,
+        "log_journal": False,
         # Email Settings
         "email_enabled": False,
         #'email_error_notifications': False,
@@ -122,6 +129,9 @@ def read_auto_rx_config(filename, no_sdr_test=False):
         "web_port": 5000,
         "web_archive_age": 120,
         "web_control": False,
+        "web_log_cache_size": 32,
+        "web_path_tolerance": 10.0,
+        "web_client_refresh_rate": 1.0,
         # "web_password": "none",  # Commented out to ensure warning message is shown
         #'kml_refresh_rate': 10,
         # Advanced Parameters
@@ -141,6 +151,14 @@ def read_auto_rx_config(filename, no_sdr_test=False):
         "rs41_drift_tweak": False,
         "decoder_stats": False,
         "ngp_tweak": False,
+        "parallel_detection": False,
+        "wideband_detection": False,
+        "sdr_rx": "rtl_sdr",
+        "sdr_server": False,
+        "sdr_server_base_port": 12340,
+        "sdr_tcp_path": "rtl_tcp",
+        "exporter_queue_size": 500,
+        "exporter_overflow_policy": "drop_oldest",
         # Rotator Settings
         "enable_rotator": False,
         "rotator_update_rate": 30,
@@ -187,6 +205,52 @@ def read_auto_rx_config(filename, no_sdr_test=False):
         # Log Settings
         auto_rx_config["per_sonde_log"] = config.getboolean("logging", "per_sonde_log")
 
+        try:
+            auto_rx_config["log_flush_interval"] = config.getfloat(
+                "logging", "log_flush_interval"
+            )
+            auto_rx_config["log_flush_size"] = config.getint("logging", "log_flush_size")
+        except:
+            logging.warning(
+                "Config - Did not find log flush settings, using defaults (flush every line)"
+            )
+            auto_rx_config["log_flush_interval"] = 0
+            auto_rx_config["log_flush_size"] = 65536
+
+        try:
+            auto_rx_config["log_journal"] = config.getboolean("logging", "log_journal")
+        except:
+            logging.warning(
+                "Config - Did not find log_journal setting, using default (disabled)"
+            )
+            auto_rx_config["log_journal"] = False
+
+        try:
+            auto_rx_config["coverage_map"] = config.getboolean("logging", "coverage_map")
+        except:
+            logging.warning(
+                "Config - Did not find coverage_map setting, using default (enabled)"
+            )
+            auto_rx_config["coverage_map"] = True
+
+        try:
+            auto_rx_config["log_compress_days"] = config.getfloat("logging", "log_compress_days")
+            auto_rx_config["log_compression"] = config.get("logging", "log_compression")
+            auto_rx_config["log_bundle_days"] = config.getfloat("logging", "log_bundle_days")
+        except:
+            logging.warning(
+                "Config - Did not find log archiving settings, using defaults (disabled)"
+            )
+            auto_rx_config["log_compress_days"] = 0
+            auto_rx_config["log_compression"] = "gzip"
+            auto_rx_config["log_bundle_days"] = 0
+
+        if auto_rx_config["log_compression"] not in ["gzip", "xz", "zstd"]:
+            logging.warning(
+                "Config - Unknown log_compression setting, using gzip."
+            )
+            auto_rx_config["log_compression"] = "gzip"
+
         # Email Settings
         if config.has_option("email", "email_enabled"):
             try:
@@ -417,6 +481,32 @@ def read_auto_rx_config(filename, no_sdr_test=False):
         auto_rx_config["web_port"] = config.getint("web", "web_port")
         auto_rx_config["web_archive_age"] = config.getint("web", "archive_age")
 
+        try:
+            auto_rx_config["web_log_cache_size"] = config.getint("web", "log_cache_size")
+        except:
+            logging.warning(
+                "Config - Did not find log_cache_size setting, using default (32 MB)"
+            )
+            auto_rx_config["web_log_cache_size"] = 32
+
+        try:
+            auto_rx_config["web_path_tolerance"] = config.getfloat("web", "path_tolerance")
+        except:
+            logging.warning(
+                "Config - Did not find path_tolerance setting, using default (10 metres)"
+            )
+            auto_rx_config["web_path_tolerance"] = 10.0
+
+        try:
+            auto_rx_config["web_client_refresh_rate"] = config.getfloat(
+                "web", "client_refresh_rate"
+            )
+        except:
+            logging.warning(
+                "Config - Did not find client_refresh_rate setting, using default (1 second)"
+            )
+            auto_rx_config["web_client_refresh_rate"] = 1.0
+
         auto_rx_config["save_detection_audio"] = config.getboolean(
             "debugging", "save_detection_audio"
         )
@@ -652,6 +742,68 @@ def read_auto_rx_config(filename, no_sdr_test=False):
             )
             auto_rx_config["experimental_decoders"]["MK2LMS"] = False
 
+        try:
+            auto_rx_config["parallel_detection"] = config.getboolean(
+                "advanced", "parallel_detection"
+            )
+        except:
+            logging.warning(
+                "Config - Did not find parallel_detection setting, using default (disabled)"
+            )
+            auto_rx_config["parallel_detection"] = False
+
+        try:
+            auto_rx_config["wideband_detection"] = config.getboolean(
+                "advanced", "wideband_detection"
+            )
+        except:
+            logging.warning(
+                "Config - Did not find wideband_detection setting, using default (disabled)"
+            )
+            auto_rx_config["wideband_detection"] = False
+
+        try:
+            auto_rx_config["sdr_rx"] = config.get("advanced", "sdr_rx_path")
+        except:
+            logging.warning(
+                "Config - Did not find sdr_rx_path setting, using default (rtl_sdr)"
+            )
+            auto_rx_config["sdr_rx"] = "rtl_sdr"
+
+        try:
+            auto_rx_config["sdr_server"] = config.getboolean("advanced", "sdr_server")
+            auto_rx_config["sdr_server_base_port"] = config.getint(
+                "advanced", "sdr_server_base_port"
+            )
+            auto_rx_config["sdr_tcp_path"] = config.get("advanced", "sdr_tcp_path")
+        except:
+            logging.warning(
+                "Config - Did not find sdr_server settings, using defaults (disabled)"
+            )
+            auto_rx_config["sdr_server"] = False
+            auto_rx_config["sdr_server_base_port"] = 12340
+            auto_rx_config["sdr_tcp_path"] = "rtl_tcp"
+
+        try:
+            auto_rx_config["exporter_queue_size"] = config.getint(
+                "advanced", "exporter_queue_size"
+            )
+            auto_rx_config["exporter_overflow_policy"] = config.get(
+                "advanced", "exporter_overflow_policy"
+            )
+        except:
+            logging.warning(
+                "Config - Did not find exporter queue settings, using defaults (500, drop_oldest)"
+            )
+            auto_rx_config["exporter_queue_size"] = 500
+            auto_rx_config["exporter_overflow_policy"] = "drop_oldest"
+
+        if auto_rx_config["exporter_overflow_policy"] not in ["drop_oldest", "coalesce"]:
+            logging.error(
+                "Config - Invalid exporter_overflow_policy (%s), using drop_oldest."
+                % auto_rx_config["exporter_overflow_policy"]
+            )
+            auto_rx_config["exporter_overflow_policy"] = "drop_oldest"
 
         # As of auto_rx version 1.5.10, we are limiting APRS output to only radiosondy.info,
         # and only on the non-forwarding port. 
@@ -0,0 +1,416 @@
+#!/usr/bin/env python
+#
+#   radiosonde_auto_rx - Station Coverage Map
+#
+#   Copyright (C) 2021  Mark Jessop <vk5qi@rfhead.net>
+#   Released under GNU GPL v3 or later
+#
+#   Accumulates received SNR into a 1-degree bearing/elevation grid (as seen from the station), so coverage
+#   and SNR maps can be produced without re-reading every log file. The accumulated sums, counts and maxima
+#   are saved alongside the log files, and are updated live by the TelemetryLogger as telemetry arrives.
+#
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+import autorx
+import autorx.config
+from autorx.batch import batch_process
+from autorx.log_archive import list_log_paths, log_name
+from autorx.log_files import read_log_columns
+from autorx.utils import position_info, position_info_array
+
+
+def position_observations(latitude, longitude, altitude, snr, station, min_range_km, max_range_km):
+    """ Convert a set of positions and SNRs into coverage map observations.
+
+    Args:
+        latitude, longitude, altitude, snr (np.ndarray): Observation positions, and SNRs (dB).
+        station (tuple): Station (lat, lon, alt).
+        min_range_km, max_range_km (float): Discard observations outside of this range from the station.
+
+    Returns:
+        tuple: (bearing, elevation, snr, normalised snr) arrays, with bearing and elevation as grid indexes.
+    """
+    _snr = np.asarray(snr, dtype=np.float64)
+    _valid = (_snr >= CoverageMap.MIN_SNR) & (_snr <= CoverageMap.MAX_SNR)
+
+    _pos_info = position_info_array(
+        station,
+        np.column_stack(
+            (
+                np.asarray(latitude, dtype=np.float64)[_valid],
+                np.asarray(longitude, dtype=np.float64)[_valid],
+                np.asarray(altitude, dtype=np.float64)[_valid],
+            )
+        ).reshape(-1, 3),
+    )
+    _snr = _snr[_valid]
+    _range = _pos_info["straight_distance"] / 1000.0
+
+    _in_range = (_range >= min_range_km) & (_range <= max_range_km)
+    _snr = _snr[_in_range]
+    _range = _range[_in_range]
+    _bearing = np.floor(_pos_info["bearing"][_in_range]).astype(int) % CoverageMap.BEARINGS
+    # Limit elevation data to 0-89
+    _elevation = np.clip(
+        np.floor(_pos_info["elevation"][_in_range]).astype(int), 0, CoverageMap.ELEVATIONS - 1
+    )
+    _norm = _snr + 20 * np.log10(_range / CoverageMap.NORM_RANGE)
+
+    return (_bearing, _elevation, _snr, _norm)
+
+
+def log_observations(filename, station, min_range_km, max_range_km):
+    """ Read in a log file, and produce coverage map observations (refer position_observations).
+    This is a module-level function so it can be run in a worker process. """
+    (_data, _metadata) = read_log_columns(filename)
+
+    if "snr" not in _data:
+        _empty = np.array([], dtype=np.float64)
+        return (_empty.astype(int), _empty.astype(int), _empty, _empty)
+
+    return position_observations(
+        _data["latitude"],
+        _data["longitude"],
+        _data["altitude"],
+        _data["snr"],
+        station,
+        min_range_km,
+        max_range_km,
+    )
+
+
+class CoverageMap(object):
+    """ Bearing/Elevation grid of received SNR, from the station's point of view.
+
+    Each grid cell holds the number of observations, the sum and maximum SNR, and the sum and maximum SNR
+    normalised to a 50km range. Only observations with a plausible SNR, and within a range window, are used.
+    The log files which have been added to the map are tracked, so logs are only ever added once.
+    """
+
+    COVERAGE_FILENAME = "coverage_map.npz"
+
+    # Grid size, in degrees
+    BEARINGS = 360
+    ELEVATIONS = 90
+
+    # Range to normalise SNR values to, in km
+    NORM_RANGE = 50.0
+
+    # Discard obviously sus SNR values
+    MIN_SNR = 5.0
+    MAX_SNR = 40.0
+
+    def __init__(self, log_directory=None, min_range_km=10, max_range_km=1000):
+        """ Create a Coverage Map, loading any existing saved map from the log directory.
+
+        Args:
+            log_directory (str): Directory to load/save the coverage map from/to. If None, the map is not saved.
+            min_range_km (float): Ignore observations closer than this to the station.
+            max_range_km (float): Ignore observations further than this from the station.
+        """
+        self.log_directory = log_directory
+        self.min_range_km = min_range_km
+        self.max_range_km = max_range_km
+
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.reset()
+
+        if self.log_directory is not None:
+            try:
+                self.load()
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logging.error("Coverage Map - Could not load saved coverage map - %s" % str(e))
+
+    def reset(self):
+        """ Clear the coverage map. """
+        _shape = (self.BEARINGS, self.ELEVATIONS)
+        with self.lock:
+            self.count = np.zeros(_shape, dtype=np.int64)
+            self.snr_sum = np.zeros(_shape)
+            self.snr_max = np.full(_shape, -np.inf)
+            self.norm_sum = np.zeros(_shape)
+            self.norm_max = np.full(_shape, -np.inf)
+            self.logs = set()
+            self.dirty = True
+
+    def filename(self):
+        return os.path.join(self.log_directory, self.COVERAGE_FILENAME)
+
+    def load(self):
+        """ Load the coverage map from the log directory. """
+        with np.load(self.filename()) as _data:
+            if (float(_data["min_range_km"]) != self.min_range_km) or (
+                float(_data["max_range_km"]) != self.max_range_km
+            ):
+                logging.warning(
+                    "Coverage Map - Saved coverage map uses a different range window, ignoring."
+                )
+                return
+
+            if tuple(_data["station"].tolist()) != tuple(self.station()):
+                logging.warning(
+                    "Coverage Map - Saved coverage map is for a different station position, ignoring."
+                )
+                return
+
+            with self.lock:
+                self.count = _data["count"]
+                self.snr_sum = _data["snr_sum"]
+                self.snr_max = _data["snr_max"]
+                self.norm_sum = _data["norm_sum"]
+                self.norm_max = _data["norm_max"]
+                self.logs = set(_data["logs"].tolist())
+                self.dirty = False
+
+    def save(self):
+        """ Save the coverage map to the log directory, if it has changed. """
+        if (self.log_directory is None) or (not self.dirty):
+            return
+
+        with self.lock:
+            _arrays = {
+                "count": self.count.copy(),
+                "snr_sum": self.snr_sum.copy(),
+                "snr_max": self.snr_max.copy(),
+                "norm_sum": self.norm_sum.copy(),
+                "norm_max": self.norm_max.copy(),
+                "logs": np.array(sorted(self.logs), dtype=str),
+                "min_range_km": self.min_range_km,
+                "max_range_km": self.max_range_km,
+                "station": np.array(self.station(), dtype=np.float64),
+            }
+            self.dirty = False
+
+        # Write to a temporary file and move it into place, so a partially written map is never loaded.
+        _fd, _temp_filename = tempfile.mkstemp(dir=self.log_directory, suffix=".tmp")
+        try:
+            with os.fdopen(_fd, "wb") as _f:
+                np.savez(_f, **_arrays)
+            os.chmod(_temp_filename, 0o644)
+            os.replace(_temp_filename, self.filename())
+        except Exception:
+            os.unlink(_temp_filename)
+            self.dirty = True
+            raise
+
+    def station(self):
+        """ The station position, as used for all calculations. """
+        return (
+            autorx.config.global_config["station_lat"],
+            autorx.config.global_config["station_lon"],
+            autorx.config.global_config["station_alt"],
+        )
+
+    def add_positions(self, latitude, longitude, altitude, snr):
+        """ Add a set of observations to the map.
+
+        Args:
+            latitude, longitude, altitude, snr (np.ndarray): Observation positions, and SNRs (dB).
+        """
+        self.add_observations(
+            position_observations(
+                latitude,
+                longitude,
+                altitude,
+                snr,
+                self.station(),
+                self.min_range_km,
+                self.max_range_km,
+            )
+        )
+
+    def add_observations(self, observations):
+        """ Add a set of observations (as produced by position_observations) to the map. """
+        (_bearing, _elevation, _snr, _norm) = observations
+
+        _cells = (_bearing, _elevation)
+        with self.lock:
+            np.add.at(self.count, _cells, 1)
+            np.add.at(self.snr_sum, _cells, _snr)
+            np.maximum.at(self.snr_max, _cells, _snr)
+            np.add.at(self.norm_sum, _cells, _norm)
+            np.maximum.at(self.norm_max, _cells, _norm)
+            self.dirty = True
+
+    def add_telemetry(self, log_filename, telemetry):
+        """ Add a single telemetry observation to the map (i.e. as it is received).
+
+        Args:
+            log_filename (str): Filename of the log file this telemetry is being written to.
+            telemetry (dict): Telemetry dictionary, which must include a snr field.
+        """
+        _snr = telemetry["snr"]
+        if (_snr < self.MIN_SNR) or (_snr > self.MAX_SNR):
+            return
+
+        _pos_info = position_info(
+            self.station(), (telemetry["lat"], telemetry["lon"], telemetry["alt"])
+        )
+        _range = _pos_info["straight_distance"] / 1000.0
+        if (_range < self.min_range_km) or (_range > self.max_range_km):
+            return
+
+        _bearing = int(np.floor(_pos_info["bearing"])) % self.BEARINGS
+        _elevation = min(max(int(np.floor(_pos_info["elevation"])), 0), self.ELEVATIONS - 1)
+        _norm = _snr + 20 * np.log10(_range / self.NORM_RANGE)
+
+        with self.lock:
+            self.logs.add(log_name(log_filename))
+            self.count[_bearing, _elevation] += 1
+            self.snr_sum[_bearing, _elevation] += _snr
+            self.snr_max[_bearing, _elevation] = max(self.snr_max[_bearing, _elevation], _snr)
+            self.norm_sum[_bearing, _elevation] += _norm
+            self.norm_max[_bearing, _elevation] = max(self.norm_max[_bearing, _elevation], _norm)
+            self.dirty = True
+
+    def add_log(self, filename):
+        """ Add all observations from a log file to the map, if it has not already been added.
+
+        Returns:
+            bool: True if the log file was added.
+        """
+        _name = log_name(filename)
+        with self.lock:
+            if _name in self.logs:
+                return False
+
+        self.add_observations(
+            log_observations(filename, self.station(), self.min_range_km, self.max_range_km)
+        )
+
+        with self.lock:
+            self.logs.add(_name)
+            self.dirty = True
+
+        return True
+
+    def update(self, log_directory=None, rebuild=False, workers=1):
+        """ Add any log files in a directory which have not yet been added to the map.
+
+        Args:
+            log_directory (str): Directory to search for log files. Defaults to the map's log directory.
+            rebuild (bool): Clear the map first, and re-add all log files.
+            workers (int): Number of worker processes to read log files with. If None, use one per CPU.
+
+        Returns:
+            int: Number of log files added.
+        """
+        if log_directory is None:
+            log_directory = self.log_directory
+
+        if rebuild:
+            self.reset()
+
+        # Log files are tracked by their original name, so they are not added again once compressed or archived.
+        _files = []
+        for _file in sorted(list_log_paths(log_directory), key=log_name):
+            if log_name(_file) not in self.logs:
+                _files.append(_file)
+
+        _added = 0
+        _start = time.time()
+
+        if workers == 1:
+            for _file in _files:
+                try:
+                    if self.add_log(_file):
+                        _added += 1
+                except Exception as e:
+                    logging.error(
+                        "Coverage Map - Could not add log file %s - %s"
+                        % (os.path.basename(_file), str(e))
+                    )
+        else:
+            # Read the log files and calculate the geometry in parallel, aggregating the results here.
+            _args = (self.station(), self.min_range_km, self.max_range_km)
+            for (_file, _observations) in batch_process(
+                log_observations, _files, args=_args, workers=workers
+            ):
+                self.add_observations(_observations)
+                with self.lock:
+                    self.logs.add(log_name(_file))
+                    self.dirty = True
+                _added += 1
+
+        logging.info(
+            "Coverage Map - Added %d log files in %.1f seconds." % (_added, time.time() - _start)
+        )
+        return _added
+
+    def snr_map(self, normalise=True, maxsnr=False):
+        """ Produce an SNR map.
+
+        Args:
+            normalise (bool): Use SNR values normalised to a 50 km range.
+            maxsnr (bool): Use the maximum SNR in each cell, rather than the mean.
+
+        Returns:
+            np.ndarray: (bearing, elevation) array of SNR values, with NaN in cells with no observations.
+        """
+        with self.lock:
+            if maxsnr:
+                _map = (self.norm_max if normalise else self.snr_max).copy()
+                _map[self.count == 0] = np.nan
+            else:
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    _map = (self.norm_sum if normalise else self.snr_sum) / self.count
+
+        return _map
+
+    def to_dict(self, normalise=True):
+        """ Produce a list of the populated grid cells, for the web interface.
+
+        Returns:
+            dict: Contains a list of [bearing, elevation, count, mean_snr, max_snr] entries, one per populated
+                grid cell, and the number of log files the map is built from.
+        """
+        _mean = self.snr_map(normalise=normalise, maxsnr=False)
+        _max = self.snr_map(normalise=normalise, maxsnr=True)
+
+        with self.lock:
+            (_bearings, _elevations) = np.nonzero(self.count)
+            _counts = self.count[_bearings, _elevations]
+            _logs = len(self.logs)
+
+        return {
+            "normalised": normalise,
+            "logs": _logs,
+            "cells": [
+                list(_cell)
+                for _cell in zip(
+                    _bearings.tolist(),
+                    _elevations.tolist(),
+                    _counts.tolist(),
+                    np.round(_mean[_bearings, _elevations], 1).tolist(),
+                    np.round(_max[_bearings, _elevations], 1).tolist(),
+                )
+            ],
+        }
+
+
+# Coverage maps, by log directory.
+_coverage_maps = {}
+_coverage_maps_lock = threading.Lock()
+
+
+def get_coverage_map(log_directory=None):
+    """ Get the (shared) coverage map for a log directory (defaults to the auto_rx logging directory). """
+    if log_directory is None:
+        log_directory = autorx.logging_path
+
+    _key = os.path.abspath(log_directory)
+
+    with _coverage_maps_lock:
+        if _key not in _coverage_maps:
+            _coverage_maps[_key] = CoverageMap(log_directory)
+
+        return _coverage_maps[_key]
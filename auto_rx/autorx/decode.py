@@ -11,17 +11,73 @@ import logging
 import json
 import os
 import os.path
+import re
 import signal
 import subprocess
 import time
 import traceback
 from dateutil.parser import parse
-from threading import Thread
+from dateutil.tz import tzutc
+from threading import Event, Thread
 from types import FunctionType, MethodType
-from .utils import AsynchronousFileReader, rtlsdr_test, position_info, generate_aprs_id
+from .utils import get_line_dispatcher, rtlsdr_test, position_info, generate_aprs_id
 from .gps import get_ephemeris, get_almanac
 from .sonde_specific import *
 from .fsk_demod import FSKDemodStats
+from .sdr_server import SDRServerSource, split_rx_command
+
+try:
+    # Use orjson to parse decoder output if it is available, as it is considerably faster.
+    import orjson
+
+    decoder_json_loads = orjson.loads
+except ImportError:
+    decoder_json_loads = json.loads
+
+# Date/Time format emitted by the C decoders, i.e. 2018-05-12T11:32:20.000Z
+DECODER_DATETIME_REGEX = re.compile(
+    r"(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,6}))?Z$"
+)
+
+# Any non-ASCII character in a line of decoder output.
+# (bytes.isascii would be faster, but is not available in Python 3.6)
+DECODER_NON_ASCII_REGEX = re.compile(rb"[^\x00-\x7f]")
+
+
+def parse_decoder_datetime(datetime_str):
+    """ Parse a date/time string from a decoder into a (UTC) datetime object.
+
+    The fixed ISO-8601 format used by the C decoders is parsed directly, which is much faster
+    than dateutil. Anything else (i.e. the HH:MM:SS times from iMet and LMS6 sondes) is passed to dateutil.
+
+    Args:
+        datetime_str (str): Date/Time string from the decoder.
+
+    Returns:
+        datetime: The parsed date/time.
+    """
+    _match = DECODER_DATETIME_REGEX.match(datetime_str)
+    if _match is None:
+        return parse(datetime_str)
+
+    (_year, _month, _day, _hour, _minute, _second, _fraction) = _match.groups()
+
+    if _fraction:
+        _microsecond = int(_fraction.ljust(6, "0"))
+    else:
+        _microsecond = 0
+
+    return datetime.datetime(
+        int(_year),
+        int(_month),
+        int(_day),
+        int(_hour),
+        int(_minute),
+        int(_second),
+        _microsecond,
+        tzinfo=tzutc(),
+    )
+
 
 # Global valid sonde types list.
 VALID_SONDE_TYPES = [
@@ -85,6 +141,7 @@ class SondeDecoder(object):
         "alt",
         "version",
     ]
+    DECODER_REQUIRED_FIELDS_SET = frozenset(DECODER_REQUIRED_FIELDS)
     # If we are missing any of the following fields, we add in default values to the telemetry
     # object which is passed on to the various other consumers.
     DECODER_OPTIONAL_FIELDS = {
@@ -135,7 +192,8 @@ class SondeDecoder(object):
         rs92_ephemeris=None,
         rs41_drift_tweak=False,
         experimental_decoder=False,
-        save_raw_hex=False
+        save_raw_hex=False,
+        sdr_server=None,
     ):
         """ Initialise and start a Sonde Decoder.
 
@@ -166,6 +224,8 @@ class SondeDecoder(object):
             rs41_drift_tweak (bool): If True, add a high-pass filter in the decode chain, which can improve decode performance on drifty SDRs.
             experimental_decoder (bool): If True, use the experimental fsk_demod-based decode chain.
             save_raw_hex (bool): If True, save the raw hex output from the decoder to a file.
+            sdr_server (SDRServer): If provided, feed samples from this persistent SDR Server into the decoder,
+                instead of starting rtl_fm.
         """
         # Thread running flag
         self.decoder_running = True
@@ -190,6 +250,8 @@ class SondeDecoder(object):
         self.experimental_decoder = experimental_decoder
         self.save_raw_hex = save_raw_hex
         self.raw_file = None
+        self.sdr_server = sdr_server
+        self.sample_source = None
 
         # Raw hex filename
         if self.save_raw_hex:
@@ -238,8 +300,11 @@ class SondeDecoder(object):
             self.decoder_running = False
             return
 
-        # Test if the supplied RTLSDR is working.
-        _rtlsdr_ok = rtlsdr_test(device_idx)
+        # Test if the supplied RTLSDR (or its SDR Server) is working.
+        if self.sdr_server is not None:
+            _rtlsdr_ok = self.sdr_server.running()
+        else:
+            _rtlsdr_ok = rtlsdr_test(device_idx)
 
         # TODO: How should this error be handled?
         if not _rtlsdr_ok:
@@ -298,6 +363,14 @@ class SondeDecoder(object):
             # 'Regular' decoder - just a single command.
             self.decoder_command = self.generate_decoder_command()
 
+        # Check the SDR Server can reproduce the decoder's rtl_fm settings.
+        if (self.decoder_command is not None) and (self.sdr_server is not None):
+            try:
+                split_rx_command(self.decoder_command)
+            except ValueError as e:
+                self.log_error("Decoder command cannot be run using the SDR Server - %s" % str(e))
+                self.decoder_command = None
+
         if self.decoder_command is None:
             self.log_error("Could not generate decoder command. Not starting decoder.")
             self.decoder_running = False
@@ -310,7 +383,11 @@ class SondeDecoder(object):
 
             # Start up the decoder thread.
             self.decode_process = None
-            self.async_reader = None
+            # Set when the decoder subprocess output closes, or the decoder needs to stop.
+            self.decoder_event = Event()
+            # Set when the decoder subprocess output closes.
+            self.decoder_output_closed = Event()
+            self.last_packet = time.time()
 
             self.decoder_running = True
             self.decoder = Thread(target=self.decoder_thread)
@@ -1055,35 +1132,96 @@ class SondeDecoder(object):
 
         return (demod_cmd, decode_cmd, demod_stats)
 
-    def stats_thread(self, asyncreader):
-        """ Process demodulator statistics from a supplied AsynchronousFileReader object (which will be hooked into stderr from fsk_demod) """
-        while (not asyncreader.eof()) and self.decoder_running:
-            for _line in asyncreader.readlines():
-                self.demod_stats.update(_line)
-            # Avoid spinlocking..
-            # Probably about time we looked at using async for this stuff...
-            time.sleep(0.2)
+    def sdr_server_command(self, command):
+        """ If we are using a SDR Server, strip the rtl_fm stage off the front of a decoder command, as the
+        samples will be fed into the command's stdin instead.
+
+        Args:
+            command (str): Decoder or demodulator command.
+
+        Returns:
+            tuple: (command to run, stdin argument for subprocess.Popen)
+        """
+        self.sample_source_settings = None
+
+        if self.sdr_server is None:
+            return (command, None)
+
+        _split = split_rx_command(command)
+        if _split is None:
+            # Not a rtl_fm based command (i.e. UDP mode).
+            return (command, None)
+
+        (_mode, _sample_rate, _frequency, _options, _command) = _split
+        self.sample_source_settings = (_mode, _sample_rate, _frequency, _options)
+
+        return (_command, subprocess.PIPE)
+
+    def start_sample_source(self, process):
+        """ Start feeding samples from the SDR Server into a decoder process, if required. """
+        if self.sample_source_settings is None:
+            return
+
+        (_mode, _sample_rate, _frequency, _options) = self.sample_source_settings
+
+        self.log_debug(
+            "Using SDR Server samples (Mode: %s, Sample Rate: %d, Frequency: %d)"
+            % (_mode, _sample_rate, _frequency)
+        )
+
+        try:
+            self.sample_source = SDRServerSource(
+                self.sdr_server, process.stdin, _mode, _sample_rate, _frequency, _options
+            )
+            self.sample_source.start()
+        except Exception as e:
+            # Closing the decoder's stdin will cause it to exit, which is handled by the decoder thread.
+            self.log_error("Could not start SDR Server sample source - %s" % str(e))
+            process.stdin.close()
+
+    def handle_decoder_output(self, line):
+        """ Handle a line of decoder output, as it is read by the line dispatcher. """
+        if not self.decoder_running:
+            return
 
-        asyncreader.stop()
+        # Pass the line into the handler, and see if it is OK.
+        _ok = self.handle_decoder_line(line)
+
+        # If we decoded a valid JSON blob, update our last-packet time.
+        if _ok:
+            self.last_packet = time.time()
+
+        # The line handler may have decided the decoder needs to close.
+        if not self.decoder_running:
+            self.decoder_event.set()
+
+    def handle_decoder_eof(self):
+        """ Called by the line dispatcher once the decoder subprocess output has closed. """
+        self.decoder_output_closed.set()
+        self.decoder_event.set()
 
     def decoder_thread(self):
-        """ Runs the supplied decoder command(s) as a subprocess, and passes returned lines to handle_decoder_line. """
+        """ Runs the supplied decoder command(s) as a subprocess. Lines of output are read by the shared
+        line dispatcher and passed to handle_decoder_line, while this thread waits for the decoder to exit or time out. """
 
         # Timeout Counter.
-        _last_packet = time.time()
+        self.last_packet = time.time()
+        _dispatcher = get_line_dispatcher()
 
         if self.decoder_command_2 is None:
             # No second decoder command, so we only need to process stdout from the one process.
             self.log_debug("Decoder Command: %s" % self.decoder_command)
 
             # Start the thread.
+            (_command, _stdin) = self.sdr_server_command(self.decoder_command)
             self.decode_process = subprocess.Popen(
-                self.decoder_command,
+                _command,
                 shell=True,
-                stdin=None,
+                stdin=_stdin,
                 stdout=subprocess.PIPE,
                 preexec_fn=os.setsid,
             )
+            self.start_sample_source(self.decode_process)
 
         else:
             # Two decoder commands! This means one is a demod command, from which we need to handle stderr,
@@ -1092,14 +1230,16 @@ class SondeDecoder(object):
             self.log_debug("Decoder Command: %s" % self.decoder_command_2)
 
             # Startup the subprocesses
+            (_command, _stdin) = self.sdr_server_command(self.decoder_command)
             self.demod_process = subprocess.Popen(
-                self.decoder_command,
+                _command,
                 shell=True,
-                stdin=None,
+                stdin=_stdin,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 preexec_fn=os.setsid,
             )
+            self.start_sample_source(self.demod_process)
             self.decode_process = subprocess.Popen(
                 self.decoder_command_2,
                 shell=True,
@@ -1108,52 +1248,39 @@ class SondeDecoder(object):
                 preexec_fn=os.setsid,
             )
 
-            self.demod_reader = AsynchronousFileReader(
-                self.demod_process.stderr, autostart=True
-            )
-
-            # Start thread to process demodulator stats.
-            self.demod_stats_thread = Thread(
-                target=self.stats_thread, args=(self.demod_reader,)
-            )
-            self.demod_stats_thread.start()
+            # Process demodulator stats as they arrive on stderr.
+            _dispatcher.add(self.demod_process.stderr, self.demod_stats.update)
 
-        self.async_reader = AsynchronousFileReader(
-            self.decode_process.stdout, autostart=True
+        _dispatcher.add(
+            self.decode_process.stdout,
+            self.handle_decoder_output,
+            self.handle_decoder_eof,
         )
 
         self.log_info("Starting decoder subprocess.")
 
-        while (not self.async_reader.eof()) and self.decoder_running:
-            # Read in any lines available in the async reader queue.
-            for _line in self.async_reader.readlines():
-                if (_line != None) and (_line != ""):
-                    # Pass the line into the handler, and see if it is OK.
-                    _ok = self.handle_decoder_line(_line)
-
-                    # If we decoded a valid JSON blob, update our last-packet time.
-                    if _ok:
-                        _last_packet = time.time()
-
-            # Check timeout counter.
-            if (
-                (self.timeout > 0)
-                and (time.time() > (_last_packet + self.timeout))
-                and (not self.udp_mode)
-            ):
-                # If we have not seen data for a while, break.
-                self.log_error("RX Timed out.")
-                self.exit_state = "Timeout"
-                break
+        while self.decoder_running:
+            if (self.timeout > 0) and (not self.udp_mode):
+                # Check timeout counter.
+                _remaining = self.last_packet + self.timeout - time.time()
+                if _remaining <= 0:
+                    # If we have not seen data for a while, break.
+                    self.log_error("RX Timed out.")
+                    self.exit_state = "Timeout"
+                    break
             else:
-                # Otherwise, sleep for a short time.
-                time.sleep(0.1)
+                _remaining = None
+
+            # Sleep until the decoder exits, we are asked to stop, or the timeout may have expired.
+            if self.decoder_event.wait(timeout=_remaining):
+                break
 
         # Either our subprocess has exited, or the user has asked to close the process.
+        if self.sample_source is not None:
+            self.sample_source.stop()
+
         # Try many things to kill off the subprocess.
         try:
-            # Stop the async reader
-            self.async_reader.stop()
             # Send a SIGKILL to the subprocess PID via OS.
             try:
                 os.killpg(os.getpgid(self.decode_process.pid), signal.SIGKILL)
@@ -1169,8 +1296,8 @@ class SondeDecoder(object):
                     self.demod_process.kill()
             except Exception as e:
                 self.log_debug("SIGKILL via subprocess.kill failed - %s" % str(e))
-            # Finally, join the async reader.
-            self.async_reader.join()
+            # Finally, wait for the line dispatcher to finish with the decoder output.
+            self.decoder_output_closed.wait(timeout=5)
 
         except Exception as e:
             traceback.print_exc()
@@ -1190,16 +1317,17 @@ class SondeDecoder(object):
             bool:   True if the line was decoded to a JSON object correctly, False otherwise.
         """
 
-        # Catch 'bad' first characters.
-        try:
-            _first_char = data.decode("ascii")[0]
-        except UnicodeDecodeError:
+        if isinstance(data, str):
+            data = data.encode("utf8")
+
+        # Catch 'bad' (non-ASCII) or empty lines.
+        if (len(data) == 0) or DECODER_NON_ASCII_REGEX.search(data):
             return
 
         # Don't even try and decode lines which don't start with a '{'
         # These may be other output from the decoder, which we shouldn't try to parse.
         # If we have raw logging enabled, log these lines to disk.
-        if data.decode("ascii")[0] != "{":
+        if data[:1] != b"{":
 
             # Save the line verbatim to the raw data file, if we have that enabled
             if self.raw_file:
@@ -1209,7 +1337,7 @@ class SondeDecoder(object):
 
         else:
             try:
-                _telemetry = json.loads(data.decode("ascii"))
+                _telemetry = decoder_json_loads(data)
             except Exception as e:
                 self.log_debug("Line could not be parsed as JSON - %s" % str(e))
                 return False
@@ -1220,13 +1348,14 @@ class SondeDecoder(object):
                 return False
 
             # Check that the required fields are in the telemetry blob
-            for _field in self.DECODER_REQUIRED_FIELDS:
-                if _field not in _telemetry:
-                    self.log_error(
-                        "JSON object missing required field %s. Have you re-built the decoders? (./build.sh)"
-                        % _field
-                    )
-                    return False
+            if not self.DECODER_REQUIRED_FIELDS_SET.issubset(_telemetry):
+                for _field in self.DECODER_REQUIRED_FIELDS:
+                    if _field not in _telemetry:
+                        self.log_error(
+                            "JSON object missing required field %s. Have you re-built the decoders? (./build.sh)"
+                            % _field
+                        )
+                        return False
 
             # Check the decoder version matches our current version.
             # Note that we allow any version in UDP mode, as this is commonly used for experimentation work.
@@ -1242,9 +1371,8 @@ class SondeDecoder(object):
             # Check for fields which we need for logging purposes, but may not always be provided
             # in the incoming JSON object.
             # These get added in with dummy values.
-            for _field in self.DECODER_OPTIONAL_FIELDS.keys():
-                if _field not in _telemetry:
-                    _telemetry[_field] = self.DECODER_OPTIONAL_FIELDS[_field]
+            for (_field, _default) in self.DECODER_OPTIONAL_FIELDS.items():
+                _telemetry.setdefault(_field, _default)
 
             # Check for an encrypted flag, and check if it is set.
             # Currently encrypted == true indicates an encrypted RS41-SGM. There's no point
@@ -1261,7 +1389,7 @@ class SondeDecoder(object):
 
             # Check the datetime field is parseable.
             try:
-                _telemetry["datetime_dt"] = parse(_telemetry["datetime"])
+                _telemetry["datetime_dt"] = parse_decoder_datetime(_telemetry["datetime"])
             except Exception as e:
                 self.log_error(
                     "Invalid date/time in telemetry dict - %s (Sonde may not have GPS lock)"
@@ -1525,6 +1653,10 @@ class SondeDecoder(object):
         """ Kill the currently running decoder subprocess """
         self.decoder_running = False
 
+        if self.decoder is not None:
+            # Wake up the decoder thread.
+            self.decoder_event.set()
+
         if self.decoder is not None and (not nowait):
             self.decoder.join()
         
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+#
+#   radiosonde_auto_rx - Columnar Flight Store
+#
+#   Copyright (C) 2021  Mark Jessop <vk5qi@rfhead.net>
+#   Released under GNU GPL v3 or later
+#
+#   A compact binary copy of a sonde log file, with one fixed-dtype array per field, which can be
+#   memory-mapped and loaded without parsing. The CSV sonde log remains the interchange format - flight
+#   store files are created from it on demand, and are re-created whenever the log file changes.
+#
+#   File layout:
+#       8 bytes     Magic (ARXFLT01)
+#       4 bytes     Header length (little-endian uint32)
+#       N bytes     JSON header: {"rows": .., "columns": [{"name": .., "dtype": .., "offset": ..}, ..], "metadata": {..}}
+#       ...         Column arrays, each starting on a 64-byte boundary.
+#
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+
+FLIGHT_STORE_MAGIC = b"ARXFLT01"
+FLIGHT_STORE_SUFFIX = ".flight"
+# Column alignment, in bytes.
+FLIGHT_STORE_ALIGNMENT = 64
+
+
+def flight_store_filename(log_filename):
+    """ Get the flight store filename for a sonde log file (i.e. ..._sonde.log -> ..._sonde.flight) """
+    return os.path.splitext(log_filename)[0] + FLIGHT_STORE_SUFFIX
+
+
+def write_flight_store(filename, columns, metadata={}):
+    """ Write a set of columns out to a flight store file.
+
+    The file is written to a temporary file and then moved into place, so readers (which may still have
+    the old file memory-mapped) never see a partially written file.
+
+    Args:
+        filename (str): Flight store filename.
+        columns (dict): Column arrays, keyed by name. All columns must be the same length.
+        metadata (dict): Additional JSON-serialisable information to store in the header.
+    """
+    _columns = {_name: np.ascontiguousarray(_col) for _name, _col in columns.items()}
+
+    _rows = None
+    for _name, _col in _columns.items():
+        if _col.ndim != 1:
+            raise ValueError("Column %s is not one-dimensional." % _name)
+        if _rows is None:
+            _rows = len(_col)
+        elif len(_col) != _rows:
+            raise ValueError("Column %s has a different length to the other columns." % _name)
+
+    # Work out the header length first, as the column offsets depend on it.
+    # Offsets are written as fixed-width numbers, so the header length does not depend on their values.
+    def build_header(offsets):
+        _header = {
+            "rows": _rows or 0,
+            "columns": [
+                {"name": _name, "dtype": _col.dtype.str, "offset": "%016d" % offsets[_name]}
+                for _name, _col in _columns.items()
+            ],
+            "metadata": metadata,
+        }
+        return json.dumps(_header).encode("ascii")
+
+    _header_len = len(build_header({_name: 0 for _name in _columns}))
+
+    _offsets = {}
+    _offset = len(FLIGHT_STORE_MAGIC) + 4 + _header_len
+    for _name, _col in _columns.items():
+        _offset += (-_offset) % FLIGHT_STORE_ALIGNMENT
+        _offsets[_name] = _offset
+        _offset += _col.nbytes
+
+    _header = build_header(_offsets)
+
+    _fd, _temp_filename = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(filename)), suffix=".tmp"
+    )
+    try:
+        with os.fdopen(_fd, "wb") as _f:
+            _f.write(FLIGHT_STORE_MAGIC)
+            _f.write(struct.pack("<I", len(_header)))
+            _f.write(_header)
+
+            for _name, _col in _columns.items():
+                _f.write(b"\x00" * (_offsets[_name] - _f.tell()))
+                _f.write(_col.tobytes())
+
+        # mkstemp creates files only readable by the owner - match the permissions of the log files.
+        os.chmod(_temp_filename, 0o644)
+        os.replace(_temp_filename, filename)
+    except Exception:
+        os.unlink(_temp_filename)
+        raise
+
+
+def read_flight_store(filename):
+    """ Memory-map a flight store file.
+
+    The returned arrays are read-only views onto the file, so no data is copied until it is used.
+
+    Args:
+        filename (str): Flight store filename.
+
+    Returns:
+        tuple: (columns, metadata), where columns is a dict of arrays keyed by name.
+    """
+    with open(filename, "rb") as _f:
+        if os.fstat(_f.fileno()).st_size == 0:
+            raise ValueError("Flight store file is empty.")
+
+        _map = mmap.mmap(_f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if _map[: len(FLIGHT_STORE_MAGIC)] != FLIGHT_STORE_MAGIC:
+        raise ValueError("Not a flight store file.")
+
+    _start = len(FLIGHT_STORE_MAGIC)
+    (_header_len,) = struct.unpack("<I", _map[_start : _start + 4])
+    _header = json.loads(_map[_start + 4 : _start + 4 + _header_len])
+
+    _columns = {}
+    for _column in _header["columns"]:
+        _columns[_column["name"]] = np.frombuffer(
+            _map,
+            dtype=np.dtype(_column["dtype"]),
+            count=_header["rows"],
+            offset=int(_column["offset"]),
+        )
+
+    return (_columns, _header["metadata"])
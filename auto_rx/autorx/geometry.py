@@ -5,6 +5,7 @@
 #   Copyright (C) 2018  Mark Jessop <vk5qi@rfhead.net>
 #   Released under GNU GPL v3 or later
 #
+import datetime
 import math
 import traceback
 import logging
@@ -119,15 +120,54 @@ def time_to_landing(
     return _start_time
 
 
+# Track positions are stored in a numpy structured array, with a record per position, along with the position's
+# sequence number. All fields are 8 bytes, so a set of records can also be viewed as an (N, 5) array of floats
+# without copying (in which the sequence number column is meaningless).
+TRACK_DTYPE = np.dtype(
+    [
+        ("time", np.float64),
+        ("lat", np.float64),
+        ("lon", np.float64),
+        ("alt", np.float64),
+        ("seq", np.int64),
+    ]
+)
+
+
+def track_positions(track):
+    """ View a set of track records (refer TRACK_DTYPE) as an (N, 3) array of [lat, lon, alt], without copying. """
+    return track.view(np.float64).reshape(-1, 5)[:, 1:4]
+
+
+def track_timestamp(value):
+    """ Convert a track time (datetime, or seconds since the epoch) to seconds since the epoch.
+    Datetimes without a timezone are assumed to be UTC. """
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return value.timestamp()
+    else:
+        return float(value)
+
+
 class GenericTrack(object):
     """
     A Generic 'track' object, which stores track positions for a payload or chase car.
     Telemetry is added using the add_telemetry method, which takes a dictionary with time/lat/lon/alt keys (at minimum).
     This object performs a running average of the ascent/descent rate, and calculates the predicted landing rate if the payload
     is in descent.
-    The track history can be exported to a LineString using the to_line_string method.
+
+    Positions are stored in a preallocated numpy structured array (refer TRACK_DTYPE), which grows as required.
+    If max_elements is set, the array is used as a ring buffer, with each position written twice (at index i and
+    i + max_elements), so the retained positions can always be accessed as a contiguous view, without copying.
+    Each position has a sequence number, which defaults to the number of positions added so far (including it),
+    and can be used to fetch only the positions added since a previous request.
+    The track can be exported using the get_track or to_polyline methods.
     """
 
+    # Initial size of the track array, when max_elements is not set.
+    INITIAL_CAPACITY = 256
+
     def __init__(self, ascent_averaging=6, landing_rate=5.0, max_elements=None):
         """ Create a GenericTrack Object. """
 
@@ -142,31 +182,63 @@ class GenericTrack(object):
         self.is_descending = False
 
         # Internal store of track history data.
-        # Data is stored as a list-of-lists, with elements of [datetime, lat, lon, alt, comment]
-        self.track_history = []
+        if self.max_elements:
+            self._data = np.zeros(2 * self.max_elements, dtype=TRACK_DTYPE)
+        else:
+            self._data = np.zeros(self.INITIAL_CAPACITY, dtype=TRACK_DTYPE)
+        # Index of the oldest retained position in the array, and the number of retained positions.
+        self._start = 0
+        self._length = 0
+        # Total number of positions added (including any which have since been dropped).
+        self.total = 0
+        # Comments, keyed by position number (only stored if provided), and the time of the latest position as provided.
+        self.comments = {}
+        self.latest_time = None
+
+    def __len__(self):
+        return self._length
 
     def add_telemetry(self, data_dict):
         """ 
         Accept telemetry data as a dictionary with fields 
-        datetime, lat, lon, alt, comment
+        datetime, lat, lon, alt, comment, seq
+        The (optional) sequence numbers must increase with each position added.
         """
 
         try:
             _datetime = data_dict["time"]
-            _lat = data_dict["lat"]
-            _lon = data_dict["lon"]
-            _alt = data_dict["alt"]
-            if "comment" in data_dict.keys():
-                _comment = data_dict["comment"]
+            _record = (
+                track_timestamp(_datetime),
+                float(data_dict["lat"]),
+                float(data_dict["lon"]),
+                float(data_dict["alt"]),
+                int(data_dict.get("seq", self.total + 1)),
+            )
+
+            if self.max_elements:
+                if self._length == self.max_elements:
+                    # Drop the oldest position.
+                    self.comments.pop(self.total - self._length, None)
+                    self._start = (self._start + 1) % self.max_elements
+                    self._length -= 1
+
+                _index = (self._start + self._length) % self.max_elements
+                self._data[_index] = _record
+                self._data[_index + self.max_elements] = _record
             else:
-                _comment = ""
+                if self._length == len(self._data):
+                    # Double the size of the array, so additions take constant time on average.
+                    self._data = np.concatenate(
+                        (self._data, np.zeros(len(self._data), dtype=TRACK_DTYPE))
+                    )
+                self._data[self._length] = _record
 
-            self.track_history.append([_datetime, _lat, _lon, _alt, _comment])
+            if data_dict.get("comment", ""):
+                self.comments[self.total] = data_dict["comment"]
 
-            # Clip size of track history if a maximum number of elements is set.
-            if self.max_elements:
-                if len(self.track_history) > self.max_elements:
-                    self.track_history = self.track_history[1:]
+            self._length += 1
+            self.total += 1
+            self.latest_time = _datetime
 
             self.update_states()
             return self.get_latest_state()
@@ -180,18 +252,34 @@ class GenericTrack(object):
                 "Track - Error adding new telemetry to GenericTrack %s" % str(e)
             )
 
+    def get_track(self, since=0):
+        """ Get the retained track positions, as a view of the track array (refer TRACK_DTYPE).
+
+        Args:
+            since (int): Only return positions with a sequence number greater than this. Unless sequence numbers
+                were provided, this is the positions added after the first X positions (as per self.total).
+
+        Returns:
+            np.ndarray: Structured array of positions. This is a view into the track's storage, so must be
+                copied if it is to be kept while more positions are added.
+        """
+        _track = self._data[self._start : self._start + self._length]
+        if since > 0:
+            _track = _track[np.searchsorted(_track["seq"], since, side="right") :]
+        return _track
+
     def get_latest_state(self):
         """ Get the latest position of the payload """
 
-        if len(self.track_history) == 0:
+        if self._length == 0:
             return None
         else:
-            _latest_position = self.track_history[-1]
+            (_, _lat, _lon, _alt, _) = self.get_track()[-1].tolist()
             _state = {
-                "time": _latest_position[0],
-                "lat": _latest_position[1],
-                "lon": _latest_position[2],
-                "alt": _latest_position[3],
+                "time": self.latest_time,
+                "lat": _lat,
+                "lon": _lon,
+                "alt": _alt,
                 "ascent_rate": self.ascent_rate,
                 "is_descending": self.is_descending,
                 "landing_rate": self.landing_rate,
@@ -202,90 +290,209 @@ class GenericTrack(object):
 
     def calculate_ascent_rate(self):
         """ Calculate the ascent/descent rate of the payload based on the available data """
-        if len(self.track_history) <= 1:
+        if self._length <= 1:
             return 0.0
-        elif len(self.track_history) == 2:
-            # Basic ascent rate case - only 2 samples.
-            _time_delta = (
-                self.track_history[-1][0] - self.track_history[-2][0]
-            ).total_seconds()
-            _altitude_delta = self.track_history[-1][3] - self.track_history[-2][3]
 
-            return _altitude_delta / _time_delta
+        # Average the ascent rate over the last few positions (or just the last two, if that is all we have).
+        # The positions are converted to python floats, so a zero time difference raises an exception.
+        _num_samples = max(2, min(self._length, self.ASCENT_AVERAGING))
+        _track = self.get_track()[-_num_samples:].tolist()
+        _asc_rates = []
 
-        else:
-            _num_samples = min(len(self.track_history), self.ASCENT_AVERAGING)
-            _asc_rates = []
-
-            for _i in range(-1 * (_num_samples - 1), 0):
-                _time_delta = (
-                    self.track_history[_i][0] - self.track_history[_i - 1][0]
-                ).total_seconds()
-                _altitude_delta = (
-                    self.track_history[_i][3] - self.track_history[_i - 1][3]
-                )
-                _asc_rates.append(_altitude_delta / _time_delta)
-
-            return np.mean(_asc_rates)
-
-    def calculate_heading(self):
-        """ Calculate the heading of the payload """
-        if len(self.track_history) <= 1:
-            return 0.0
-        else:
-            _pos_1 = self.track_history[-2]
-            _pos_2 = self.track_history[-1]
+        for _i in range(1, _num_samples):
+            _time_delta = _track[_i][0] - _track[_i - 1][0]
+            _altitude_delta = _track[_i][3] - _track[_i - 1][3]
+            _asc_rates.append(_altitude_delta / _time_delta)
 
-            _pos_info = position_info(
-                (_pos_1[1], _pos_1[2], _pos_1[3]), (_pos_2[1], _pos_2[2], _pos_2[3])
-            )
-
-            return _pos_info["bearing"]
+        return sum(_asc_rates) / len(_asc_rates)
 
-    def calculate_speed(self):
-        """ Calculate Payload Speed in metres per second """
-        if len(self.track_history) <= 1:
-            return 0.0
+    def calculate_heading_speed(self):
+        """ Calculate the heading (degrees) and speed (metres per second) of the payload """
+        if self._length <= 1:
+            return (0.0, 0.0)
         else:
-            _time_delta = (
-                self.track_history[-1][0] - self.track_history[-2][0]
-            ).total_seconds()
-            _pos_1 = self.track_history[-2]
-            _pos_2 = self.track_history[-1]
+            (_pos_1, _pos_2) = self.get_track()[-2:].tolist()
+            _time_delta = _pos_2[0] - _pos_1[0]
 
+            # Heading and speed both come from the same pair of positions, so only calculate this once.
             _pos_info = position_info(
                 (_pos_1[1], _pos_1[2], _pos_1[3]), (_pos_2[1], _pos_2[2], _pos_2[3])
             )
 
             _speed = _pos_info["great_circle_distance"] / _time_delta
 
-            return _speed
+            return (_pos_info["bearing"], _speed)
 
     def update_states(self):
         """ Update internal states based on the current data """
         self.ascent_rate = self.calculate_ascent_rate()
-        self.heading = self.calculate_heading()
-        self.speed = self.calculate_speed()
+        (self.heading, self.speed) = self.calculate_heading_speed()
         self.is_descending = self.ascent_rate < 0.0
 
         if self.is_descending:
-            _current_alt = self.track_history[-1][3]
+            _current_alt = self.get_track()[-1].tolist()[3]
             self.landing_rate = seaLevelDescentRate(self.ascent_rate, _current_alt)
 
+    def positions(self, since=0):
+        """ Get the retained track positions as an (N, 3) array of [lat, lon, alt], without copying.
+        Refer get_track for the since argument. """
+        return track_positions(self.get_track(since))
+
     def to_polyline(self):
         """ Generate and return a Leaflet PolyLine compatible array """
-        # Copy array into a numpy representation for easier slicing.
-        if len(self.track_history) == 0:
+        if self._length == 0:
             return []
-        elif len(self.track_history) == 1:
+        elif self._length == 1:
             # LineStrings need at least 2 points. If we only have a single point,
             # fudge it by duplicating the single point.
-            _track_data_np = np.array([self.track_history[0], self.track_history[0]])
+            return self.positions().tolist() * 2
         else:
-            _track_data_np = np.array(self.track_history)
-        # Produce new array
-        _track_points = np.column_stack(
-            (_track_data_np[:, 1], _track_data_np[:, 2], _track_data_np[:, 3])
-        )
+            return self.positions().tolist()
+
+
+#
+# Path Simplification
+#
+# Paths are simplified using the Douglas-Peucker algorithm, with the distance of each point from the simplified
+# line measured in three dimensions (east/north/up, in metres). This means changes in altitude (i.e. the burst, or
+# a floating sonde) are retained even when the horizontal track is a straight line.
+#
+
+EARTH_RADIUS = 6371000.0
+
+# Metres per pixel at the equator, on a zoom level 0 web map (256 pixel tiles).
+ZOOM_0_RESOLUTION = 156543.03
+
+
+def zoom_to_tolerance(zoom):
+    """ Convert a web map zoom level to a simplification tolerance (one pixel at that zoom level), in metres. """
+    return ZOOM_0_RESOLUTION / math.pow(2, zoom)
+
 
-        return _track_points.tolist()
+def local_coordinates(lat, lon, alt, origin):
+    """ Convert positions to local east/north/up coordinates (metres) about an origin (lat, lon).
+    An equirectangular projection is used, which is adequate over the extent of a single flight.
+    Accepts either scalars or numpy arrays. """
+    _x = np.radians(lon - origin[1]) * EARTH_RADIUS * math.cos(math.radians(origin[0]))
+    _y = np.radians(lat - origin[0]) * EARTH_RADIUS
+    return (_x, _y, alt)
+
+
+def segment_distance(points, start, end):
+    """ Calculate the distance (metres) of a set of points (Nx3 array of local coordinates) from a line segment. """
+    _line = end - start
+    _offset = points - start
+    _length_sq = np.dot(_line, _line)
+    if _length_sq == 0:
+        return np.sqrt(np.sum(_offset ** 2, axis=1))
+
+    _t = np.clip(np.dot(_offset, _line) / _length_sq, 0.0, 1.0)
+    return np.sqrt(np.sum((_offset - np.outer(_t, _line)) ** 2, axis=1))
+
+
+def simplify_path(path, tolerance, keep=()):
+    """ Simplify a path using the Douglas-Peucker algorithm.
+
+    Args:
+        path (list): List of [lat, lon, alt] positions.
+        tolerance (float): Maximum distance (metres) of any removed point from the simplified path.
+        keep (list): Indexes of points which must be retained (i.e. the burst point).
+
+    Returns:
+        list: Indexes of the retained points, in order.
+    """
+    if (tolerance <= 0) or (len(path) <= 2):
+        return list(range(len(path)))
+
+    _path = np.asarray(path, dtype=float)[:, :3]
+    _points = np.column_stack(local_coordinates(_path[:, 0], _path[:, 1], _path[:, 2], _path[0]))
+
+    _keep = np.zeros(len(_points), dtype=bool)
+    _keep[0] = _keep[-1] = True
+    _keep[list(keep)] = True
+
+    # Simplify each section between the points we must keep.
+    _sections = np.flatnonzero(_keep)
+    _stack = list(zip(_sections[:-1], _sections[1:]))
+    while _stack:
+        (_start, _end) = _stack.pop()
+        if (_end - _start) < 2:
+            continue
+
+        _distance = segment_distance(_points[_start + 1 : _end], _points[_start], _points[_end])
+        _max = np.argmax(_distance)
+        if _distance[_max] > tolerance:
+            _split = _start + 1 + _max
+            _keep[_split] = True
+            _stack.append((_start, _split))
+            _stack.append((_split, _end))
+
+    return np.flatnonzero(_keep).tolist()
+
+
+class PathSimplifier(object):
+    """
+    Incrementally simplifies a path as positions are added, for live tracks.
+
+    This uses the 'opening window' variant of the Douglas-Peucker algorithm - positions are buffered until
+    the line from the last retained position to the newest position passes further than the tolerance from
+    any of the buffered positions, at which point the previous position is retained.
+    The most recent position is always included in the output, so the path ends at the current position.
+    """
+
+    def __init__(self, tolerance=10.0, max_window=100):
+        """
+        Args:
+            tolerance (float): Maximum distance (metres) of any removed position from the simplified path.
+            max_window (int): Retain a position at least every X positions. This bounds the work done per position.
+        """
+        self.tolerance = tolerance
+        self.max_window = max_window
+
+        self.origin = None
+        # Local coordinates of the last retained position.
+        self._anchor = None
+        # Retained positions, and the keys (i.e. sequence numbers) provided with them.
+        self.path = []
+        self.keys = []
+        # Positions since the last retained position, as (local coordinates, position, key) tuples.
+        self.window = []
+
+    def add(self, position, key=None):
+        """ Add a [lat, lon, alt] position to the path. """
+        if self.origin is None:
+            self.origin = position
+
+        _point = np.array(local_coordinates(position[0], position[1], position[2], self.origin))
+
+        if not self.path:
+            self.path.append(position)
+            self.keys.append(key)
+            self._anchor = _point
+            return
+
+        if self.window:
+            _full = len(self.window) >= self.max_window
+            if not _full:
+                _points = np.array([_entry[0] for _entry in self.window])
+                _full = np.max(segment_distance(_points, self._anchor, _point)) > self.tolerance
+
+            if _full:
+                # The previous position can no longer be dropped, so retain it.
+                (self._anchor, _position, _key) = self.window[-1]
+                self.path.append(_position)
+                self.keys.append(_key)
+                self.window = []
+
+        self.window.append((_point, position, key))
+
+    def get_path(self):
+        """ Get the simplified path.
+
+        Returns:
+            tuple: (list of [lat, lon, alt] positions, list of the keys provided with those positions)
+        """
+        if self.window:
+            return (self.path + [self.window[-1][1]], self.keys + [self.window[-1][2]])
+        else:
+            return (list(self.path), list(self.keys))
@@ -0,0 +1,345 @@
+#!/usr/bin/env python
+#
+#   radiosonde_auto_rx - Telemetry Journal
+#
+#   Copyright (C) 2021  Mark Jessop <vk5qi@rfhead.net>
+#   Released under GNU GPL v3 or later
+#
+#   A crash-safe alternative to the CSV sonde log files. Each CSV line is written as a length-prefixed,
+#   checksummed record, so a record which was only partially written (i.e. due to a power failure) is detected
+#   and discarded, rather than corrupting the log. Checkpoint records are written periodically, so the last
+#   valid record can be found by searching back to the last checkpoint, without reading the whole journal.
+#
+#   The CSV view of a journal (i.e. the equivalent sonde log file) is the concatenation of its line records.
+#
+#   File layout:
+#       8 bytes     Magic (ARXJNL01)
+#       ...         Records:
+#                       4 bytes     Payload length (little-endian uint32)
+#                       4 bytes     CRC32 of the record type and payload (little-endian uint32)
+#                       1 byte      Record type (1 = CSV line, 2 = checkpoint)
+#                       N bytes     Payload
+#
+#   Checkpoint payload:
+#       8 bytes     Checkpoint sync marker (ARXCKPT1)
+#       8 bytes     Number of line records written before this checkpoint (little-endian uint64)
+#       8 bytes     Offset of the previous checkpoint, or 0 if there is none (little-endian uint64)
+#       8 bytes     Offset of the last line record, or 0 if there is none (little-endian uint64)
+#
+import logging
+import os
+import struct
+import tempfile
+import zlib
+
+
+JOURNAL_MAGIC = b"ARXJNL01"
+JOURNAL_SUFFIX = ".journal"
+
+RECORD_HEADER = struct.Struct("<IIB")
+RECORD_LINE = 1
+RECORD_CHECKPOINT = 2
+
+CHECKPOINT_SYNC = b"ARXCKPT1"
+CHECKPOINT_DATA = struct.Struct("<QQQ")
+
+# Write a checkpoint every X line records.
+CHECKPOINT_INTERVAL = 64
+
+# Records longer than this are assumed to be corrupt.
+MAX_RECORD_LENGTH = 65536
+
+
+def journal_filename(log_filename):
+    """ Get the journal filename for a sonde log file (i.e. ..._sonde.log -> ..._sonde.journal) """
+    return os.path.splitext(log_filename)[0] + JOURNAL_SUFFIX
+
+
+def is_journal(filename):
+    """ Check if a filename is a journal. """
+    return filename.endswith(JOURNAL_SUFFIX)
+
+
+def encode_record(record_type, payload):
+    """ Produce a journal record. """
+    _crc = zlib.crc32(bytes([record_type]) + payload)
+    return RECORD_HEADER.pack(len(payload), _crc, record_type) + payload
+
+
+def read_records(f, offset):
+    """ Read records from a journal, stopping at the end of the file or the first invalid record.
+
+    Args:
+        f (file): Journal file, opened in binary mode.
+        offset (int): Offset of the first record to read.
+
+    Returns:
+        generator: Produces (offset, record type, payload) tuples. Once the generator is exhausted, the offset of
+            the end of the last valid record can be read using f.tell().
+    """
+    f.seek(offset)
+    while True:
+        _header = f.read(RECORD_HEADER.size)
+        if len(_header) < RECORD_HEADER.size:
+            break
+
+        (_length, _crc, _type) = RECORD_HEADER.unpack(_header)
+        if _length > MAX_RECORD_LENGTH:
+            break
+
+        _payload = f.read(_length)
+        if (len(_payload) < _length) or (zlib.crc32(bytes([_type]) + _payload) != _crc):
+            break
+
+        yield (offset, _type, _payload)
+        offset += RECORD_HEADER.size + _length
+
+    # Leave the file positioned at the end of the last valid record.
+    f.seek(offset)
+
+
+def find_last_checkpoint(f, size, chunk_size=65536):
+    """ Search back from the end of a journal for the last valid checkpoint.
+
+    Returns:
+        tuple: (offset, line records before the checkpoint, offset of the previous checkpoint,
+            offset of the last line record), or None if no checkpoint was found.
+    """
+    _end = size
+    while _end > len(JOURNAL_MAGIC):
+        _start = max(len(JOURNAL_MAGIC), _end - chunk_size)
+        # Overlap the chunks, so a checkpoint spanning two chunks is still found.
+        f.seek(_start)
+        _chunk = f.read(min(size, _end + RECORD_HEADER.size + len(CHECKPOINT_SYNC)) - _start)
+
+        _pos = _chunk.rfind(CHECKPOINT_SYNC)
+        while _pos >= 0:
+            _offset = _start + _pos - RECORD_HEADER.size
+            if _offset >= len(JOURNAL_MAGIC):
+                for (_, _type, _payload) in read_records(f, _offset):
+                    if (_type == RECORD_CHECKPOINT) and _payload.startswith(CHECKPOINT_SYNC):
+                        return (_offset,) + CHECKPOINT_DATA.unpack(_payload[len(CHECKPOINT_SYNC) :])
+                    break
+
+            _pos = _chunk.rfind(CHECKPOINT_SYNC, 0, _pos)
+
+        _end = _start
+
+    return None
+
+
+def recover_journal(f):
+    """ Find the end of the valid data in a journal, reading only the records after the last checkpoint.
+
+    Args:
+        f (file): Journal file, opened in binary mode.
+
+    Returns:
+        dict: Journal state, containing:
+            'end' (int): Offset of the end of the last valid record.
+            'records' (int): Number of line records.
+            'checkpoint' (int): Offset of the last checkpoint, or 0 if there is none.
+            'last_line_offset' (int): Offset of the last line record, or 0 if there is none.
+            'last_line' (bytes/None): The last line record.
+    """
+    f.seek(0, os.SEEK_END)
+    _size = f.tell()
+
+    f.seek(0)
+    if f.read(len(JOURNAL_MAGIC)) != JOURNAL_MAGIC:
+        raise ValueError("Not a journal file.")
+
+    _state = {
+        "end": len(JOURNAL_MAGIC),
+        "records": 0,
+        "checkpoint": 0,
+        "last_line_offset": 0,
+        "last_line": None,
+    }
+
+    _checkpoint = find_last_checkpoint(f, _size)
+    if _checkpoint is not None:
+        (
+            _state["checkpoint"],
+            _state["records"],
+            _,
+            _state["last_line_offset"],
+        ) = _checkpoint
+        _state["end"] = _state["checkpoint"]
+
+    for (_offset, _type, _payload) in read_records(f, _state["end"]):
+        if _type == RECORD_LINE:
+            _state["records"] += 1
+            _state["last_line_offset"] = _offset
+            _state["last_line"] = _payload
+        elif _type == RECORD_CHECKPOINT:
+            _state["checkpoint"] = _offset
+
+    _state["end"] = f.tell()
+
+    if (_state["last_line"] is None) and (_state["last_line_offset"] > 0):
+        # No line records after the last checkpoint, so read the last line record it refers to.
+        for (_, _type, _payload) in read_records(f, _state["last_line_offset"]):
+            _state["last_line"] = _payload
+            break
+
+    return _state
+
+
+def read_journal_lines(filename):
+    """ Read the lines (as bytes) from a journal, up until the last valid record. """
+    with open(filename, "rb") as _f:
+        if _f.read(len(JOURNAL_MAGIC)) != JOURNAL_MAGIC:
+            raise ValueError("Not a journal file.")
+
+        for (_, _type, _payload) in read_records(_f, len(JOURNAL_MAGIC)):
+            if _type == RECORD_LINE:
+                yield _payload
+
+
+def read_journal(filename):
+    """ Read the CSV view of a journal.
+
+    Returns:
+        bytes: The CSV log file contents.
+    """
+    return b"".join(read_journal_lines(filename))
+
+
+def journal_last_line(filename):
+    """ Read the last line of a journal, without reading the whole journal.
+
+    Returns:
+        str/None: The last line (without the trailing newline), or None if the journal is empty.
+    """
+    with open(filename, "rb") as _f:
+        _line = recover_journal(_f)["last_line"]
+
+    if _line is None:
+        return None
+
+    return _line.rstrip(b"\n").decode("ascii", errors="replace")
+
+
+def journal_to_csv(filename, output=None):
+    """ Write out the CSV view of a journal. The CSV file is written to a temporary file and then moved into place.
+
+    Args:
+        filename (str): Journal filename.
+        output (str): CSV log filename. Defaults to the journal filename, with a .log extension.
+
+    Returns:
+        str: The CSV log filename.
+    """
+    if output is None:
+        output = os.path.splitext(filename)[0] + ".log"
+
+    _fd, _temp_filename = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(output)), suffix=".tmp"
+    )
+    try:
+        with os.fdopen(_fd, "wb") as _f:
+            for _line in read_journal_lines(filename):
+                _f.write(_line)
+
+        os.chmod(_temp_filename, 0o644)
+        os.replace(_temp_filename, output)
+    except Exception:
+        os.unlink(_temp_filename)
+        raise
+
+    return output
+
+
+class JournalWriter(object):
+    """ Appends CSV lines to a journal. Has the same write/flush/close interface as a text file,
+    so it can be used in place of a CSV log file. """
+
+    def __init__(self, filename, buffering=-1, checkpoint_interval=CHECKPOINT_INTERVAL):
+        """ Open a journal for appending, creating it if it does not exist.
+
+        If the journal ends with a partially written record (i.e. after a power failure), it is truncated
+        back to the end of the last valid record.
+
+        Args:
+            filename (str): Journal filename.
+            buffering (int): Buffer size, as per open().
+            checkpoint_interval (int): Write a checkpoint every X line records.
+        """
+        self.name = filename
+        self.checkpoint_interval = checkpoint_interval
+
+        if os.path.exists(filename) and (os.path.getsize(filename) > 0):
+            with open(filename, "r+b") as _f:
+                _state = recover_journal(_f)
+                _f.seek(0, os.SEEK_END)
+                if _f.tell() > _state["end"]:
+                    logging.warning(
+                        "Journal - Discarding %d bytes of incomplete data from %s"
+                        % (_f.tell() - _state["end"], filename)
+                    )
+                    _f.truncate(_state["end"])
+
+            self.offset = _state["end"]
+            self.records = _state["records"]
+            self.last_checkpoint = _state["checkpoint"]
+            self.last_line_offset = _state["last_line_offset"]
+            self.file = open(filename, "ab", buffering=buffering)
+        else:
+            self.file = open(filename, "ab", buffering=buffering)
+            self.file.write(JOURNAL_MAGIC)
+            self.offset = len(JOURNAL_MAGIC)
+            self.records = 0
+            self.last_checkpoint = 0
+            self.last_line_offset = 0
+
+        self.checkpoint_records = self.records
+
+    def write(self, line):
+        """ Write a line (including its trailing newline) to the journal.
+        Any non-ASCII characters (i.e. in aux data) are replaced with '?'. """
+        _record = encode_record(RECORD_LINE, line.encode("ascii", errors="replace"))
+        self.file.write(_record)
+        self.last_line_offset = self.offset
+        self.offset += len(_record)
+        self.records += 1
+
+        if (self.records - self.checkpoint_records) >= self.checkpoint_interval:
+            self.checkpoint()
+
+        return len(line)
+
+    def checkpoint(self):
+        """ Write a checkpoint record. """
+        _record = encode_record(
+            RECORD_CHECKPOINT,
+            CHECKPOINT_SYNC
+            + CHECKPOINT_DATA.pack(self.records, self.last_checkpoint, self.last_line_offset),
+        )
+        self.file.write(_record)
+        self.last_checkpoint = self.offset
+        self.offset += len(_record)
+        self.checkpoint_records = self.records
+
+    def flush(self):
+        self.file.flush()
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        """ Write a final checkpoint (if any lines have been written since the last one), and close the journal. """
+        if self.records > self.checkpoint_records:
+            self.checkpoint()
+        self.file.close()
+
+
+if __name__ == "__main__":
+    # Convert telemetry journals to CSV log files.
+    # Usage: python -m autorx.journal <journal files>
+    import sys
+
+    logging.basicConfig(format="%(asctime)s %(levelname)s:%(message)s", level=logging.INFO)
+
+    for _filename in sys.argv[1:]:
+        logging.info("Wrote %s" % journal_to_csv(_filename))
@@ -0,0 +1,509 @@
+#!/usr/bin/env python
+#
+#   radiosonde_auto_rx - Log File Archiving
+#
+#   Copyright (C) 2021  Mark Jessop <vk5qi@rfhead.net>
+#   Released under GNU GPL v3 or later
+#
+#   Compresses old sonde log files (gzip, xz, or zstd if the zstandard library is available), and
+#   optionally moves them into monthly bundle directories (<log directory>/archive/YYYYMM/).
+#   The functions in this module allow compressed and archived log files to be read as if they were
+#   regular log files.
+#
+#   Telemetry journals (refer autorx.journal) are also read via the functions in this module, as their CSV view.
+#
+#   Compressed log files are written as two compressed members - the first containing all but the last line
+#   of the log file, and the second containing just the last line. Decompressing the file as a whole gives the
+#   original log file, and the last line can be read by decompressing only the last few hundred bytes of the file.
+#
+import gzip
+import io
+import logging
+import lzma
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+
+from autorx.flight_store import flight_store_filename
+from autorx.journal import JOURNAL_SUFFIX, is_journal, journal_last_line, read_journal
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Uncompressed log files end with this suffix.
+LOG_SUFFIX = "_sonde.log"
+
+# Compression formats, and their file extensions.
+COMPRESSION_FORMATS = {"gzip": ".gz", "xz": ".xz", "zstd": ".zst"}
+
+# Magic numbers at the start of each compressed member.
+COMPRESSION_MAGIC = {
+    "gzip": b"\x1f\x8b\x08",
+    "xz": b"\xfd7zXZ\x00",
+    "zstd": b"\x28\xb5\x2f\xfd",
+}
+
+# Archived log files are moved into monthly directories within this directory.
+ARCHIVE_DIRECTORY = "archive"
+
+# Rough size reduction of compressed log files, used to estimate the number of lines in a compressed log.
+COMPRESSION_RATIO_ESTIMATE = 6
+
+# Search this many bytes back from the end of a file for the last line.
+LAST_LINE_WINDOW = 4096
+
+
+def compression_format(filename):
+    """ Get the compression format of a log file from its extension.
+
+    Returns:
+        str/None: Compression format (refer COMPRESSION_FORMATS), or None if the file is not compressed.
+    """
+    for (_format, _extension) in COMPRESSION_FORMATS.items():
+        if filename.endswith(_extension):
+            return _format
+
+    return None
+
+
+def is_log_file(filename):
+    """ Check if a filename is a (possibly compressed) sonde log file, or a telemetry journal. """
+    return log_name(filename).endswith(LOG_SUFFIX)
+
+
+def log_name(filename):
+    """ Get the name of a log file as originally written, i.e. with any directory and compression extension removed.
+    (archive/202104/20210430-235413_IMET-89F2720A_IMET_401999_sonde.log.gz -> 20210430-235413_IMET-89F2720A_IMET_401999_sonde.log)
+    """
+    _name = os.path.basename(filename)
+    _format = compression_format(_name)
+    if _format is not None:
+        _name = _name[: -len(COMPRESSION_FORMATS[_format])]
+    elif is_journal(_name):
+        _name = _name[: -len(JOURNAL_SUFFIX)] + ".log"
+
+    return _name
+
+
+def log_directory_of(filename):
+    """ Get the log directory a (possibly archived) log file belongs to. """
+    _directory = os.path.dirname(filename)
+    if os.path.basename(os.path.dirname(_directory)) == ARCHIVE_DIRECTORY:
+        # Within a monthly bundle directory - <log directory>/archive/YYYYMM/
+        _directory = os.path.dirname(os.path.dirname(_directory))
+
+    return _directory
+
+
+def list_log_paths(log_directory):
+    """ List all the log files within a log directory, including compressed log files and archive bundles.
+
+    Returns:
+        list: Paths to the log files, in no particular order.
+    """
+    _paths = []
+
+    for _entry in os.scandir(log_directory):
+        if _entry.is_file() and is_log_file(_entry.name):
+            _paths.append(_entry.path)
+
+    _archive = os.path.join(log_directory, ARCHIVE_DIRECTORY)
+    if os.path.isdir(_archive):
+        for _bundle in os.scandir(_archive):
+            if not _bundle.is_dir():
+                continue
+            for _entry in os.scandir(_bundle.path):
+                if _entry.is_file() and is_log_file(_entry.name):
+                    _paths.append(_entry.path)
+
+    return _paths
+
+
+def open_log_file(filename, mode="r"):
+    """ Open a (possibly compressed) log file, or the CSV view of a telemetry journal, for reading.
+
+    Args:
+        filename (str): Path to the log file.
+        mode (str): 'r' to read as text, or 'rb' to read the (decompressed) bytes.
+
+    Returns:
+        file: A file-like object.
+    """
+    _format = compression_format(filename)
+
+    if is_journal(filename):
+        _file = io.BytesIO(read_journal(filename))
+        return _file if mode == "rb" else io.TextIOWrapper(_file)
+
+    if _format is None:
+        return open(filename, mode)
+
+    if _format == "gzip":
+        _file = gzip.open(filename, "rb")
+    elif _format == "xz":
+        _file = lzma.open(filename, "rb")
+    else:
+        if zstandard is None:
+            raise IOError("zstandard library not available to read %s" % filename)
+        _file = zstandard.ZstdDecompressor().stream_reader(
+            open(filename, "rb"), read_across_frames=True, closefd=True
+        )
+
+    if mode == "rb":
+        return _file
+    else:
+        return io.TextIOWrapper(_file)
+
+
+def log_file_size(filename):
+    """ Get the size of a log file, or an estimate of its uncompressed size if it is compressed. """
+    _size = os.path.getsize(filename)
+
+    if compression_format(filename) is None:
+        return _size
+    else:
+        return _size * COMPRESSION_RATIO_ESTIMATE
+
+
+def decompress_member(data, format):
+    """ Decompress data from the start of a compressed member through to the end of the data.
+    Raises an exception if the data is not valid. """
+    if format == "gzip":
+        return gzip.decompress(data)
+    elif format == "xz":
+        return lzma.decompress(data, format=lzma.FORMAT_XZ)
+    else:
+        _decompressor = zstandard.ZstdDecompressor().decompressobj()
+        _data = _decompressor.decompress(data)
+        if (not _decompressor.eof) or _decompressor.unused_data:
+            raise ValueError("Not a single complete zstd frame.")
+        return _data
+
+
+def read_last_line(filename):
+    """ Read the last line of a (possibly compressed) log file, without reading the whole file.
+
+    Returns:
+        str/None: The last line (without the trailing newline), or None if it could not be found.
+    """
+    if is_journal(filename):
+        return journal_last_line(filename)
+
+    _format = compression_format(filename)
+
+    with open(filename, "rb") as _f:
+        _size = os.fstat(_f.fileno()).st_size
+        _start = max(0, _size - LAST_LINE_WINDOW)
+        _f.seek(_start)
+        _tail = _f.read()
+
+    _lines = None
+
+    if _format is None:
+        _lines = _tail.split(b"\n")
+    else:
+        # Find the start of the last compressed member. Look back through any matches for the member magic
+        # number (which may also occur within the compressed data) until we find one which decompresses cleanly.
+        _magic = COMPRESSION_MAGIC[_format]
+        _pos = _tail.rfind(_magic)
+        while _pos >= 0:
+            try:
+                _lines = decompress_member(_tail[_pos:], _format).split(b"\n")
+                break
+            except Exception:
+                _pos = _tail.rfind(_magic, 0, _pos)
+
+        if _lines is None:
+            # Not written by compress_log_file (i.e. compressed by another tool), so decompress the whole file.
+            with open_log_file(filename, "rb") as _f:
+                _lines = list(deque(_f, maxlen=2))
+            _lines = b"".join(_lines).split(b"\n")
+
+    # Discard the empty string after the trailing newline (or any partially written line).
+    _lines = _lines[:-1]
+    if (_format is None) and (_start > 0):
+        # The first line read from an uncompressed file may be incomplete.
+        _lines = _lines[1:]
+
+    if len(_lines) == 0:
+        return None
+
+    return _lines[-1].decode("ascii", errors="replace")
+
+
+def compressor(fileobj, format, filename):
+    """ Create a writer for a single compressed member, written to fileobj. """
+    if format == "gzip":
+        return gzip.GzipFile(filename=filename, mode="wb", fileobj=fileobj, mtime=0)
+    elif format == "xz":
+        return lzma.LZMAFile(fileobj, mode="wb")
+    else:
+        return zstandard.ZstdCompressor(write_checksum=True).stream_writer(
+            fileobj, closefd=False
+        )
+
+
+def copy_range(source, destination, length, chunk_size=65536):
+    """ Copy length bytes from one file object to another. """
+    while length > 0:
+        _chunk = source.read(min(chunk_size, length))
+        if not _chunk:
+            break
+        destination.write(_chunk)
+        length -= len(_chunk)
+
+
+def compress_log_file(filename, format="gzip", output_directory=None):
+    """ Write a compressed copy of a log file, with the last line in a separate compressed member.
+
+    The compressed file is written to a temporary file and then moved into place. The original file is not removed.
+
+    Args:
+        filename (str): Path to the (uncompressed) log file or journal.
+        format (str): Compression format (refer COMPRESSION_FORMATS).
+        output_directory (str): Directory to write the compressed file to. Defaults to the log file's directory.
+
+    Returns:
+        str: Path to the compressed log file.
+    """
+    if format not in COMPRESSION_FORMATS:
+        raise ValueError("Unknown compression format: %s" % format)
+    if (format == "zstd") and (zstandard is None):
+        raise ValueError("zstandard library not available.")
+
+    if output_directory is None:
+        output_directory = os.path.dirname(filename)
+
+    _name = log_name(filename)
+    _output = os.path.join(output_directory, _name + COMPRESSION_FORMATS[format])
+
+    with open_log_file(filename, "rb") as _src:
+        # Find the start of the last line.
+        _size = _src.seek(0, os.SEEK_END)
+        _start = max(0, _size - LAST_LINE_WINDOW)
+        _src.seek(_start)
+        _tail = _src.read()
+        _split = _start + _tail.rfind(b"\n", 0, len(_tail) - 1) + 1
+
+        _fd, _temp_filename = tempfile.mkstemp(dir=output_directory, suffix=".tmp")
+        try:
+            with os.fdopen(_fd, "wb") as _dest:
+                _src.seek(0)
+                if _split > 0:
+                    with compressor(_dest, format, _name) as _member:
+                        copy_range(_src, _member, _split)
+                with compressor(_dest, format, _name) as _member:
+                    copy_range(_src, _member, _size - _split)
+
+            os.chmod(_temp_filename, 0o644)
+            os.replace(_temp_filename, _output)
+        except Exception:
+            os.unlink(_temp_filename)
+            raise
+
+    return _output
+
+
+# Held while log files are being replaced by compressed or restored copies, and while the
+# TelemetryLogger re-opens existing log files, so a log file is never moved from under the logger.
+log_file_lock = threading.Lock()
+
+
+def restore_log_file(filename):
+    """ Decompress a log file back into the top-level of its log directory, so it can be appended to.
+    The compressed log file is removed.
+
+    Args:
+        filename (str): Path to the compressed log file.
+
+    Returns:
+        str: Path to the uncompressed log file.
+    """
+    _log_directory = log_directory_of(filename)
+    _output = os.path.join(_log_directory, log_name(filename))
+
+    _fd, _temp_filename = tempfile.mkstemp(dir=_log_directory, suffix=".tmp")
+    try:
+        with open_log_file(filename, "rb") as _src, os.fdopen(_fd, "wb") as _dest:
+            while True:
+                _chunk = _src.read(65536)
+                if not _chunk:
+                    break
+                _dest.write(_chunk)
+
+        os.chmod(_temp_filename, 0o644)
+        os.replace(_temp_filename, _output)
+    except Exception:
+        os.unlink(_temp_filename)
+        raise
+
+    os.unlink(filename)
+    return _output
+
+
+class LogArchiver(object):
+    """ Background thread which compresses old log files, and moves them into monthly bundle directories. """
+
+    # Check for log files to archive every X seconds.
+    CHECK_INTERVAL = 3600
+
+    def __init__(self, log_directory, compress_days=30, compression="gzip", bundle_days=0):
+        """ Initialise and start a Log Archiver.
+
+        Args:
+            log_directory (str): Log directory.
+            compress_days (float): Compress log files which have not been modified for this many days (0 = disabled).
+            compression (str): Compression format (refer COMPRESSION_FORMATS).
+            bundle_days (float): Move log files which have not been modified for this many days into monthly
+                bundle directories (0 = disabled).
+        """
+        self.log_directory = log_directory
+        self.compress_days = compress_days
+        self.compression = compression
+        self.bundle_days = bundle_days
+
+        if (self.compression == "zstd") and (zstandard is None):
+            self.log_warning("zstandard library not available, using gzip compression.")
+            self.compression = "gzip"
+
+        self.running = True
+        self.archive_thread = threading.Thread(target=self.run)
+        self.archive_thread.daemon = True
+        self.archive_thread.start()
+
+    def run(self):
+        """ Periodically archive log files. """
+        _next_check = time.time() + 60
+
+        while self.running:
+            if time.time() > _next_check:
+                try:
+                    self.archive()
+                except Exception as e:
+                    self.log_error("Error archiving log files - %s" % str(e))
+                _next_check = time.time() + self.CHECK_INTERVAL
+
+            time.sleep(1)
+
+    def archive(self):
+        """ Compress and bundle any log files which are old enough.
+
+        Returns:
+            int: Number of log files archived.
+        """
+        _now = time.time()
+        _archived = 0
+
+        for _path in sorted(list_log_paths(self.log_directory)):
+            if not self.running:
+                break
+
+            _age = (_now - os.path.getmtime(_path)) / 86400.0
+            _compress = (
+                (self.compress_days > 0)
+                and (_age > self.compress_days)
+                and (compression_format(_path) is None)
+            )
+            _bundle = (
+                (self.bundle_days > 0)
+                and (_age > self.bundle_days)
+                and (os.path.abspath(log_directory_of(_path)) == os.path.abspath(os.path.dirname(_path)))
+            )
+
+            if not (_compress or _bundle):
+                continue
+
+            try:
+                self.archive_file(_path, _compress, _bundle)
+                _archived += 1
+            except Exception as e:
+                self.log_error("Could not archive %s - %s" % (os.path.basename(_path), str(e)))
+
+        if _archived > 0:
+            self.log_info("Archived %d log files." % _archived)
+
+        return _archived
+
+    def archive_file(self, filename, compress, bundle):
+        """ Compress a log file, and/or move it into its monthly bundle directory. """
+        # Imported here to avoid a circular import.
+        from autorx.log_files import log_catalog_update
+
+        _output_directory = os.path.dirname(filename)
+        if bundle:
+            # Log files are named YYYYMMDD-HHMMSS_..., so are bundled by the first 6 characters.
+            _output_directory = os.path.join(
+                self.log_directory, ARCHIVE_DIRECTORY, log_name(filename)[:6]
+            )
+            os.makedirs(_output_directory, exist_ok=True)
+
+        _stat = os.stat(filename)
+
+        if compress:
+            # Telemetry journals are compressed as their CSV view.
+            _output = compress_log_file(
+                filename, format=self.compression, output_directory=_output_directory
+            )
+        else:
+            _output = os.path.join(_output_directory, os.path.basename(filename))
+
+        with log_file_lock:
+            # Don't remove the log file if it has been written to while it was being compressed.
+            _new_stat = os.stat(filename)
+            if (_new_stat.st_mtime != _stat.st_mtime) or (_new_stat.st_size != _stat.st_size):
+                if compress:
+                    os.unlink(_output)
+                self.log_info("%s modified while archiving, skipping." % os.path.basename(filename))
+                return
+
+            if compress:
+                os.unlink(filename)
+            else:
+                os.replace(filename, _output)
+
+        # The flight store is a cache of the log file, and will be re-created if required.
+        _store = flight_store_filename(os.path.join(os.path.dirname(filename), log_name(filename)))
+        if os.path.exists(_store):
+            os.unlink(_store)
+
+        log_catalog_update(filename)
+        log_catalog_update(_output, summarise=True)
+
+        self.log_debug("Archived %s to %s" % (os.path.basename(filename), _output))
+
+    def close(self):
+        """ Stop the archiver thread. """
+        self.running = False
+
+    def log_debug(self, line):
+        """ Helper function to log a debug message with a descriptive heading.
+        Args:
+            line (str): Message to be logged.
+        """
+        logging.debug("Log Archiver - %s" % line)
+
+    def log_info(self, line):
+        """ Helper function to log an informational message with a descriptive heading.
+        Args:
+            line (str): Message to be logged.
+        """
+        logging.info("Log Archiver - %s" % line)
+
+    def log_warning(self, line):
+        """ Helper function to log a warning message with a descriptive heading.
+        Args:
+            line (str): Message to be logged.
+        """
+        logging.warning("Log Archiver - %s" % line)
+
+    def log_error(self, line):
+        """ Helper function to log an error message with a descriptive heading.
+        Args:
+            line (str): Message to be logged.
+        """
+        logging.error("Log Archiver - %s" % line)
@@ -8,33 +8,59 @@
 import autorx
 import autorx.config
 import datetime
-import glob
-import io
+import fnmatch
+import hashlib
+import json
 import logging
 import os.path
+import sqlite3
+import threading
 import time
 import zipfile
+from collections import OrderedDict
 
 import numpy as np
 
 from dateutil.parser import parse
+from dateutil.tz import tzutc
 from autorx.utils import (
     short_type_lookup,
     short_short_type_lookup,
     readable_timedelta,
     strip_sonde_serial,
-    position_info,
+    position_info_array,
+)
+from autorx.geometry import GenericTrack, getDensity, simplify_path
+from autorx.flight_store import (
+    FLIGHT_STORE_SUFFIX,
+    flight_store_filename,
+    read_flight_store,
+    write_flight_store,
+)
+from autorx.journal import is_journal
+from autorx.log_archive import (
+    compression_format,
+    list_log_paths,
+    log_directory_of,
+    log_file_size,
+    log_name,
+    open_log_file,
+    read_last_line,
 )
-from autorx.geometry import GenericTrack, getDensity
 
 
-def log_filename_to_stats(filename, quicklook=False):
-    """ Attempt to extract information about a log file from a supplied filename """
+def log_filename_to_info(filename):
+    """ Extract the static information about a log file from its filename and size.
+
+    Returns:
+        dict/None: Log file information (datetime, serial, type, short_type, freq, lines), or None if the
+            log file is empty or the filename cannot be parsed.
+    """
     # Example log file name: 20210430-235413_IMET-89F2720A_IMET_401999_sonde.log
     # ./log/20200320-063233_R2230624_RS41_402500_sonde.log
 
     # Get a rough estimate of the number of lines of telemetry
-    _filesize = os.path.getsize(filename)
+    _filesize = log_file_size(filename)
     # Don't try and load files without data.
     if _filesize < 140:
         return None
@@ -44,9 +70,7 @@ def log_filename_to_stats(filename, quicklook=False):
     if _lines <= 0:
         _lines = 1
 
-    _basename = os.path.basename(filename)
-
-    _now_dt = datetime.datetime.now(datetime.timezone.utc)
+    _basename = log_name(filename)
 
     try:
         _fields = _basename.split("_")
@@ -55,10 +79,6 @@ def log_filename_to_stats(filename, quicklook=False):
         _date_str = _fields[0] + "Z"
         _date_dt = parse(_date_str)
 
-        # Calculate age
-        _age_td = _now_dt - _date_dt
-        _time_delta = readable_timedelta(_age_td)
-
         # Re-format date
         _date_str2 = _date_dt.strftime("%Y-%m-%dT%H:%M:%SZ")
 
@@ -73,9 +93,8 @@ def log_filename_to_stats(filename, quicklook=False):
         # Fourth field is the sonde frequency in kHz
         _freq = float(_fields[3]) / 1e3
 
-        _output = {
+        return {
             "datetime": _date_str2,
-            "age": _time_delta,
             "serial": _serial,
             "type": _type_str,
             "short_type": _short_type,
@@ -83,110 +102,159 @@ def log_filename_to_stats(filename, quicklook=False):
             "lines": _lines,
         }
 
-        if quicklook:
-            try:
-                _quick = log_quick_look(filename)
-                if _quick:
-                    _output["first"] = _quick["first"]
-                    _output["last"] = _quick["last"]
-                    _output["has_snr"] = _quick["has_snr"]
-                    _output["max_range"] = int(max(_output["first"]["range_km"],_output["last"]["range_km"]))
-                    _output["last_range"] = int(_output["last"]["range_km"])
-                    _output["min_height"] = int(_output["last"]["alt"])
-            except Exception as e:
-                logging.error(f"Could not quicklook file {filename}: {str(e)}")
-
-        return _output
-
     except Exception as e:
         logging.exception(f"Could not parse filename {_basename}", e)
         return None
 
 
-def log_quick_look(filename):
-    """ Attempt to read in the first and last line in a log file, and return the first/last position observed. """
-
-    _filesize = os.path.getsize(filename)
+def log_info_to_stats(info, quick=None):
+    """ Produce the log file statistics provided to the web interface, from the static log file information
+    (as per log_filename_to_info), and optionally the first/last positions (as per log_quick_look_positions).
+    The log age, and ranges from the station, are calculated at this point as they change over time. """
+    return log_infos_to_stats([info], [quick])[0]
 
-    # Open the file and get the header line
-    _file = open(filename, "r")
-    _header = _file.readline()
 
-    # Discard anything
-    if "timestamp,serial,frame,lat,lon,alt" not in _header:
-        return None
+def log_infos_to_stats(infos, quicks):
+    """ Produce the log file statistics for many log files at once, as per log_info_to_stats.
+    The ranges to the first/last positions of all log files are calculated in a single batch. """
 
-    _output = {}
+    _now_dt = datetime.datetime.now(datetime.timezone.utc)
 
-    if "snr" in _header:
-        _output["has_snr"] = True
-    else:
-        _output["has_snr"] = False
+    # Gather up the first/last positions from all the log files.
+    _positions = []
+    for _quick in quicks:
+        if _quick:
+            for _point in ["first", "last"]:
+                _positions.append(
+                    (_quick[_point]["lat"], _quick[_point]["lon"], _quick[_point]["alt"])
+                )
 
-    try:
-        # Naeive read of the first data line
-        _first = _file.readline()
-        _fields = _first.split(",")
-        _first_datetime = _fields[0]
-        _serial = _fields[1]
-        _first_lat = float(_fields[3])
-        _first_lon = float(_fields[4])
-        _first_alt = float(_fields[5])
-        _pos_info = position_info(
+    if _positions:
+        _pos_info = position_info_array(
             (
                 autorx.config.global_config["station_lat"],
                 autorx.config.global_config["station_lon"],
                 autorx.config.global_config["station_alt"],
             ),
-            (_first_lat, _first_lon, _first_alt),
+            _positions,
         )
-        _output["first"] = {
-            "datetime": _first_datetime,
-            "lat": _first_lat,
-            "lon": _first_lon,
-            "alt": _first_alt,
-            "range_km": _pos_info["straight_distance"] / 1000.0,
-            "bearing": _pos_info["bearing"],
-            "elevation": _pos_info["elevation"],
-        }
+        _ranges = (_pos_info["straight_distance"] / 1000.0).tolist()
+        _bearings = _pos_info["bearing"].tolist()
+        _elevations = _pos_info["elevation"].tolist()
+
+    _outputs = []
+    _pos_idx = 0
+    for (_info, _quick) in zip(infos, quicks):
+        _output = _info.copy()
+
+        # Calculate age
+        _age_td = _now_dt - parse(_info["datetime"])
+        _output["age"] = readable_timedelta(_age_td)
+
+        if _quick:
+            _output["has_snr"] = _quick["has_snr"]
+            for _point in ["first", "last"]:
+                _output[_point] = _quick[_point].copy()
+                _output[_point]["range_km"] = _ranges[_pos_idx]
+                _output[_point]["bearing"] = _bearings[_pos_idx]
+                _output[_point]["elevation"] = _elevations[_pos_idx]
+                _pos_idx += 1
+
+            _output["max_range"] = int(
+                max(_output["first"]["range_km"], _output["last"]["range_km"])
+            )
+            _output["last_range"] = int(_output["last"]["range_km"])
+            _output["min_height"] = int(_output["last"]["alt"])
+
+        _outputs.append(_output)
+
+    return _outputs
+
+
+def log_filename_to_stats(filename, quicklook=False):
+    """ Attempt to extract information about a log file from a supplied filename """
+
+    _info = log_filename_to_info(filename)
+    if _info is None:
+        return None
+
+    _quick = None
+    if quicklook:
+        try:
+            _quick = log_quick_look_positions(filename)
+        except Exception as e:
+            logging.error(f"Could not quicklook file {filename}: {str(e)}")
+
+    try:
+        return log_info_to_stats(_info, _quick)
     except Exception as e:
-        # Couldn't read the first line, so likely no data.
+        logging.error(f"Could not produce stats for file {filename}: {str(e)}")
         return None
 
-    # Now we try and seek to near the end of the file.
-    _seek_point = _filesize - 300
-    if _seek_point < 0:
-        # Don't bother trying to read the last line, it'll be the same as the first line.
-        _output["last"] = _output["first"]
-        return _output
 
-    # Read in the rest of the file
+def log_quick_look(filename):
+    """ Attempt to read in the first and last line in a log file, and return the first/last position observed. """
+
+    _quick = log_quick_look_positions(filename)
+    if _quick is None:
+        return None
+
+    _stats = log_info_to_stats({"datetime": "2000-01-01T00:00:00Z"}, _quick)
+
+    return {
+        "has_snr": _stats["has_snr"],
+        "first": _stats["first"],
+        "last": _stats["last"],
+    }
+
+
+def log_quick_look_positions(filename):
+    """ Attempt to read in the first and last line in a log file, and return the first/last position observed,
+    without calculating their position relative to the station. """
+
+    # Open the file and get the header line
+    with open_log_file(filename, "r") as _file:
+        _header = _file.readline()
+
+        # Discard anything
+        if "timestamp,serial,frame,lat,lon,alt" not in _header:
+            return None
+
+        _output = {}
+
+        if "snr" in _header:
+            _output["has_snr"] = True
+        else:
+            _output["has_snr"] = False
+
+        try:
+            # Naeive read of the first data line
+            _first = _file.readline()
+            _fields = _first.split(",")
+            _output["first"] = {
+                "datetime": _fields[0],
+                "lat": float(_fields[3]),
+                "lon": float(_fields[4]),
+                "alt": float(_fields[5]),
+            }
+        except Exception as e:
+            # Couldn't read the first line, so likely no data.
+            return None
+
+    # Now read the last line, seeking to near the end of the file (or the last compressed member).
     try:
-        _file.seek(_seek_point)
-        _remainder = _file.read()
-        # Get the last line
-        _last_line = _remainder.split("\n")[-2]
+        _last_line = read_last_line(filename)
+        if _last_line is None:
+            # No complete line found, so just use the first line.
+            _output["last"] = _output["first"]
+            return _output
+
         _fields = _last_line.split(",")
-        _last_datetime = _fields[0]
-        _last_lat = float(_fields[3])
-        _last_lon = float(_fields[4])
-        _last_alt = float(_fields[5])
-        _pos_info = position_info(
-            (
-                autorx.config.global_config["station_lat"],
-                autorx.config.global_config["station_lon"],
-                autorx.config.global_config["station_alt"],
-            ),
-            (_last_lat, _last_lon, _last_alt),
-        )
         _output["last"] = {
-            "datetime": _last_datetime,
-            "lat": _last_lat,
-            "lon": _last_lon,
-            "alt": _last_alt,
-            "range_km": _pos_info["straight_distance"] / 1000.0,
-            "bearing": _pos_info["bearing"],
-            "elevation": _pos_info["elevation"],
+            "datetime": _fields[0],
+            "lat": float(_fields[3]),
+            "lon": float(_fields[4]),
+            "alt": float(_fields[5]),
         }
         return _output
     except Exception as e:
@@ -197,18 +265,579 @@ def log_quick_look(filename):
         return _output
 
 
+class LogCatalog(object):
+    """ Persistent catalog of the log files within a log directory, stored in a SQLite database
+    alongside the log files.
+
+    Each log file's static information and first/last positions are stored, along with the file's
+    modification time and size. Only log files which are new, or which have changed since they were
+    last catalogued, need to be read again. Compressed and archived log files (refer log_archive) are
+    included, stored by their path relative to the log directory.
+
+    Flight summaries (refer log_summary) are also stored, in an indexed table which can be queried by time,
+    sonde type, frequency, burst/landing position and range. Summaries require the whole log file to be read,
+    so they are produced as each log file is closed (refer log_catalog_update), and any other log files which
+    have not been summarised are summarised by a background thread (refer start_backfill). Queries only return
+    the flights which have already been summarised.
+    """
+
+    CATALOG_FILENAME = "log_catalog.sqlite"
+    # Increment this if the stored information changes, to force the catalog to be rebuilt.
+    CATALOG_VERSION = 3
+
+    def __init__(self, log_directory, database=None):
+        """ Open (or create) the log catalog for a log directory.
+
+        Args:
+            log_directory (str): Directory containing the log files.
+            database (str): Catalog database filename. Defaults to log_catalog.sqlite within the log directory.
+        """
+        self.log_directory = log_directory
+        self.lock = threading.Lock()
+        self.backfill_thread = None
+
+        if database is None:
+            database = os.path.join(log_directory, self.CATALOG_FILENAME)
+
+        self.db = sqlite3.connect(database, check_same_thread=False)
+
+        with self.lock, self.db:
+            _version = self.db.execute("PRAGMA user_version").fetchone()[0]
+            if _version != self.CATALOG_VERSION:
+                self.db.execute("DROP TABLE IF EXISTS logs")
+                self.db.execute("DROP TABLE IF EXISTS summaries")
+                self.db.execute(f"PRAGMA user_version = {self.CATALOG_VERSION}")
+
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS logs ("
+                "filename TEXT PRIMARY KEY, "
+                "name TEXT, "
+                "file_serial TEXT, "
+                "mtime REAL, "
+                "size INTEGER, "
+                "info TEXT, "
+                "quick TEXT)"
+            )
+
+            # Flight summaries. The summary column holds the full summary (as JSON), with the fields
+            # which can be queried on also stored in their own (indexed) columns.
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS summaries ("
+                "filename TEXT PRIMARY KEY, "
+                "mtime REAL, "
+                "size INTEGER, "
+                "station_lat REAL, "
+                "station_lon REAL, "
+                "station_alt REAL, "
+                "start_time REAL, "
+                "type TEXT, "
+                "freq REAL, "
+                "burst_lat REAL, "
+                "burst_lon REAL, "
+                "last_lat REAL, "
+                "last_lon REAL, "
+                "last_range REAL, "
+                "max_range REAL, "
+                "summary TEXT)"
+            )
+            for _columns in [
+                "start_time",
+                "type",
+                "last_lat, last_lon",
+                "burst_lat, burst_lon",
+                "last_range",
+                "max_range",
+            ]:
+                _name = "summaries_" + _columns.replace(", ", "_")
+                self.db.execute(
+                    f"CREATE INDEX IF NOT EXISTS {_name} ON summaries ({_columns})"
+                )
+
+    def update_file(self, filename, summarise=False):
+        """ Add or update the catalog entry for a single log file.
+
+        Args:
+            filename (str): Path to the log file.
+            summarise (bool): Also produce the flight summary for this log file.
+        """
+        _relpath = os.path.relpath(filename, self.log_directory)
+        _path = os.path.join(self.log_directory, _relpath)
+
+        try:
+            _stat = os.stat(_path)
+        except FileNotFoundError:
+            with self.lock, self.db:
+                self.db.execute("DELETE FROM logs WHERE filename = ?", (_relpath,))
+                self.db.execute("DELETE FROM summaries WHERE filename = ?", (_relpath,))
+            return
+
+        self.update_entry(_relpath, _stat)
+
+        if summarise:
+            self.update_summaries(filename=_relpath)
+
+    def update_entry(self, relpath, stat):
+        """ Read a log file, and store its information in the catalog. """
+        _path = os.path.join(self.log_directory, relpath)
+        _name = log_name(relpath)
+
+        _info = log_filename_to_info(_path)
+        _quick = None
+        if _info is not None:
+            try:
+                _quick = log_quick_look_positions(_path)
+            except Exception as e:
+                logging.error(f"Could not quicklook file {_path}: {str(e)}")
+
+        # The second field of the filename is the serial number, possibly with a sonde type prefix.
+        _fields = _name.split("_")
+        _file_serial = _fields[1] if len(_fields) > 1 else ""
+
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO logs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    relpath,
+                    _name,
+                    _file_serial,
+                    stat.st_mtime,
+                    stat.st_size,
+                    json.dumps(_info),
+                    json.dumps(_quick),
+                ),
+            )
+
+    def refresh(self):
+        """ Bring the catalog up to date with the log directory, re-reading only new or modified log files. """
+        with self.lock:
+            _catalog = {
+                _row[0]: (_row[1], _row[2])
+                for _row in self.db.execute("SELECT filename, mtime, size FROM logs")
+            }
+
+        _present = set()
+        for _path in list_log_paths(self.log_directory):
+            _relpath = os.path.relpath(_path, self.log_directory)
+            _present.add(_relpath)
+            try:
+                _stat = os.stat(_path)
+            except FileNotFoundError:
+                continue
+
+            if _catalog.get(_relpath) != (_stat.st_mtime, _stat.st_size):
+                self.update_entry(_relpath, _stat)
+
+        _removed = [(_name,) for _name in _catalog if _name not in _present]
+        if _removed:
+            with self.lock, self.db:
+                self.db.executemany("DELETE FROM logs WHERE filename = ?", _removed)
+
+    def list_logs(self, quicklook=False):
+        """ List the catalogued log files, newest first, in the same format as list_log_files. """
+        self.refresh()
+
+        with self.lock:
+            _rows = self.db.execute(
+                "SELECT filename, info, quick FROM logs ORDER BY name DESC"
+            ).fetchall()
+
+        _infos = []
+        _quicks = []
+        for (_filename, _info, _quick) in _rows:
+            _info = json.loads(_info)
+            if _info is None:
+                continue
+
+            _infos.append(_info)
+            _quicks.append(json.loads(_quick) if quicklook else None)
+
+        return log_infos_to_stats(_infos, _quicks)
+
+    def find_serial(self, serial):
+        """ Find the log file for a sonde serial number.
+
+        Args:
+            serial (str): Serial number, with or without a sonde type prefix.
+
+        Returns:
+            str/None: Path to the log file, or None if no log file was found.
+        """
+        # Match serial numbers which may have a sonde type prefix, as per the *_*<serial>_*_sonde.log glob.
+        _pattern = "%" + serial.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+        with self.lock:
+            _rows = self.db.execute(
+                "SELECT filename FROM logs WHERE file_serial LIKE ? ESCAPE '\\' ORDER BY name",
+                (_pattern,),
+            ).fetchall()
+
+        for (_filename,) in _rows:
+            _path = os.path.join(self.log_directory, _filename)
+            if os.path.exists(_path):
+                return _path
+
+        return None
+
+    # Catalogued log files which have not been summarised, have changed since they were summarised,
+    # or were summarised using a different station position.
+    UNSUMMARISED_LOGS = (
+        "FROM logs LEFT JOIN summaries ON logs.filename = summaries.filename "
+        "WHERE (summaries.filename IS NULL "
+        "OR summaries.mtime != logs.mtime OR summaries.size != logs.size "
+        "OR summaries.station_lat != ? OR summaries.station_lon != ? OR summaries.station_alt != ?)"
+    )
+
+    def station(self):
+        """ Get the station position, which flight summaries are produced relative to. """
+        return (
+            autorx.config.global_config["station_lat"],
+            autorx.config.global_config["station_lon"],
+            autorx.config.global_config["station_alt"],
+        )
+
+    def pending_summaries(self):
+        """ Get the number of catalogued log files which have not yet been summarised. """
+        with self.lock:
+            return self.db.execute(
+                "SELECT COUNT(*) " + self.UNSUMMARISED_LOGS, self.station()
+            ).fetchone()[0]
+
+    def update_summaries(self, filename=None):
+        """ Produce flight summaries for any catalogued log files which are new or have changed, or which were
+        summarised using a different station position.
+
+        Args:
+            filename (str): Only summarise this log file (path relative to the log directory), if required.
+
+        Returns:
+            int: Number of log files summarised.
+        """
+        _station = self.station()
+        _query = "SELECT logs.filename, logs.mtime, logs.size, logs.info " + self.UNSUMMARISED_LOGS
+        _params = list(_station)
+        if filename is not None:
+            _query += " AND logs.filename = ?"
+            _params.append(filename)
+
+        with self.lock, self.db:
+            self.db.execute(
+                "DELETE FROM summaries WHERE filename NOT IN (SELECT filename FROM logs)"
+            )
+            _rows = self.db.execute(_query, _params).fetchall()
+
+        if len(_rows) > 1:
+            logging.info(f"Log Files - Summarising {len(_rows)} log files.")
+
+        for (_filename, _mtime, _size, _info) in _rows:
+            _info = json.loads(_info)
+            _summary = None
+            if _info is not None:
+                try:
+                    _summary = log_summary(os.path.join(self.log_directory, _filename), _station)
+                except Exception as e:
+                    logging.error(f"Log Files - Could not summarise {_filename} - {str(e)}")
+
+            # Log files which could not be summarised are stored without a summary, so they are not retried
+            # until they are modified.
+            if _summary is None:
+                _values = [None] * 9
+            else:
+                _values = [
+                    _summary["start_timestamp"],
+                    log_name(_filename).split("_")[2],
+                    _info["freq"],
+                    _summary["burst"]["lat"],
+                    _summary["burst"]["lon"],
+                    _summary["last"]["lat"],
+                    _summary["last"]["lon"],
+                    _summary["last"]["range_km"],
+                    _summary["max_range_km"],
+                ]
+
+            with self.lock, self.db:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [_filename, _mtime, _size, *_station, *_values, json.dumps(_summary)],
+                )
+
+        return len(_rows)
+
+    def backfill(self):
+        """ Bring the catalog and the flight summaries up to date with the log directory. """
+        try:
+            self.refresh()
+            _count = self.update_summaries()
+            logging.debug(f"Log Files - Log catalog backfill complete, summarised {_count} log files.")
+        except Exception as e:
+            logging.error(f"Log Files - Error updating log catalog - {str(e)}")
+
+    def start_backfill(self):
+        """ Start a background thread to summarise any log files which have not been summarised, unless one is
+        already running. """
+        with self.lock:
+            if (self.backfill_thread is not None) and self.backfill_thread.is_alive():
+                return
+
+            self.backfill_thread = threading.Thread(target=self.backfill, daemon=True)
+            self.backfill_thread.start()
+
+    def query(
+        self,
+        start=None,
+        end=None,
+        types=None,
+        freq=None,
+        burst_bbox=None,
+        landing_bbox=None,
+        range_km=None,
+        landing_range_km=None,
+        limit=None,
+    ):
+        """ Query the flight summaries. Refer query_logs.
+
+        Log files which have not been summarised yet are not included. If there are any, a background thread
+        is started to summarise them (refer pending_summaries).
+        """
+        self.refresh()
+        if self.pending_summaries() > 0:
+            self.start_backfill()
+
+        _where = ["summaries.summary != 'null'"]
+        _params = []
+
+        def add_range(column, value_range):
+            (_min, _max) = value_range
+            if _min is not None:
+                _where.append(f"{column} >= ?")
+                _params.append(_min)
+            if _max is not None:
+                _where.append(f"{column} <= ?")
+                _params.append(_max)
+
+        def add_bbox(prefix, bbox):
+            (_lat_min, _lon_min, _lat_max, _lon_max) = bbox
+            add_range(f"{prefix}_lat", (_lat_min, _lat_max))
+            if _lon_min <= _lon_max:
+                add_range(f"{prefix}_lon", (_lon_min, _lon_max))
+            else:
+                # Bounding box crosses the anti-meridian.
+                _where.append(f"({prefix}_lon >= ? OR {prefix}_lon <= ?)")
+                _params.extend([_lon_min, _lon_max])
+
+        add_range("start_time", (query_timestamp(start), query_timestamp(end)))
+
+        if types:
+            # Match on the start of the sonde type, i.e. RS41 matches RS41 and RS41-SGP.
+            _where.append("(" + " OR ".join(["type LIKE ?"] * len(types)) + ")")
+            _params.extend([_type + "%" for _type in types])
+
+        if freq is not None:
+            add_range("freq", freq)
+        if burst_bbox is not None:
+            add_bbox("burst", burst_bbox)
+        if landing_bbox is not None:
+            add_bbox("last", landing_bbox)
+        if range_km is not None:
+            add_range("max_range", range_km)
+        if landing_range_km is not None:
+            add_range("last_range", landing_range_km)
+
+        _query = (
+            "SELECT logs.info, summaries.summary FROM summaries "
+            "JOIN logs ON logs.filename = summaries.filename WHERE "
+            + " AND ".join(_where)
+            + " ORDER BY logs.name DESC"
+        )
+        if limit is not None:
+            _query += " LIMIT ?"
+            _params.append(int(limit))
+
+        with self.lock:
+            _rows = self.db.execute(_query, _params).fetchall()
+
+        _output = []
+        for (_info, _summary) in _rows:
+            _entry = json.loads(_info)
+            _entry.update(json.loads(_summary))
+            _output.append(_entry)
+
+        return _output
+
+
+# Log catalogs, by log directory.
+_log_catalogs = {}
+_log_catalogs_lock = threading.Lock()
+
+
+def get_log_catalog(log_directory=None):
+    """ Get the log catalog for a log directory (defaults to the auto_rx logging directory).
+
+    Returns:
+        LogCatalog/None: The log catalog, or None if the catalog could not be opened (i.e. read-only log directory).
+    """
+    if log_directory is None:
+        log_directory = autorx.logging_path
+
+    _key = os.path.abspath(log_directory)
+
+    with _log_catalogs_lock:
+        if _key not in _log_catalogs:
+            try:
+                _log_catalogs[_key] = LogCatalog(log_directory)
+            except Exception as e:
+                logging.error(f"Log Files - Could not open log catalog - {str(e)}")
+                _log_catalogs[_key] = None
+
+        return _log_catalogs[_key]
+
+
+def log_catalog_update(filename, summarise=False):
+    """ Update the log catalog entry for a log file, i.e. when it is opened or closed by the TelemetryLogger.
+    If summarise is set, the flight summary is also produced (i.e. when the log file is closed). """
+    _catalog = get_log_catalog(log_directory_of(filename))
+    if _catalog is not None:
+        try:
+            _catalog.update_file(filename, summarise=summarise)
+        except Exception as e:
+            logging.error(f"Log Files - Could not update log catalog - {str(e)}")
+
+
+def start_log_catalog_backfill():
+    """ Summarise any log files in the logging directory which have not been summarised, in a background thread,
+    so they are ready for log queries. """
+    _catalog = get_log_catalog()
+    if _catalog is not None:
+        _catalog.start_backfill()
+
+
+def log_summaries_pending():
+    """ Get the number of log files which have not been summarised yet, and so are not included in log queries. """
+    _catalog = get_log_catalog()
+    if _catalog is None:
+        return 0
+
+    return _catalog.pending_summaries()
+
+
+def find_log_by_serial(serial):
+    """ Find the log file for a sonde serial number, using the log catalog if available. """
+    _catalog = get_log_catalog()
+    if _catalog is not None:
+        try:
+            _log_file = _catalog.find_serial(serial)
+            if _log_file is not None:
+                return _log_file
+        except Exception as e:
+            logging.error(f"Log Files - Could not query log catalog - {str(e)}")
+
+    # Not in the catalog (it may not have been refreshed since the log file was added), so search the log directory.
+
+    _log_mask = f"*_*{serial}_*_sonde.log"
+    _matching_files = sorted(
+        [
+            _path
+            for _path in list_log_paths(autorx.logging_path)
+            if fnmatch.fnmatch(log_name(_path), _log_mask)
+        ],
+        key=log_name,
+    )
+
+    if len(_matching_files) == 0:
+        return None
+    else:
+        return _matching_files[0]
+
+
+def query_timestamp(value):
+    """ Convert a query time (datetime, ISO-8601 string, or seconds since the epoch) to seconds since the epoch.
+    Times without a timezone are assumed to be UTC. """
+    if value is None:
+        return None
+
+    if isinstance(value, (int, float)):
+        return float(value)
+
+    if isinstance(value, str):
+        value = parse(value)
+
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=tzutc())
+
+    return value.timestamp()
+
+
+def query_logs(
+    start=None,
+    end=None,
+    types=None,
+    freq=None,
+    burst_bbox=None,
+    landing_bbox=None,
+    range_km=None,
+    landing_range_km=None,
+    limit=None,
+):
+    """ Find flights within the logging directory, using the flight summaries in the log catalog.
+
+    All filters are optional. Ranges are (min, max) tuples, where either limit may be None.
+    Bounding boxes are (lat_min, lon_min, lat_max, lon_max) tuples, and may cross the anti-meridian (lon_min > lon_max).
+    i.e. all RS41 flights which landed within 20 km in the last year:
+        query_logs(start=datetime.datetime.utcnow() - datetime.timedelta(days=365), types=["RS41"], landing_range_km=(None, 20))
+
+    Args:
+        start: Only include flights first received at or after this time (datetime, ISO-8601 string, or epoch seconds).
+        end: Only include flights first received at or before this time.
+        types (list): Sonde types (as used in the log file names, i.e. RS41, DFM, M10). A type matches any type
+            starting with it (RS41 matches RS41-SGP).
+        freq (tuple): Frequency range, in MHz.
+        burst_bbox (tuple): Bounding box of the burst (highest) position.
+        landing_bbox (tuple): Bounding box of the landing (last) position.
+        range_km (tuple): Range of the maximum distance from the station during the flight, in km.
+        landing_range_km (tuple): Range of the distance of the landing (last) position from the station, in km.
+        limit (int): Maximum number of flights to return.
+
+    Returns:
+        list: Flight summaries (refer log_summary) combined with the log file information (refer log_filename_to_info),
+            newest first. Log files which have not been summarised yet are not included (refer log_summaries_pending).
+    """
+    _catalog = get_log_catalog()
+    if _catalog is None:
+        # Can't store the catalog in the log directory, so build a temporary catalog, and summarise every log file.
+        _catalog = LogCatalog(autorx.logging_path, database=":memory:")
+        _catalog.refresh()
+        _catalog.update_summaries()
+
+    return _catalog.query(
+        start=start,
+        end=end,
+        types=types,
+        freq=freq,
+        burst_bbox=burst_bbox,
+        landing_bbox=landing_bbox,
+        range_km=range_km,
+        landing_range_km=landing_range_km,
+        limit=limit,
+    )
+
+
 def list_log_files(quicklook=False):
     """ Look for all sonde log files within the logging directory """
 
+    _catalog = get_log_catalog()
+    if _catalog is not None:
+        try:
+            return _catalog.list_logs(quicklook=quicklook)
+        except Exception as e:
+            logging.error(f"Log Files - Could not query log catalog - {str(e)}")
+
     # Output list, which will contain one object per log file, ordered by time
     _output = []
 
-    # Search for file matching the expected log file name
-    _log_mask = os.path.join(autorx.logging_path, "*_sonde.log")
-    _log_files = glob.glob(_log_mask)
+    # Search for files matching the expected log file name, including compressed and archived log files
+    _log_files = list_log_paths(autorx.logging_path)
 
     # Sort alphanumerically, which will result in the entries being date ordered
-    _log_files.sort()
+    _log_files.sort(key=log_name)
     # Flip array so newest is first.
     _log_files.reverse()
 
@@ -220,13 +849,64 @@ def list_log_files(quicklook=False):
     return _output
 
 
-def read_log_file(filename, skewt_decimation=10):
-    """ Read in a log file """
-    logging.debug(f"Attempting to read file: {filename}")
+def log_datetimes_to_datetime64(datetimes):
+    """ Convert an array of log file timestamps (i.e. 2021-01-01T12:34:56.000Z) to a datetime64 (UTC, microsecond) array. """
+    _datetimes = np.asarray(datetimes).astype(str)
+    try:
+        return np.char.rstrip(_datetimes, "Z").astype("datetime64[us]")
+    except ValueError:
+        # Fall back to parsing each timestamp individually, assuming UTC if no timezone is given.
+        _epoch = datetime.datetime(1970, 1, 1, tzinfo=tzutc())
+        _output = []
+        for _dt in _datetimes:
+            _dt = parse(_dt)
+            if _dt.tzinfo is None:
+                _dt = _dt.replace(tzinfo=tzutc())
+            _output.append((_dt - _epoch) // datetime.timedelta(microseconds=1))
+        return np.array(_output, dtype="datetime64[us]")
+
+
+def log_datetimes_to_timestamps(datetimes):
+    """ Convert an array of log file timestamps (i.e. 2021-01-01T12:34:56.000Z) to seconds since the epoch. """
+    return (log_datetimes_to_datetime64(datetimes) - np.datetime64(0, "us")) / np.timedelta64(1, "s")
+
+
+def timestamps_to_log_datetimes(timestamps):
+    """ Convert an array of seconds since the epoch to log file timestamps (i.e. 2021-01-01T12:34:56.000Z) """
+    _datetimes = np.round(np.asarray(timestamps, dtype=np.float64) * 1e3).astype("datetime64[ms]")
+    return np.char.add(np.datetime_as_string(_datetimes, unit="ms"), "Z")
+
+
+def log_sensor_column(column):
+    """ Convert a single-precision log column back to the values in the log file, which are logged to 0.1 units. """
+    return np.round(np.asarray(column, dtype=np.float64), 1)
+
+
+# Version of the column layout produced by parse_log_file. Flight stores with a different version are re-created.
+LOG_COLUMNS_VERSION = 2
+
+
+def parse_log_file(filename):
+    """ Parse a sonde log file into a set of columns.
+
+    To keep the flight stores small, the log file timestamps are only stored as seconds since the epoch
+    ('timestamp', refer timestamps_to_log_datetimes), and the position is the only data stored at double precision.
+
+    Returns:
+        tuple: (columns, metadata), where columns is a dict of arrays keyed by field name,
+            and metadata contains the sonde serial number and type.
+    """
+    logging.debug(f"Attempting to parse file: {filename}")
 
     # Open the file and get the header line
-    _file = open(filename, "r")
+    _file = open_log_file(filename, "r")
     _header = _file.readline()
+    _lines = _file.readlines()
+    _file.close()
+
+    if _lines and not _lines[-1].endswith("\n"):
+        # Discard a partially written last line (i.e. due to a power failure while the log was being written).
+        _lines = _lines[:-1]
 
     # Initially assume a new style log file (> ~1.4.0)
     # timestamp,serial,frame,lat,lon,alt,vel_v,vel_h,heading,temp,humidity,pressure,type,freq_mhz,snr,f_error_hz,sats,batt_v,burst_timer,aux_data
@@ -271,7 +951,7 @@ def read_log_file(filename, skewt_decimation=10):
         }
         # Only use a subset of the columns, as the number of columns can vary in this old format
         _data = np.genfromtxt(
-            _file,
+            _lines,
             dtype=None,
             encoding="ascii",
             delimiter=",",
@@ -280,73 +960,143 @@ def read_log_file(filename, skewt_decimation=10):
 
     else:
         # Grab everything
-        _data = np.genfromtxt(_file, dtype=None, encoding="ascii", delimiter=",")
-
-    _file.close()
+        _data = np.genfromtxt(_lines, dtype=None, encoding="ascii", delimiter=",")
 
     if _data.size == 1:
         # Deal with log files with only one entry cleanly.
         _data = np.array([_data])
 
+    # Convert to fixed-dtype columns. The serial number and type are stored once, in the metadata.
+    _columns = {"timestamp": log_datetimes_to_timestamps(_data[fields["datetime"]])}
+    for _field, _col in fields.items():
+        if _field in ["datetime", "serial", "type"]:
+            continue
+        elif _field == "frame":
+            _columns[_field] = _data[_col].astype(np.int32)
+        elif _field in ["latitude", "longitude", "altitude"]:
+            _columns[_field] = _data[_col].astype(np.float64)
+        else:
+            _columns[_field] = _data[_col].astype(np.float32)
+
+    _metadata = {
+        "serial": str(_data[fields["serial"]][0]),
+        "type": str(_data[fields["type"]][0]),
+        "version": LOG_COLUMNS_VERSION,
+    }
+
+    return (_columns, _metadata)
+
+
+def read_log_columns(filename):
+    """ Read the columns of a sonde log file.
+
+    Columns are memory-mapped from the log file's flight store, which is created (or re-created)
+    from the CSV log file if it does not exist or the log file has been modified.
+    Compressed and archived log files are parsed without creating a flight store, as these are rarely read,
+    and the flight store would undo most of the space saved by compressing the log file.
+
+    Returns:
+        tuple: (columns, metadata), as per parse_log_file.
+    """
+    if (compression_format(filename) is not None) or (
+        log_directory_of(filename) != os.path.dirname(filename)
+    ):
+        return parse_log_file(filename)
+
+    _stat = os.stat(filename)
+    _store_filename = flight_store_filename(filename)
+
+    try:
+        (_columns, _metadata) = read_flight_store(_store_filename)
+        if (
+            (_metadata.get("version") == LOG_COLUMNS_VERSION)
+            and (_metadata.get("source_size") == _stat.st_size)
+            and (_metadata.get("source_mtime") == _stat.st_mtime)
+        ):
+            return (_columns, _metadata)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logging.debug(f"Could not read flight store {_store_filename} - {str(e)}")
+
+    (_columns, _metadata) = parse_log_file(filename)
+    # Record the log file state at the time it was read, so any later changes cause the store to be re-created.
+    _metadata["source_size"] = _stat.st_size
+    _metadata["source_mtime"] = _stat.st_mtime
+
+    try:
+        write_flight_store(_store_filename, _columns, _metadata)
+    except Exception as e:
+        logging.debug(f"Could not write flight store {_store_filename} - {str(e)}")
+
+    return (_columns, _metadata)
+
+
+def read_log_file(filename, skewt_decimation=10, path_tolerance=0):
+    """ Read in a log file
+
+    Args:
+        filename (str): Log file to read.
+        skewt_decimation (int): Decimation to apply to the Skew-T data.
+        path_tolerance (float): If greater than 0, simplify the path to this tolerance (metres).
+            The first, last and burst positions are calculated from the full path.
+    """
+    logging.debug(f"Attempting to read file: {filename}")
+
+    (_data, _metadata) = read_log_columns(filename)
+
     # Now we need to rearrange some data for easier use in the client
-    _output = {"serial": strip_sonde_serial(_data[fields["serial"]][0])}
+    _output = {"serial": strip_sonde_serial(_metadata["serial"])}
 
     # Path to display on the map
     _output["path"] = np.column_stack(
-        (
-            _data[fields["latitude"]],
-            _data[fields["longitude"]],
-            _data[fields["altitude"]],
-        )
+        (_data["latitude"], _data["longitude"], _data["altitude"],)
     ).tolist()
+    _datetimes = timestamps_to_log_datetimes(_data["timestamp"])
     _output["first"] = _output["path"][0]
-    _output["first_time"] = _data[fields["datetime"]][0]
+    _output["first_time"] = str(_datetimes[0])
     _output["last"] = _output["path"][-1]
-    _output["last_time"] = _data[fields["datetime"]][-1]
-    _burst_idx = np.argmax(_data[fields["altitude"]])
+    _output["last_time"] = str(_datetimes[-1])
+    _burst_idx = np.argmax(_data["altitude"])
     _output["burst"] = _output["path"][_burst_idx]
-    _output["burst_time"] = _data[fields["datetime"]][_burst_idx]
+    _output["burst_time"] = str(_datetimes[_burst_idx])
 
-    # Calculate first position info
-    _pos_info = position_info(
-        (
-            autorx.config.global_config["station_lat"],
-            autorx.config.global_config["station_lon"],
-            autorx.config.global_config["station_alt"],
-        ),
-        _output["first"],
-    )
-    _output["first_range_km"] = _pos_info["straight_distance"] / 1000.0
-    _output["first_bearing"] = _pos_info["bearing"]
+    if path_tolerance > 0:
+        _output["path"] = [
+            _output["path"][_i]
+            for _i in simplify_path(_output["path"], path_tolerance, keep=[_burst_idx])
+        ]
 
-    # Calculate last position info
-    _pos_info = position_info(
+    # Calculate first and last position info
+    _pos_info = position_info_array(
         (
             autorx.config.global_config["station_lat"],
             autorx.config.global_config["station_lon"],
             autorx.config.global_config["station_alt"],
         ),
-        _output["last"],
+        (_output["first"], _output["last"]),
     )
-    _output["last_range_km"] = _pos_info["straight_distance"] / 1000.0
-    _output["last_bearing"] = _pos_info["bearing"]
+    _output["first_range_km"] = _pos_info["straight_distance"][0] / 1000.0
+    _output["first_bearing"] = _pos_info["bearing"][0]
+    _output["last_range_km"] = _pos_info["straight_distance"][1] / 1000.0
+    _output["last_bearing"] = _pos_info["bearing"][1]
 
     # TODO: Calculate data necessary for Skew-T plots
-    if "pressure" in fields:
-        _press = _data[fields["pressure"]]
+    if "pressure" in _data:
+        _press = log_sensor_column(_data["pressure"])
     else:
         _press = None
 
-    if "snr" in fields:
-        _output["snr"] = _data[fields["snr"]].tolist()
+    if "snr" in _data:
+        _output["snr"] = log_sensor_column(_data["snr"]).tolist()
 
     _output["skewt"] = calculate_skewt_data(
-        _data[fields["datetime"]],
-        _data[fields["latitude"]],
-        _data[fields["longitude"]],
-        _data[fields["altitude"]],
-        _data[fields["temp"]],
-        _data[fields["humidity"]],
+        _datetimes,
+        _data["latitude"],
+        _data["longitude"],
+        _data["altitude"],
+        log_sensor_column(_data["temp"]),
+        log_sensor_column(_data["humidity"]),
         _press,
         decimation=skewt_decimation,
     )
@@ -354,6 +1104,72 @@ def read_log_file(filename, skewt_decimation=10):
     return _output
 
 
+def log_summary(filename, station):
+    """ Summarise a flight from its log file, for use in log queries.
+
+    Args:
+        filename (str): Path to the log file.
+        station (tuple): Station (lat, lon, alt), which ranges are calculated from.
+
+    Returns:
+        dict: Flight summary, containing:
+            'start_time', 'end_time' (str): Time of the first and last telemetry.
+            'start_timestamp' (float): Time of the first telemetry, in seconds since the epoch.
+            'points' (int): Number of telemetry lines.
+            'first', 'burst', 'last' (dict): First, highest, and last positions (datetime, lat, lon, alt),
+                along with their range_km, bearing and elevation from the station.
+            'max_range_km' (float): Maximum distance from the station.
+            'snr' (dict/None): SNR statistics (min, mean, max), or None if the log file has no SNR data.
+    """
+    (_data, _metadata) = read_log_columns(filename)
+
+    _pos_info = position_info_array(
+        station, np.column_stack((_data["latitude"], _data["longitude"], _data["altitude"]))
+    )
+
+    _points = {
+        "first": 0,
+        "burst": int(np.argmax(_data["altitude"])),
+        "last": len(_data["timestamp"]) - 1,
+    }
+    _datetimes = dict(
+        zip(_points, timestamps_to_log_datetimes(_data["timestamp"][list(_points.values())]))
+    )
+
+    _output = {
+        "start_time": str(_datetimes["first"]),
+        "end_time": str(_datetimes["last"]),
+        "start_timestamp": float(_data["timestamp"][0]),
+        "points": len(_data["timestamp"]),
+        "max_range_km": float(np.max(_pos_info["straight_distance"])) / 1000.0,
+    }
+
+    for (_point, _idx) in _points.items():
+        _output[_point] = {
+            "datetime": str(_datetimes[_point]),
+            "lat": float(_data["latitude"][_idx]),
+            "lon": float(_data["longitude"][_idx]),
+            "alt": float(_data["altitude"][_idx]),
+            "range_km": float(_pos_info["straight_distance"][_idx]) / 1000.0,
+            "bearing": float(_pos_info["bearing"][_idx]),
+            "elevation": float(_pos_info["elevation"][_idx]),
+        }
+
+    _output["snr"] = None
+    if "snr" in _data:
+        # Missing SNR values are logged as -99.0
+        _snr = log_sensor_column(_data["snr"])
+        _snr = _snr[np.isfinite(_snr) & (_snr > -99.0)]
+        if len(_snr) > 0:
+            _output["snr"] = {
+                "min": float(np.min(_snr)),
+                "mean": float(np.mean(_snr)),
+                "max": float(np.max(_snr)),
+            }
+
+    return _output
+
+
 def calculate_skewt_data(
     datetime,
     latitude,
@@ -372,6 +1188,8 @@ def calculate_skewt_data(
     if len(datetime) < 10:
         return []
 
+    altitude = np.asarray(altitude, dtype=np.float64)
+
     # Figure out if we have any ascent data at all.
     _burst_idx = np.argmax(altitude)
 
@@ -383,132 +1201,335 @@ def calculate_skewt_data(
         # No point plotting SkewT plots for data only gathered above 10km altitude...
         return []
 
+    # Every decimation'th point from index one, up to (and just past) burst.
+    _idx = np.arange(1, min(_burst_idx + decimation, len(altitude)), decimation)
+    _prev = _idx - 1
+
+    latitude = np.asarray(latitude, dtype=np.float64)
+    longitude = np.asarray(longitude, dtype=np.float64)
+    _temp = np.asarray(temperature, dtype=np.float64)[_idx]
+    _humidity = np.asarray(humidity, dtype=np.float64)[_idx]
+    _hght = altitude[_idx]
+
+    # Time between each point and the one before it.
+    # Only the timestamps either side of each point are needed, so only parse those.
+    _times = log_datetimes_to_datetime64(np.asarray(datetime)[np.concatenate((_prev, _idx))])
+    _time_delta = (_times[len(_idx) :] - _times[: len(_idx)]) / np.timedelta64(1, "s")
+
+    # Speed and direction the sonde has moved since the previous point.
+    _pos_delta = position_info_array(
+        np.column_stack((latitude[_prev], longitude[_prev], altitude[_prev])),
+        np.column_stack((latitude[_idx], longitude[_idx], _hght)),
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        _speed = _pos_delta["great_circle_distance"] / _time_delta
+    _bearing = (_pos_delta["bearing"] + 180.0) % 360.0
+
+    # Use the pressure from the sonde if available, else estimate it from the altitude.
+    if pressure is None:
+        _pressure = np.full(len(_idx), -1.0)
+    else:
+        _pressure = np.asarray(pressure, dtype=np.float64)[_idx]
+    for _i in np.flatnonzero(_pressure < 0.0):
+        _pressure[_i] = getDensity(_hght[_i], get_pressure=True) / 100.0
+
+    # Dew point, from temperature and relative humidity
+    with np.errstate(divide="ignore", invalid="ignore"):
+        _log_rh = np.log(_humidity / 100)
+        _temp_term = (17.625 * _temp) / (243.04 + _temp)
+        _dp = np.where(
+            _humidity >= 0.0,
+            243.04 * (_log_rh + _temp_term) / (17.625 - _log_rh - _temp_term),
+            -999.0,
+        )
+
+    # Skip points without valid temperature data, with no time difference, or without a valid dew point.
+    _valid = ~(_temp < -260.0) & (_time_delta != 0) & ~np.isnan(_dp)
+
+    # Only produce data up to 50hPa (~20km alt), which is the top of the skewt plot.
+    # We *could* go above this, but the data becomes less useful at those altitudes.
+    _above = np.flatnonzero(_valid & (_pressure < 50.0))
+    if len(_above) > 0:
+        _valid[_above[0] + 1 :] = False
+
     _skewt = []
+    for (_press, _h, _t, _d, _wdir, _wspd) in zip(
+        _pressure[_valid].tolist(),
+        _hght[_valid].tolist(),
+        _temp[_valid].tolist(),
+        _dp[_valid].tolist(),
+        _bearing[_valid].tolist(),
+        _speed[_valid].tolist(),
+    ):
+        _skewt.append(
+            {
+                "press": _press,
+                "hght": _h,
+                "temp": _t,
+                "dwpt": _d,
+                "wdir": _wdir,
+                "wspd": _wspd,
+            }
+        )
 
-    # Make sure we start on index one.
-    i = -1*decimation + 1
+    return _skewt
 
-    while i < _burst_idx:
-        i += decimation
-        try:
-            if temperature[i] < -260.0:
-                # If we don't have any valid temp data, just skip this point
-                # to avoid doing un-necessary calculations
-                continue
 
-            _time_delta = (parse(datetime[i]) - parse(datetime[i - 1])).total_seconds()
-            if _time_delta == 0:
-                continue
+def read_log_by_serial(serial, skewt_decimation=25):
+    """ Attempt to read in a log file for a particular sonde serial number """
 
-            _old_pos = (latitude[i - 1], longitude[i - 1], altitude[i - 1])
-            _new_pos = (latitude[i], longitude[i], altitude[i])
+    # Search in the logging directory for a matching serial number
+    _log_file = find_log_by_serial(serial)
 
-            _pos_delta = position_info(_old_pos, _new_pos)
+    # No matching entries found
+    if _log_file is None:
+        return {}
+    else:
+        try:
+            data = read_log_file(_log_file, skewt_decimation=skewt_decimation)
+            return data
+        except Exception as e:
+            logging.exception(f"Error reading file for serial: {serial}", e)
+            return {}
 
-            _speed = _pos_delta["great_circle_distance"] / _time_delta
-            _bearing = (_pos_delta["bearing"] + 180.0) % 360.0
 
-            if pressure is None:
-                _pressure = getDensity(altitude[i], get_pressure=True) / 100.0
-            elif pressure[i] < 0.0:
-                _pressure = getDensity(altitude[i], get_pressure=True) / 100.0
+class LogCache(object):
+    """ Bounded, least-recently-used cache of processed log files, as serialised JSON.
+
+    Entries are keyed on the log file path, modification time and size (along with the processing
+    parameters), so a modified log file is never served from the cache. Only the JSON is stored, as the
+    processed dictionaries take several times as much memory, and are not otherwise re-used.
+    """
+
+    def __init__(self, max_size=32 * 1024 * 1024):
+        """
+        Args:
+            max_size (int): Maximum total size of the cached JSON, in bytes.
+        """
+        self.max_size = max_size
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """ Return the cached JSON for a key, or None if it is not in the cache. """
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
             else:
-                _pressure = pressure[i]
+                self.misses += 1
+                return None
 
-            _temp = temperature[i]
+    def put(self, key, data):
+        """ Add JSON to the cache, evicting the least recently used entries to stay within the size limit. """
+        if len(data) > self.max_size:
+            return
 
-            if humidity[i] >= 0.0:
-                _rh = humidity[i]
+        with self.lock:
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key))
 
-                _dp = (
-                    243.04
-                    * (np.log(_rh / 100) + ((17.625 * _temp) / (243.04 + _temp)))
-                    / (
-                        17.625
-                        - np.log(_rh / 100)
-                        - ((17.625 * _temp) / (243.04 + _temp))
-                    )
-                )
-            else:
-                _dp = -999.0
+            self.entries[key] = data
+            self.size += len(data)
 
-            if np.isnan(_dp):
-                continue
+            while self.size > self.max_size:
+                (_key, _data) = self.entries.popitem(last=False)
+                self.size -= len(_data)
 
-            _skewt.append(
-                {
-                    "press": _pressure,
-                    "hght": altitude[i],
-                    "temp": _temp,
-                    "dwpt": _dp,
-                    "wdir": _bearing,
-                    "wspd": _speed,
-                }
-            )
 
-            # Only produce data up to 50hPa (~20km alt), which is the top of the skewt plot.
-            # We *could* go above this, but the data becomes less useful at those altitudes.
-            if _pressure < 50.0:
-                break
+_log_cache = None
 
-        except Exception as e:
-            print(str(e))
 
-        # Continue through the data..
+def get_log_cache():
+    """ Get the processed log file cache, sized as per the web_log_cache_size setting (MB). """
+    global _log_cache
 
-    return _skewt
+    if _log_cache is None:
+        _size = autorx.config.global_config.get("web_log_cache_size", 32)
+        _log_cache = LogCache(max_size=_size * 1024 * 1024)
 
+    return _log_cache
 
-def read_log_by_serial(serial, skewt_decimation=25):
-    """ Attempt to read in a log file for a particular sonde serial number """
 
-    # Search in the logging directory for a matching serial number
-    _log_mask = os.path.join(autorx.logging_path, f"*_*{serial}_*_sonde.log")
-    _matching_files = glob.glob(_log_mask)
+def log_cache_key(filename, skewt_decimation, path_tolerance=0):
+    """ Produce the cache key (and HTTP ETag) for a processed log file.
 
-    # No matching entries found
-    if len(_matching_files) == 0:
-        return {}
-    else:
+    The key covers everything the processed output depends on - the log file contents (via its
+    modification time and size), the Skew-T decimation, the path simplification tolerance, and the
+    station position.
+    """
+    _stat = os.stat(filename)
+    _key = (
+        filename,
+        _stat.st_mtime_ns,
+        _stat.st_size,
+        skewt_decimation,
+        path_tolerance,
+        autorx.config.global_config["station_lat"],
+        autorx.config.global_config["station_lon"],
+        autorx.config.global_config["station_alt"],
+    )
+    return hashlib.sha1(repr(_key).encode("utf-8")).hexdigest()
+
+
+def read_log_by_serial_json(serial, skewt_decimation=25, path_tolerance=0):
+    """ Read in a log file for a particular sonde serial number, as per read_log_by_serial,
+    returning the output as JSON. Results are cached (refer LogCache).
+    The path is simplified to path_tolerance (metres), if it is greater than 0.
+
+    Returns:
+        tuple: (json, etag), where json is a string, and etag is a string which changes whenever
+            the output changes (or None if no log file was found).
+    """
+
+    _log_file = find_log_by_serial(serial)
+    if _log_file is None:
+        return (json.dumps({}), None)
+
+    try:
+        _etag = log_cache_key(_log_file, skewt_decimation, path_tolerance)
+    except Exception as e:
+        logging.error(f"Error reading file for serial: {serial} - {str(e)}")
+        return (json.dumps({}), None)
+
+    _cache = get_log_cache()
+    _json = _cache.get(_etag)
+    if _json is None:
         try:
-            data = read_log_file(_matching_files[0], skewt_decimation=skewt_decimation)
-            return data
+            _json = json.dumps(
+                read_log_file(
+                    _log_file,
+                    skewt_decimation=skewt_decimation,
+                    path_tolerance=path_tolerance,
+                )
+            )
         except Exception as e:
             logging.exception(f"Error reading file for serial: {serial}", e)
-            return {}
+            return (json.dumps({}), None)
+
+        _cache.put(_etag, _json)
+
+    return (_json, _etag)
+
+
+# Files with these extensions are already compressed (or are binary columnar data), and so are stored
+# in zip files as-is, rather than being compressed again.
+ZIP_STORED_EXTENSIONS = (".gz", ".bz2", ".xz", ".zst", ".zip", FLIGHT_STORE_SUFFIX)
+
+
+class ZipStreamBuffer(object):
+    """ A write-only, non-seekable file-like object, which collects the output of a ZipFile
+    so it can be passed on in chunks as it is produced. """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
 
+    def pop(self):
+        """ Return (and discard) all data written since the last call to pop. """
+        _data = b"".join(self.chunks)
+        self.chunks = []
+        return _data
 
-def zip_log_files(serial_list=None):
-    """ Take a list of serial numbers and find and zip all related log files """
+
+def find_log_files(serial_list=None):
+    """ Find the log files for a list of serial numbers, or all log files if no list is provided. """
 
     if serial_list is None:
-        # Get all log files.
-        # Search for file matching the expected log file name
-        _log_mask = os.path.join(autorx.logging_path, "*_sonde.log")
-        _log_files = glob.glob(_log_mask)
+        # Get all log files, including compressed and archived log files.
+        return list_log_paths(autorx.logging_path)
     else:
         # Have been provided a list of log files.
         _log_files = []
         for _serial in serial_list:
-            _log_mask = os.path.join(autorx.logging_path, f"*_*{_serial}_*_sonde.log")
-            _matching_files = glob.glob(_log_mask)
+            _log_file = find_log_by_serial(_serial)
+
+            if _log_file is not None:
+                _log_files.append(_log_file)
+
+        return _log_files
+
+
+def zip_log_files(serial_list=None, store_compressed=True, chunk_size=65536):
+    """ Take a list of serial numbers and find and zip all related log files.
 
-            if len(_matching_files) >= 1:
-                _log_files.append(_matching_files[0])
+    The zip file is produced as a stream, with each log file being compressed and passed on in chunks,
+    so memory usage stays constant regardless of the number and size of the log files.
+
+    Args:
+        serial_list (list): List of serial numbers to find log files for. If None, zip all log files.
+        store_compressed (bool): Store already-compressed or columnar files (refer ZIP_STORED_EXTENSIONS)
+            without compressing them again.
+        chunk_size (int): Size of the chunks that log files are read in.
+
+    Returns:
+        generator: Produces the zip file contents, as bytes.
+    """
+
+    # Find the files up-front, so any errors here are raised before the stream starts.
+    _log_files = find_log_files(serial_list)
 
     logging.debug(f"Log Files - Zipping up {len(_log_files)} log files.")
 
-    # Perform the zipping
-    data = io.BytesIO()
-    with zipfile.ZipFile(data, compression=zipfile.ZIP_DEFLATED, mode="w") as z:
-        for f_name in _log_files:
-            z.write(f_name, arcname=os.path.basename(f_name))
-    logging.debug(f"Log Files - Resultant zip file is {data.tell()/1024768} MiB.")
-    # Seek back to the start
-    data.seek(0)
+    return zip_files_stream(_log_files, store_compressed=store_compressed, chunk_size=chunk_size)
+
+
+def zip_files_stream(filenames, store_compressed=True, chunk_size=65536):
+    """ Zip a list of files, producing the zip file contents in chunks (refer zip_log_files) """
+
+    _buffer = ZipStreamBuffer()
+
+    with zipfile.ZipFile(_buffer, compression=zipfile.ZIP_DEFLATED, mode="w") as z:
+        for f_name in filenames:
+            # Telemetry journals are exported as their CSV view.
+            _arcname = log_name(f_name) if is_journal(f_name) else os.path.basename(f_name)
+            try:
+                _info = zipfile.ZipInfo.from_file(f_name, arcname=_arcname)
+                _src = open_log_file(f_name, "rb") if is_journal(f_name) else open(f_name, "rb")
+            except FileNotFoundError:
+                # File has been removed since it was found.
+                continue
+
+            if store_compressed and f_name.endswith(ZIP_STORED_EXTENSIONS):
+                _info.compress_type = zipfile.ZIP_STORED
+            else:
+                _info.compress_type = zipfile.ZIP_DEFLATED
+
+            # Log files may still be growing as they are read, so always allow for large files.
+            with _src, z.open(_info, mode="w", force_zip64=True) as _dest:
+                while True:
+                    _chunk = _src.read(chunk_size)
+                    if not _chunk:
+                        break
+                    _dest.write(_chunk)
+
+                    _data = _buffer.pop()
+                    if _data:
+                        yield _data
+
+            _data = _buffer.pop()
+            if _data:
+                yield _data
 
-    # Return the BytesIO object
-    return data
+    # Remaining data, including the central directory.
+    logging.debug(f"Log Files - Resultant zip file is {_buffer.tell()/1048576} MiB.")
+    yield _buffer.pop()
 
 
 if __name__ == "__main__":
@@ -536,11 +1557,11 @@ if __name__ == "__main__":
 
     print(_serial)
     _start = time.time()
-    _zip = zip_log_files(serial_list=_serial)
+    _zip_size = sum(len(_chunk) for _chunk in zip_log_files(serial_list=_serial))
     _stop = time.time()
-    print(f"Zip 5 logs: {_stop - _start}")
+    print(f"Zip 5 logs: {_stop - _start} ({_zip_size} bytes)")
 
     _start = time.time()
-    _zip = zip_log_files()
+    _zip_size = sum(len(_chunk) for _chunk in zip_log_files())
     _stop = time.time()
-    print(f"Zip all logs: {_stop - _start}")
+    print(f"Zip all logs: {_stop - _start} ({_zip_size} bytes)")
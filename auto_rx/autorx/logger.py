@@ -6,11 +6,20 @@
 #   Released under GNU GPL v3 or later
 #
 import datetime
-import glob
 import logging
 import os
 import time
 from threading import Thread
+from autorx.coverage import get_coverage_map
+from autorx.journal import JournalWriter, is_journal, journal_filename
+from autorx.log_archive import (
+    compression_format,
+    list_log_paths,
+    log_file_lock,
+    log_name,
+    restore_log_file,
+)
+from autorx.log_files import log_catalog_update
 
 try:
     # Python 2
@@ -28,6 +37,13 @@ class TelemetryLogger(object):
 
     Log files are written to filenames of the form YYYYMMDD-HHMMSS_<id>_<type>_<freq_mhz>_sonde.log
 
+    Writes can optionally be batched, with each log file only being flushed to disk periodically, or once
+    enough data has been buffered. Log files are fsync'd when they are closed.
+
+    In journal mode, new logs are instead written as telemetry journals (YYYYMMDD-HHMMSS_<id>_<type>_<freq_mhz>_sonde.journal,
+    refer autorx.journal), which can be recovered cleanly after a power failure. Existing logs are always appended to
+    in their existing format.
+
     """
 
     # Close any open file handles after X seconds of no activity.
@@ -56,15 +72,45 @@ class TelemetryLogger(object):
 
     LOG_HEADER = "timestamp,serial,frame,lat,lon,alt,vel_v,vel_h,heading,temp,humidity,pressure,type,freq_mhz,snr,f_error_hz,sats,batt_v,burst_timer,aux_data\n"
 
-    def __init__(self, log_directory="./log"):
+    # Save the coverage map every X seconds (if it has changed).
+    COVERAGE_SAVE_INTERVAL = 60
+
+    def __init__(
+        self,
+        log_directory="./log",
+        flush_interval=0,
+        flush_size=65536,
+        coverage_map=False,
+        journal=False,
+    ):
         """ Initialise and start a sonde logger.
         
         Args:
             log_directory (str): Directory in which to save log files.
+            flush_interval (float): Flush buffered log data to disk every X seconds. If 0, every line is flushed
+                as soon as it is written.
+            flush_size (int): When batching writes (flush_interval > 0), buffer up to this many bytes per log file
+                before writing to disk.
+            coverage_map (bool): Add received telemetry to the station coverage map (refer autorx.coverage).
+            journal (bool): Write new logs as telemetry journals, rather than CSV files.
 
         """
 
         self.log_directory = log_directory
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.journal = journal
+        self.last_flush = time.time()
+
+        if coverage_map:
+            self.coverage = get_coverage_map(self.log_directory)
+        else:
+            self.coverage = None
+        self.last_coverage_save = time.time()
+
+        # Index of existing log files, by sonde ID. Built once at startup, to avoid searching the
+        # log directory each time a new sonde is seen.
+        self.log_index = self.build_log_index()
 
         # Dictionary to contain file handles.
         # Each sonde id is added as a unique key. Under each key are the contents:
@@ -115,14 +161,187 @@ class TelemetryLogger(object):
                 except Exception as e:
                     self.log_error("Error processing telemetry dict - %s" % str(e))
 
+            # Periodically flush batched writes.
+            if (self.flush_interval > 0) and (
+                time.time() > (self.last_flush + self.flush_interval)
+            ):
+                self.flush_logs()
+
             # Close any un-needed log handlers.
             self.cleanup_logs()
 
+            if (self.coverage is not None) and (
+                time.time() > (self.last_coverage_save + self.COVERAGE_SAVE_INTERVAL)
+            ):
+                self.save_coverage()
+
             # Sleep while waiting for some new data.
             time.sleep(0.5)
 
+        # Make sure any buffered data is written out.
+        for _id in list(self.open_logs.keys()):
+            self.close_log(_id)
+
+        if self.coverage is not None:
+            self.save_coverage()
+
         self.log_info("Stopped Telemetry Logger Thread.")
 
+    def build_log_index(self):
+        """ Build an index of the existing log files in the log directory, including compressed and archived log files.
+
+        Returns:
+            dict: Log file paths, keyed by sonde ID.
+        """
+        _index = {}
+
+        try:
+            _files = sorted(list_log_paths(self.log_directory), key=log_name)
+        except Exception as e:
+            self.log_error("Could not read log directory - %s" % str(e))
+            return _index
+
+        for _file in _files:
+            _id = self.log_sonde_id(_file)
+            if _id is not None:
+                # If there are multiple logs for a sonde, use the first one found.
+                _index.setdefault(_id, _file)
+
+        self.log_debug("Indexed %d existing log files." % len(_index))
+
+        return _index
+
+    def log_sonde_id(self, filename):
+        """ Extract the sonde ID from a log filename (YYYYMMDD-HHMMSS_<id>_<type>_<freq>_sonde.log),
+        or return None if the filename is not in this format. """
+        _fields = log_name(filename).split("_", 1)
+        if len(_fields) != 2:
+            return None
+
+        _fields = _fields[1].rsplit("_", 3)
+        if len(_fields) != 4:
+            return None
+
+        return _fields[0]
+
+    def find_log(self, sonde_id):
+        """ Search the log directory for the log file of a sonde.
+
+        Used when the indexed log file no longer exists (i.e. it has since been compressed or archived).
+
+        Returns:
+            str/None: Path to the log file, or None if there is no log file for this sonde.
+        """
+        _files = sorted(
+            [
+                _file
+                for _file in list_log_paths(self.log_directory)
+                if self.log_sonde_id(_file) == sonde_id
+            ],
+            key=log_name,
+        )
+
+        if len(_files) == 0:
+            return None
+        else:
+            return _files[0]
+
+    def open_log(self, filename):
+        """ Open a log file (or journal) for appending, with buffering set as per the flush settings. """
+        if is_journal(filename):
+            if self.flush_interval > 0:
+                return JournalWriter(filename, buffering=self.flush_size)
+            else:
+                return JournalWriter(filename)
+
+        if self.flush_interval > 0:
+            return open(filename, "a", buffering=self.flush_size)
+        else:
+            return open(filename, "a")
+
+    def repair_log(self, filename):
+        """ Remove a partially written last line from a CSV log file (i.e. due to a power failure),
+        so new lines are not appended to it. If this leaves the log file empty (i.e. the header line was only
+        partially written), the header line is written again. """
+        with open(filename, "r+b") as _f:
+            _size = _f.seek(0, os.SEEK_END)
+
+            if _size > 0:
+                _f.seek(max(0, _size - 4096))
+                _tail = _f.read()
+                if _tail.endswith(b"\n"):
+                    return
+
+                _size = _size - len(_tail) + _tail.rfind(b"\n") + 1
+                self.log_warning("Discarding partially written line from end of %s" % filename)
+                _f.truncate(_size)
+
+            if _size == 0:
+                _f.seek(0)
+                _f.write(self.LOG_HEADER.encode("ascii"))
+
+    def open_existing_log(self, sonde_id):
+        """ Re-open the existing log file for a sonde for appending.
+
+        If the indexed log file has since been compressed or moved by the log archiver, it is found again.
+        Compressed log files are first restored to an uncompressed log file in the log directory.
+
+        Returns:
+            tuple: (log file, filename), or None if the log file no longer exists.
+        """
+        with log_file_lock:
+            filename = self.log_index[sonde_id]
+            if not os.path.exists(filename):
+                filename = self.find_log(sonde_id)
+                if filename is None:
+                    return None
+
+            self.log_info("Using existing log file: %s" % filename)
+
+            if compression_format(filename) is not None:
+                self.log_info("Restoring compressed log file: %s" % filename)
+                _compressed = filename
+                filename = restore_log_file(_compressed)
+                log_catalog_update(_compressed)
+
+            if not is_journal(filename):
+                self.repair_log(filename)
+
+            _log = self.open_log(filename)
+            # Mark the log file as modified, so it is not archived while it is open.
+            os.utime(filename)
+
+        return (_log, filename)
+
+    def flush_logs(self):
+        """ Flush any buffered data in the open log files to disk. """
+        for _id in list(self.open_logs.keys()):
+            try:
+                self.open_logs[_id]["log"].flush()
+            except Exception as e:
+                self.log_error("Error flushing log for %s - %s" % (_id, str(e)))
+
+        self.last_flush = time.time()
+
+    def close_log(self, sonde_id):
+        """ Flush, sync and close the log file for a sonde. """
+        _log = self.open_logs.pop(sonde_id)["log"]
+        _log.flush()
+        os.fsync(_log.fileno())
+        _log.close()
+
+        # Update the log catalog with the final contents of this log file, and summarise the flight.
+        log_catalog_update(_log.name, summarise=True)
+
+    def save_coverage(self):
+        """ Save the coverage map to disk. """
+        try:
+            self.coverage.save()
+        except Exception as e:
+            self.log_error("Error saving coverage map - %s" % str(e))
+
+        self.last_coverage_save = time.time()
+
     def telemetry_to_string(self, telemetry):
         """ Convert a telemetry dictionary to a CSV string.
 
@@ -207,15 +426,17 @@ class TelemetryLogger(object):
 
         # If there is no log open for the current ID check to see if there is an existing (closed) log file, and open it.
         if _id not in self.open_logs:
-            _search_string = os.path.join(self.log_directory, "*%s_*_sonde.log" % (_id))
-            _existing_files = glob.glob(_search_string)
-            if len(_existing_files) != 0:
+            _existing = None
+            if _id in self.log_index:
                 # Open the existing log file.
-                _log_file_name = _existing_files[0]
-                self.log_info("Using existing log file: %s" % _log_file_name)
+                _existing = self.open_existing_log(_id)
+
+            if _existing is not None:
+                (_log, _log_file_name) = _existing
+                self.log_index[_id] = _log_file_name
                 # Create entry in open logs dictionary
                 self.open_logs[_id] = {
-                    "log": open(_log_file_name, "a"),
+                    "log": _log,
                     "last_time": time.time(),
                 }
             else:
@@ -227,24 +448,38 @@ class TelemetryLogger(object):
                     int(telemetry["freq_float"] * 1e3),  # Convert frequency to kHz
                 )
                 _log_file_name = os.path.join(self.log_directory, _log_suffix)
+                if self.journal:
+                    _log_file_name = journal_filename(_log_file_name)
                 self.log_info("Opening new log file: %s" % _log_file_name)
+                self.log_index[_id] = _log_file_name
                 # Create entry in open logs dictionary
                 self.open_logs[_id] = {
-                    "log": open(_log_file_name, "a"),
+                    "log": self.open_log(_log_file_name),
                     "last_time": time.time(),
                 }
 
                 # Write in a header line.
                 self.open_logs[_id]["log"].write(self.LOG_HEADER)
 
+            # Add this log file to the log catalog.
+            self.open_logs[_id]["log"].flush()
+            log_catalog_update(_log_file_name)
+
         # Produce log file sentence.
         _log_line = self.telemetry_to_string(telemetry)
 
         # Write out to log.
         self.open_logs[_id]["log"].write(_log_line)
-        self.open_logs[_id]["log"].flush()
+        if self.flush_interval == 0:
+            self.open_logs[_id]["log"].flush()
         # Update the last_time field.
         self.open_logs[_id]["last_time"] = time.time()
+
+        if (self.coverage is not None) and ("snr" in telemetry):
+            try:
+                self.coverage.add_telemetry(self.open_logs[_id]["log"].name, telemetry)
+            except Exception as e:
+                self.log_error("Error adding telemetry to coverage map - %s" % str(e))
         self.log_debug("Wrote line: %s" % _log_line.strip())
 
     def cleanup_logs(self):
@@ -258,9 +493,7 @@ class TelemetryLogger(object):
                     self.open_logs[_id]["last_time"] + self.FILE_ACTIVITY_TIMEOUT
                 ):
                     # Flush and close the log file, and pop this element from the dictionary.
-                    self.open_logs[_id]["log"].flush()
-                    self.open_logs[_id]["log"].close()
-                    self.open_logs.pop(_id, None)
+                    self.close_log(_id)
                     self.log_info("Closed log file for %s" % _id)
             except Exception as e:
                 self.log_error("Error closing log for %s - %s" % (_id, str(e)))
@@ -291,6 +524,13 @@ class TelemetryLogger(object):
         """
         logging.info("Telemetry Logger - %s" % line)
 
+    def log_warning(self, line):
+        """ Helper function to log a warning message with a descriptive heading. 
+        Args:
+            line (str): Message to be logged.
+        """
+        logging.warning("Telemetry Logger - %s" % line)
+
     def log_error(self, line):
         """ Helper function to log an error message with a descriptive heading. 
         Args:
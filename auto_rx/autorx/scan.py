@@ -10,12 +10,14 @@ import logging
 import numpy as np
 import os
 import platform
+import signal
 import subprocess
 import time
 import traceback
-from threading import Thread, Lock
+from threading import Thread, Lock, Event
 from types import FunctionType, MethodType
 from .utils import (
+    AsynchronousFileReader,
     detect_peaks,
     rtlsdr_test,
     reset_rtlsdr_by_serial,
@@ -25,10 +27,10 @@ from .utils import (
 
 try:
     # Python 2
-    from StringIO import StringIO
+    from Queue import Queue, Empty
 except ImportError:
     # Python 3
-    from io import StringIO
+    from queue import Queue, Empty
 
 try:
     from .web import flask_emit_event
@@ -50,7 +52,7 @@ scan_result = {
 }
 
 
-def run_rtl_power(
+def rtl_power_command(
     start,
     stop,
     step,
@@ -62,22 +64,13 @@ def run_rtl_power(
     gain=-1,
     bias=False,
 ):
-    """Capture spectrum data using rtl_power (or drop-in equivalent), and save to a file.
+    """Generate a rtl_power (or drop-in equivalent) command line for a single-shot spectrum capture.
 
     Args:
-        start (int): Start of search window, in Hz.
-        stop (int): End of search window, in Hz.
-        step (int): Search step, in Hz.
-        filename (str): Output results to this file. Defaults to ./log_power.csv
-        dwell (int): How long to average on the frequency range for.
-        sdr_power (str): Path to the rtl_power utility.
-        device_idx (int or str): Device index or serial number of the RTLSDR. Defaults to 0 (the first SDR found).
-        ppm (int): SDR Frequency accuracy correction, in ppm.
-        gain (float): SDR Gain setting, in dB.
-        bias (bool): If True, enable the bias tee on the SDR.
+        As per run_rtl_power. A filename of '-' results in rtl_power writing to stdout.
 
     Returns:
-        bool: True if rtl_power ran successfuly, False otherwise.
+        str: The rtl_power command, wrapped in a timeout call.
 
     """
     # Example: rtl_power -f 400400000:403500000:800 -i20 -1 -c 20% -p 0 -d 0 -g 26.0 log_power.csv
@@ -91,10 +84,6 @@ def run_rtl_power(
     else:
         gain_param = ""
 
-    # If the output log file exists, remove it.
-    if os.path.exists(filename):
-        os.remove(filename)
-
     # Add -k 30 option, to SIGKILL rtl_power 30 seconds after the regular timeout expires.
     # Note that this only works with the GNU Coreutils version of Timeout, not the IBM version,
     # which is provided with OSX (Darwin).
@@ -121,6 +110,95 @@ def run_rtl_power(
         )
     )
 
+    return rtl_power_cmd
+
+
+def log_rtl_power_error(device_idx, returncode, output, bias=False):
+    """Log the reason for a failed rtl_power call, based on its error output.
+
+    Args:
+        device_idx (int or str): Device index or serial number of the RTLSDR.
+        returncode (int): Return code from rtl_power.
+        output (str): Error output from rtl_power.
+        bias (bool): If True, the bias tee was enabled on the SDR.
+    """
+    # Something went wrong...
+    logging.critical(
+        "Scanner #%s - rtl_power call failed with return code %s."
+        % (str(device_idx), returncode)
+    )
+    # Look at the error output in a bit more details.
+    if "No supported devices found" in output:
+        logging.critical(
+            "Scanner #%s - rtl_power could not find device with ID %s, is your configuration correct?"
+            % (str(device_idx), str(device_idx))
+        )
+    elif "illegal option" in output:
+        if bias:
+            logging.critical(
+                "Scanner #%s - rtl_power reported an illegal option was used. Are you using a rtl_power version with bias tee support?"
+                % str(device_idx)
+            )
+        else:
+            logging.critical(
+                "Scanner #%s - rtl_power reported an illegal option was used. (This shouldn't happen... are you running an ancient version?)"
+                % str(device_idx)
+            )
+    else:
+        # Something else odd happened, dump the entire error output to the log for further analysis.
+        logging.critical(
+            "Scanner #%s - rtl_power reported error: %s" % (str(device_idx), output)
+        )
+
+
+def run_rtl_power(
+    start,
+    stop,
+    step,
+    filename="log_power.csv",
+    dwell=20,
+    sdr_power="rtl_power",
+    device_idx=0,
+    ppm=0,
+    gain=-1,
+    bias=False,
+):
+    """Capture spectrum data using rtl_power (or drop-in equivalent), and save to a file.
+
+    Args:
+        start (int): Start of search window, in Hz.
+        stop (int): End of search window, in Hz.
+        step (int): Search step, in Hz.
+        filename (str): Output results to this file. Defaults to ./log_power.csv
+        dwell (int): How long to average on the frequency range for.
+        sdr_power (str): Path to the rtl_power utility.
+        device_idx (int or str): Device index or serial number of the RTLSDR. Defaults to 0 (the first SDR found).
+        ppm (int): SDR Frequency accuracy correction, in ppm.
+        gain (float): SDR Gain setting, in dB.
+        bias (bool): If True, enable the bias tee on the SDR.
+
+    Returns:
+        bool: True if rtl_power ran successfuly, False otherwise.
+
+    """
+
+    # If the output log file exists, remove it.
+    if os.path.exists(filename):
+        os.remove(filename)
+
+    rtl_power_cmd = rtl_power_command(
+        start,
+        stop,
+        step,
+        filename=filename,
+        dwell=dwell,
+        sdr_power=sdr_power,
+        device_idx=device_idx,
+        ppm=ppm,
+        gain=gain,
+        bias=bias,
+    )
+
     logging.info("Scanner #%s - Running frequency scan." % str(device_idx))
     logging.debug(
         "Scanner #%s - Running command: %s" % (str(device_idx), rtl_power_cmd)
@@ -131,36 +209,9 @@ def run_rtl_power(
             rtl_power_cmd, shell=True, stderr=subprocess.STDOUT
         )
     except subprocess.CalledProcessError as e:
-        # Something went wrong...
-        logging.critical(
-            "Scanner #%s - rtl_power call failed with return code %s."
-            % (str(device_idx), e.returncode)
+        log_rtl_power_error(
+            device_idx, e.returncode, e.output.decode("ascii"), bias=bias
         )
-        # Look at the error output in a bit more details.
-        _output = e.output.decode("ascii")
-        if "No supported devices found" in _output:
-            logging.critical(
-                "Scanner #%s - rtl_power could not find device with ID %s, is your configuration correct?"
-                % (str(device_idx), str(device_idx))
-            )
-        elif "illegal option" in _output:
-            if bias:
-                logging.critical(
-                    "Scanner #%s - rtl_power reported an illegal option was used. Are you using a rtl_power version with bias tee support?"
-                    % str(device_idx)
-                )
-            else:
-                logging.critical(
-                    "Scanner #%s - rtl_power reported an illegal option was used. (This shouldn't happen... are you running an ancient version?)"
-                    % str(device_idx)
-                )
-        else:
-            # Something else odd happened, dump the entire error output to the log for further analysis.
-            logging.critical(
-                "Scanner #%s - rtl_power reported error: %s"
-                % (str(device_idx), _output)
-            )
-
         return False
     else:
         # No errors reported!
@@ -181,46 +232,113 @@ def read_rtl_power(filename):
 
     """
 
-    # Output buffers.
-    freq = np.array([])
-    power = np.array([])
+    # rtl_power log files are csv's, with the first 6 fields in each line describing the time and frequency scan parameters
+    # for the remaining fields, which contain the power samples.
+    # As we have the entire file available, the output buffers can be sized exactly from the number of hops (lines).
+    with open(filename, "r") as f:
+        _lines = f.readlines()
+
+    return read_rtl_power_stream(_lines, hops=len(_lines))
+
+
+def read_rtl_power_stream(stream, start=None, stop=None, hops=None):
+    """Read in frequency samples from rtl_power output, as each frequency hop arrives.
+
+    The power samples are written into a single preallocated buffer, sized using the
+    header fields of the first hop (and the overall scan range or number of hops, if provided),
+    rather than appending to the output arrays on every line.
+
+    Args:
+        stream (iterable): An iterable producing lines of rtl_power CSV output (str or bytes),
+            i.e. the stdout of a running rtl_power process, or the lines of a log file.
+        start (float): Start of the overall search window, in Hz. Used to size the output buffers.
+        stop (float): End of the overall search window, in Hz. Used to size the output buffers.
+        hops (int): Number of frequency hops expected, if known. Used to size the output buffers.
+
+    Returns:
+        tuple: A tuple consisting of:
+            freq (np.array): List of centre frequencies in Hz
+            power (np.array): List of measured signal powers (float32), in dB.
+            freq_step (float): Frequency step between points, in Hz
+
+    """
 
+    freq = np.array([])
+    power = np.array([], dtype=np.float32)
     freq_step = 0
 
-    # Open file.
-    f = open(filename, "r")
+    # Number of samples written into the output buffers so far.
+    _count = 0
 
-    # rtl_power log files are csv's, with the first 6 fields in each line describing the time and frequency scan parameters
-    # for the remaining fields, which contain the power samples.
+    for line in stream:
+        if type(line) == bytes:
+            line = line.decode("ascii", errors="ignore")
 
-    for line in f:
-        # Split line into fields.
-        fields = line.split(",")
+        # Skip any blank lines.
+        if line.strip() == "":
+            continue
 
-        if len(fields) < 6:
+        # Split the header fields off the line, leaving the power samples as a single string.
+        fields = line.split(",", 6)
+
+        if len(fields) < 7:
             logging.error(
-                "Scanner - Invalid number of samples in input file - corrupt?"
+                "Scanner - Invalid number of samples in rtl_power output - corrupt?"
             )
             raise Exception(
-                "Scanner - Invalid number of samples in input file - corrupt?"
+                "Scanner - Invalid number of samples in rtl_power output - corrupt?"
             )
 
-        start_date = fields[0]
-        start_time = fields[1]
-        start_freq = float(fields[2])
-        stop_freq = float(fields[3])
-        freq_step = float(fields[4])
-        n_samples = int(fields[5])
+        try:
+            _start_freq = float(fields[2])
+            _stop_freq = float(fields[3])
+            _freq_step = float(fields[4])
+
+            # Parse all of the power samples in this hop in one go.
+            samples = np.array(fields[6].split(","), dtype=np.float32)
+        except ValueError:
+            logging.error("Scanner - Could not parse rtl_power output, skipping hop.")
+            continue
+
+        # Check we have the expected number of samples for this hop, i.e. the line has not been truncated.
+        # rtl_power rounds the cropped hop width and the frequency step separately from the number of bins
+        # it outputs, so the count can differ from the nominal value by a couple of bins (or ~0.01% for large FFTs).
+        _n = len(samples)
+        _expected = int(round((_stop_freq - _start_freq) / _freq_step)) if _freq_step > 0 else 0
+        if abs(_n - _expected) > (2 + 0.001 * _expected):
+            logging.error(
+                "Scanner - Expected %d samples in rtl_power hop at %.3f MHz, got %d - skipping hop."
+                % (_expected, _start_freq / 1e6, _n)
+            )
+            continue
+
+        start_freq = _start_freq
+        stop_freq = _stop_freq
+        freq_step = _freq_step
+
+        if _count + _n > len(power):
+            # Size (or re-size) the output buffers.
+            # Each hop covers the same bandwidth, so we can estimate how many hops
+            # are required to cover the search window from the first hop header.
+            _hop_width = stop_freq - start_freq
+            if hops is not None:
+                _hops = hops
+            elif (start is not None) and (stop is not None) and (_hop_width > 0):
+                _hops = int(np.ceil((stop - start) / _hop_width)) + 1
+            else:
+                _hops = 1
 
-        # freq_range = np.arange(start_freq,stop_freq,freq_step)
-        samples = np.loadtxt(StringIO(",".join(fields[6:])), delimiter=",")
-        freq_range = np.linspace(start_freq, stop_freq, len(samples))
+            _size = max(_hops * _n, 2 * len(power), _count + _n)
+            freq = np.resize(freq, _size)
+            power = np.resize(power, _size)
 
-        # Add frequency range and samples to output buffers.
-        freq = np.append(freq, freq_range)
-        power = np.append(power, samples)
+        freq[_count : _count + _n] = np.linspace(start_freq, stop_freq, _n)
+        power[_count : _count + _n] = samples
+        _count += _n
 
-    f.close()
+    # Trim off any unused space.
+    freq = freq[:_count]
+    power = power[:_count]
 
     # Sanitize power values, to remove the nan's that rtl_power puts in there occasionally.
     power = np.nan_to_num(power)
@@ -228,6 +346,80 @@ def read_rtl_power(filename):
     return (freq, power, freq_step)
 
 
+def stream_rtl_power(
+    start,
+    stop,
+    step,
+    dwell=20,
+    sdr_power="rtl_power",
+    device_idx=0,
+    ppm=0,
+    gain=-1,
+    bias=False,
+):
+    """Capture spectrum data using rtl_power (or drop-in equivalent), reading the results
+    directly from rtl_power's stdout, instead of via a log file.
+
+    Args:
+        start (int): Start of search window, in Hz.
+        stop (int): End of search window, in Hz.
+        step (int): Search step, in Hz.
+        dwell (int): How long to average on the frequency range for.
+        sdr_power (str): Path to the rtl_power utility.
+        device_idx (int or str): Device index or serial number of the RTLSDR. Defaults to 0 (the first SDR found).
+        ppm (int): SDR Frequency accuracy correction, in ppm.
+        gain (float): SDR Gain setting, in dB.
+        bias (bool): If True, enable the bias tee on the SDR.
+
+    Returns:
+        tuple: A tuple consisting of (freq, power, freq_step), as per read_rtl_power_stream.
+            If rtl_power failed, empty freq and power arrays are returned.
+
+    """
+
+    # Using a filename of '-' results in rtl_power writing to stdout.
+    rtl_power_cmd = rtl_power_command(
+        start,
+        stop,
+        step,
+        filename="-",
+        dwell=dwell,
+        sdr_power=sdr_power,
+        device_idx=device_idx,
+        ppm=ppm,
+        gain=gain,
+        bias=bias,
+    )
+
+    logging.info("Scanner #%s - Running frequency scan." % str(device_idx))
+    logging.debug(
+        "Scanner #%s - Running command: %s" % (str(device_idx), rtl_power_cmd)
+    )
+
+    _rtl_power = subprocess.Popen(
+        rtl_power_cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    # Read stderr in a separate thread, so a chatty rtl_power cannot block on a full pipe.
+    _stderr_reader = AsynchronousFileReader(_rtl_power.stderr, autostart=True)
+
+    try:
+        (freq, power, freq_step) = read_rtl_power_stream(
+            _rtl_power.stdout, start=start, stop=stop
+        )
+    finally:
+        _rtl_power.stdout.close()
+        _returncode = _rtl_power.wait()
+        _stderr_reader.join()
+        _rtl_power.stderr.close()
+
+    if _returncode != 0:
+        _output = b"".join(_stderr_reader.readlines()).decode("ascii", errors="ignore")
+        log_rtl_power_error(device_idx, _returncode, _output, bias)
+        return (np.array([]), np.array([], dtype=np.float32), 0)
+
+    return (freq, power, freq_step)
+
+
 def detect_sonde(
     frequency,
     rs_path="./",
@@ -409,6 +601,21 @@ def detect_sonde(
         "Scanner - dft_detect exited in %.1f seconds with return code 1." % _runtime
     )
 
+    return parse_dft_detect_output(ret_output, device_idx)
+
+
+def parse_dft_detect_output(ret_output, device_idx=0):
+    """Parse the output from dft_detect into a sonde type and frequency offset estimate.
+
+    Args:
+        ret_output (str): Output from dft_detect.
+        device_idx (int or str): Device index or serial number of the RTLSDR used, for logging.
+
+    Returns:
+        tuple: (sonde type, frequency offset estimate in Hz), with sonde types as per detect_sonde.
+            A sonde type of None is returned if no sonde was found.
+
+    """
     # Check for no output from dft_detect.
     if ret_output is None or ret_output == "":
         # logging.error("Scanner - dft_detect returned no output?")
@@ -544,6 +751,486 @@ def detect_sonde(
     return (_sonde_type, _offset_est)
 
 
+# Wideband detection settings.
+# One capture at WIDEBAND_SAMPLE_RATE is split into channels at WIDEBAND_CHANNEL_RATE, which must divide it evenly.
+WIDEBAND_SAMPLE_RATE = 1920000
+WIDEBAND_CHANNEL_RATE = 48000
+# Maximum span of peaks to be checked from a single capture, in Hz. This avoids the roll-off at the edges of the RTLSDR passband.
+WIDEBAND_MAX_SPAN = 1500000
+# Keep channels at least this far away from the RTLSDR's DC spike, in Hz.
+WIDEBAND_DC_GUARD = 50000
+# Wideband captures are channelized in blocks of this length (in seconds) as they are received.
+WIDEBAND_BLOCK_DURATION = 0.1
+
+
+def group_wideband_peaks(peak_frequencies):
+    """Group peak frequencies into sets which can be checked from a single wideband capture.
+
+    Only 400 MHz band peaks (which use IQ detection) are grouped.
+
+    Args:
+        peak_frequencies (list): List of peak frequencies, in Hz.
+
+    Returns:
+        tuple: (groups, remaining), where groups is a list of (centre frequency, [peak frequencies]) tuples,
+            one per capture, and remaining is a list of peaks which need to be checked individually.
+
+    """
+    _peaks = sorted([float(_f) for _f in peak_frequencies if _f < 1000e6])
+
+    _groups = []
+    _grouped = []
+
+    while len(_peaks) > 0:
+        _group = [_f for _f in _peaks if (_f - _peaks[0]) <= WIDEBAND_MAX_SPAN]
+        _peaks = _peaks[len(_group) :]
+
+        # No benefit to a wideband capture for a single peak.
+        if len(_group) < 2:
+            continue
+
+        # Start with the centre of the group, then step away from it until no channel sits on the DC spike.
+        _centre = (_group[0] + _group[-1]) / 2.0
+        for _shift in [0, 1, -1, 2, -2, 3, -3]:
+            _candidate = _centre + _shift * 2 * WIDEBAND_DC_GUARD
+            _offsets = np.abs(np.array(_group) - _candidate)
+            if (np.min(_offsets) >= WIDEBAND_DC_GUARD) and (
+                np.max(_offsets) <= (WIDEBAND_SAMPLE_RATE - WIDEBAND_CHANNEL_RATE) / 2.0
+            ):
+                _groups.append((_candidate, _group))
+                _grouped.extend(_group)
+                break
+
+    _remaining = [_f for _f in peak_frequencies if float(_f) not in _grouped]
+
+    return (_groups, _remaining)
+
+
+def stream_wideband_iq(
+    frequency,
+    duration=5,
+    sample_rate=WIDEBAND_SAMPLE_RATE,
+    sdr_rx="rtl_sdr",
+    device_idx=0,
+    ppm=0,
+    gain=-1,
+    bias=False,
+    block_duration=WIDEBAND_BLOCK_DURATION,
+):
+    """Capture wideband IQ samples using rtl_sdr, producing blocks of samples as they are received.
+
+    If the caller stops iterating before the end of the capture, rtl_sdr is stopped.
+
+    Args:
+        frequency (float): Centre frequency of the capture, in Hz.
+        duration (int): Length of the capture, in seconds.
+        sample_rate (int): Capture sample rate, in Hz.
+        sdr_rx (str): Path to rtl_sdr, or drop-in equivalent. Defaults to 'rtl_sdr'
+        device_idx (int or str): Device index or serial number of the RTLSDR. Defaults to 0 (the first SDR found).
+        ppm (int): SDR Frequency accuracy correction, in ppm.
+        gain (float): SDR Gain setting, in dB. A gain setting of -1 enables the RTLSDR AGC.
+        bias (bool): If True, enable the bias tee on the SDR.
+        block_duration (float): Length of each block of samples, in seconds.
+
+    Yields:
+        np.array: Complex (complex64) IQ samples, normalised to +/- 1.0.
+
+    """
+    # Add a -T option if bias is enabled
+    bias_option = "-T " if bias else ""
+
+    # Add a gain parameter if we have been provided one.
+    if gain != -1:
+        gain_param = "-g %.1f " % gain
+    else:
+        gain_param = ""
+
+    _num_samples = int(duration * sample_rate)
+
+    rx_command = "timeout %ds %s %s-p %d -d %s %s-f %d -s %d -n %d - 2>/dev/null" % (
+        duration * 2 + 5,
+        sdr_rx,
+        bias_option,
+        int(ppm),
+        str(device_idx),
+        gain_param,
+        frequency,
+        sample_rate,
+        _num_samples,
+    )
+
+    logging.debug(
+        "Scanner #%s - Using wideband capture command: %s"
+        % (str(device_idx), rx_command)
+    )
+
+    # Run rtl_sdr in its own process group, so it can be stopped along with the shell and timeout.
+    _rx = subprocess.Popen(
+        rx_command, shell=True, stdout=subprocess.PIPE, preexec_fn=os.setsid
+    )
+
+    # rtl_sdr produces interleaved unsigned 8-bit I/Q samples.
+    _block_bytes = 2 * int(block_duration * sample_rate)
+    _received = 0
+    try:
+        while True:
+            _raw = _rx.stdout.read(_block_bytes)
+            if len(_raw) < 2:
+                break
+
+            _received += len(_raw) // 2
+            _iq = np.frombuffer(_raw[: len(_raw) // 2 * 2], dtype=np.uint8).astype(
+                np.float32
+            )
+            yield ((_iq - 127.5) / 128.0).view(np.complex64)
+
+        # rtl_sdr may exit with an error code after a short read, so use whatever samples we got.
+        if _rx.wait() == 124:
+            logging.error("Scanner #%s - rtl_sdr timed out." % str(device_idx))
+            raise IOError("Possible RTLSDR lockup.")
+
+        if _received < sample_rate * 0.1:
+            logging.error(
+                "Scanner #%s - rtl_sdr returned insufficient samples." % str(device_idx)
+            )
+            raise IOError("Possible RTLSDR lockup.")
+
+    finally:
+        if _rx.poll() is None:
+            try:
+                os.killpg(os.getpgid(_rx.pid), signal.SIGTERM)
+            except Exception:
+                pass
+        _rx.stdout.close()
+        _rx.wait()
+
+
+def design_lowpass_filter(num_taps, cutoff):
+    """Design a windowed-sinc low-pass FIR filter.
+
+    Args:
+        num_taps (int): Number of filter taps.
+        cutoff (float): Cutoff frequency, as a fraction of the sample rate.
+
+    Returns:
+        np.array: Filter taps (float32), normalised to unity gain at DC.
+
+    """
+    _n = np.arange(num_taps) - (num_taps - 1) / 2.0
+    _taps = np.sinc(2 * cutoff * _n) * np.hamming(num_taps)
+    return (_taps / np.sum(_taps)).astype(np.float32)
+
+
+class StreamingChannelizer(object):
+    """Extract a narrowband channel from a stream of wideband IQ samples, using a polyphase decimating filter.
+
+    The frequency shift to the channel is folded into the polyphase filter weights and a per-output-sample
+    phase rotation, so the full-rate input is never mixed or filtered sample-by-sample.
+    Filter state is carried between calls to process(), so blocks of samples can be processed as they arrive.
+    """
+
+    def __init__(
+        self,
+        offset,
+        sample_rate=WIDEBAND_SAMPLE_RATE,
+        channel_rate=WIDEBAND_CHANNEL_RATE,
+        taps_per_phase=12,
+    ):
+        """Initialise a Streaming Channelizer.
+
+        Args:
+            offset (float): Channel centre frequency, relative to the input centre frequency, in Hz.
+            sample_rate (int): Sample rate of the input, in Hz.
+            channel_rate (int): Sample rate of the output channel, in Hz. Must divide sample_rate evenly.
+            taps_per_phase (int): Filter length, per polyphase branch.
+        """
+        self.decimation = int(sample_rate // channel_rate)
+        if self.decimation * channel_rate != sample_rate:
+            raise ValueError("Channel rate must divide the input sample rate evenly.")
+
+        self.taps_per_phase = taps_per_phase
+
+        # Filter out everything outside of the channel bandwidth before decimating.
+        _taps = design_lowpass_filter(
+            self.decimation * taps_per_phase, 0.45 / self.decimation
+        )
+
+        # Arrange the filter into polyphase form. Input samples are arranged into rows of D samples,
+        # and row t of the filter holds the taps which multiply input row (m - t) to produce output sample m.
+        _h = _taps.reshape(taps_per_phase, self.decimation)[:, ::-1]
+
+        self.w = -2.0 * np.pi * offset / sample_rate
+        # Frequency shift within each row, folded into the filter weights.
+        self.weights = (
+            np.exp(1j * self.w * np.arange(self.decimation))[:, None] * _h.T
+        ).astype(np.complex64)
+
+        # Index of the next input row, used to continue the frequency shift between calls.
+        self.row = 0
+        # The last (taps_per_phase - 1) rows of input, and any samples not yet making up a full row.
+        self.history = np.zeros(
+            (taps_per_phase - 1) * self.decimation, dtype=np.complex64
+        )
+        self.pending = np.array([], dtype=np.complex64)
+
+    def process(self, iq):
+        """Process a block of input samples.
+
+        Args:
+            iq (np.array): Complex IQ samples.
+
+        Returns:
+            np.array: Channel samples (complex64) at the channel rate.
+        """
+        _input = np.concatenate((self.pending, iq))
+        _rows = len(_input) // self.decimation
+        self.pending = _input[_rows * self.decimation :]
+
+        if _rows == 0:
+            return np.array([], dtype=np.complex64)
+
+        _x = np.concatenate((self.history, _input[: _rows * self.decimation]))
+        self.history = _x[len(_x) - len(self.history) :]
+        _x = _x.reshape(-1, self.decimation)
+
+        # Frequency shift between rows. The history rows precede the current row index.
+        _row_index = np.arange(
+            self.row - self.taps_per_phase + 1, self.row + _rows, dtype=np.float64
+        )
+        _row_phase = np.exp(
+            1j * np.mod(self.w * self.decimation * _row_index, 2 * np.pi)
+        ).astype(np.complex64)
+        self.row += _rows
+
+        _partial = (_x @ self.weights) * _row_phase[:, None]
+
+        _out = np.zeros(_rows, dtype=np.complex64)
+        for _t in range(self.taps_per_phase):
+            _out += _partial[self.taps_per_phase - 1 - _t : len(_partial) - _t, _t]
+
+        return _out
+
+
+def iq_to_cs16(samples):
+    """Convert complex samples (normalised to +/- 1.0) to interleaved signed 16-bit samples, as produced by rtl_fm -M raw.
+
+    Args:
+        samples (np.array): Complex samples.
+
+    Returns:
+        bytes: Interleaved signed 16-bit I/Q samples.
+    """
+    _iq16 = np.empty(2 * len(samples), dtype=np.int16)
+    _iq16[0::2] = np.clip(samples.real * 32767, -32768, 32767)
+    _iq16[1::2] = np.clip(samples.imag * 32767, -32768, 32767)
+    return _iq16.tobytes()
+
+
+class StreamingDFTDetect(object):
+    """Run dft_detect over a stream of complex IQ samples, which are passed to it as they are produced.
+
+    dft_detect exits as soon as it has made a detection, after which any further samples are discarded.
+    """
+
+    def __init__(
+        self,
+        rs_path="./",
+        dwell_time=10,
+        sample_rate=48000,
+        if_bw=20,
+        device_idx=0,
+        save_filename=None,
+    ):
+        """Start dft_detect.
+
+        Args:
+            rs_path (str): Path to the RS binaries (i.e dft_detect). Defaults to ./
+            dwell_time (int): Timeout before giving up detection.
+            sample_rate (int): Sample rate of the IQ samples, in Hz.
+            if_bw (int): IF filter bandwidth for dft_detect, in kHz.
+            device_idx (int or str): Device index or serial number of the RTLSDR used, for logging.
+            save_filename (str): If provided, save the samples used in detection (signed 16-bit IQ) to this file.
+        """
+        self.device_idx = device_idx
+
+        _detect_command = ""
+        # Saving of Debug audio, if enabled,
+        if save_filename is not None:
+            _detect_command += "tee %s | " % save_filename
+
+        _detect_command += os.path.join(
+            rs_path, "dft_detect"
+        ) + " -t %d --iq --bw %d --dc - %d 16 2>/dev/null" % (
+            dwell_time,
+            if_bw,
+            sample_rate,
+        )
+
+        try:
+            self.detect = subprocess.Popen(
+                _detect_command,
+                shell=True,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+            )
+        except Exception as e:
+            logging.error(
+                "Scanner #%s - Error when running dft_detect - %s"
+                % (str(device_idx), str(e))
+            )
+            self.detect = None
+
+    @property
+    def running(self):
+        """True if dft_detect is still accepting samples."""
+        return (self.detect is not None) and (not self.detect.stdin.closed)
+
+    def write(self, samples):
+        """Pass a block of complex IQ samples (normalised to +/- 1.0) to dft_detect."""
+        if not self.running:
+            return
+
+        try:
+            self.detect.stdin.write(iq_to_cs16(samples))
+            self.detect.stdin.flush()
+        except (BrokenPipeError, OSError):
+            # dft_detect has exited (i.e. after making a detection).
+            self.close_input()
+
+    def close_input(self):
+        try:
+            self.detect.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+
+    def result(self):
+        """Wait for dft_detect to finish, and get its result.
+
+        Returns:
+            tuple: (sonde type, frequency offset estimate in Hz), as per detect_sonde.
+        """
+        if self.detect is None:
+            return (None, 0.0)
+
+        self.close_input()
+        _output = self.detect.stdout.read()
+        self.detect.stdout.close()
+
+        # dft_detect returns a code of 1 if no sonde is detected.
+        if self.detect.wait() == 1:
+            return (None, 0.0)
+
+        return parse_dft_detect_output(_output.decode("utf8"), self.device_idx)
+
+
+def detect_sonde_wideband(
+    frequencies,
+    centre,
+    rs_path="./",
+    dwell_time=10,
+    sdr_rx="rtl_sdr",
+    device_idx=0,
+    ppm=0,
+    gain=-1,
+    bias=False,
+    save_detection_audio=False,
+    sdr_server=None,
+):
+    """Attempt to detect radiosondes on a set of frequencies from a single wideband capture.
+
+    The capture is split into 48 kHz channels, one per frequency, as it is received, and each channel is passed
+    to its own dft_detect process. The capture is stopped early if every dft_detect process has finished.
+    Only 400 MHz band frequencies (which use IQ detection) are supported.
+
+    Args:
+        frequencies (list): Frequencies to perform the detection on, in Hz. These must all lie within
+            the capture bandwidth around the centre frequency (refer group_wideband_peaks).
+        centre (float): Centre frequency of the wideband capture, in Hz.
+        rs_path (str): Path to the RS binaries (i.e dft_detect). Defaults to ./
+        dwell_time (int): Length of the wideband capture, in seconds.
+        sdr_rx (str): Path to rtl_sdr, or drop-in equivalent. Defaults to 'rtl_sdr'
+        device_idx (int or str): Device index or serial number of the RTLSDR. Defaults to 0 (the first SDR found).
+        ppm (int): SDR Frequency accuracy correction, in ppm.
+        gain (int): SDR Gain setting, in dB. A gain setting of -1 enables the RTLSDR AGC.
+        bias (bool): If True, enable the bias tee on the SDR.
+        save_detection_audio (bool): Save the samples used in detection on each frequency to
+            detect_<device_idx>_<frequency in kHz>.raw
+        sdr_server (SDRServer): If provided, capture samples from this SDR Server instead of running rtl_sdr.
+
+    Returns:
+        list: A list of (frequency, sonde type, offset estimate) tuples, one per frequency.
+
+    """
+    logging.debug(
+        "Scanner #%s - Attempting wideband sonde detection on %s MHz (Centre: %.3f MHz)"
+        % (
+            str(device_idx),
+            str([_f / 1e6 for _f in frequencies]),
+            centre / 1e6,
+        )
+    )
+
+    _start = time.time()
+
+    if sdr_server is not None:
+        _source = sdr_server.stream(
+            centre,
+            dwell_time,
+            WIDEBAND_SAMPLE_RATE,
+            block_duration=WIDEBAND_BLOCK_DURATION,
+        )
+    else:
+        _source = stream_wideband_iq(
+            centre,
+            duration=dwell_time,
+            sdr_rx=sdr_rx,
+            device_idx=device_idx,
+            ppm=ppm,
+            gain=gain,
+            bias=bias,
+        )
+
+    _channelizers = [StreamingChannelizer(_f - centre) for _f in frequencies]
+    _detectors = [
+        StreamingDFTDetect(
+            rs_path=rs_path,
+            dwell_time=dwell_time,
+            sample_rate=WIDEBAND_CHANNEL_RATE,
+            device_idx=device_idx,
+            save_filename=(
+                "detect_%s_%d.raw" % (str(device_idx), int(round(_f / 1e3)))
+                if save_detection_audio
+                else None
+            ),
+        )
+        for _f in frequencies
+    ]
+
+    try:
+        for _iq in _source:
+            for (_channelizer, _detector) in zip(_channelizers, _detectors):
+                if _detector.running:
+                    _detector.write(_channelizer.process(_iq))
+
+            if not any(_detector.running for _detector in _detectors):
+                break
+    finally:
+        # Stop the capture (if we finished early), and collect the results even if the capture failed,
+        # so no dft_detect processes are left behind.
+        _source.close()
+        _results = [_detector.result() for _detector in _detectors]
+
+    logging.debug(
+        "Scanner #%s - Wideband detection on %d frequencies took %.1f seconds."
+        % (str(device_idx), len(frequencies), time.time() - _start)
+    )
+
+    return [
+        (frequencies[_i], _results[_i][0], _results[_i][1])
+        for _i in range(len(frequencies))
+    ]
+
+
 #
 # Radiosonde Scanner Class
 #
@@ -576,6 +1263,7 @@ class SondeScanner(object):
         rs_path="./",
         sdr_power="rtl_power",
         sdr_fm="rtl_fm",
+        sdr_rx="rtl_sdr",
         device_idx=0,
         gain=-1,
         ppm=0,
@@ -584,6 +1272,10 @@ class SondeScanner(object):
         temporary_block_list={},
         temporary_block_time=60,
         ngp_tweak=False,
+        detect_sdr_allocate=None,
+        detect_sdr_release=None,
+        wideband_detection=False,
+        sdr_server=None,
     ):
         """Initialise a Sonde Scanner Object.
 
@@ -611,6 +1303,7 @@ class SondeScanner(object):
             rs_path (str): Path to the RS binaries (i.e rs_detect). Defaults to ./
             sdr_power (str): Path to rtl_power, or drop-in equivalent. Defaults to 'rtl_power'
             sdr_fm (str): Path to rtl_fm, or drop-in equivalent. Defaults to 'rtl_fm'
+            sdr_rx (str): Path to rtl_sdr, or drop-in equivalent, used for wideband detection. Defaults to 'rtl_sdr'
             device_idx (int): SDR Device index. Defaults to 0 (the first SDR found).
             ppm (int): SDR Frequency accuracy correction, in ppm.
             gain (int): SDR Gain setting, in dB. A gain setting of -1 enables the RTLSDR AGC.
@@ -619,6 +1312,14 @@ class SondeScanner(object):
             temporary_block_list (dict): A dictionary where each attribute represents a frequency that should be blocked for a set time.
             temporary_block_time (int): How long (minutes) frequencies in the temporary block list should remain blocked for.
             ngp_tweak (bool): Narrow the detection filter when searching for 1680 MHz sondes, to enhance detection of RS92-NGPs.
+            detect_sdr_allocate (function): If provided, this function is called to borrow idle SDRs, so detection
+                can be run on multiple peaks in parallel. It must return a dict with the device_idx, ppm, gain and bias
+                settings of the borrowed SDR, or None if no SDRs are free.
+            detect_sdr_release (function): Called with the device_idx of a borrowed SDR once detection has finished with it.
+            wideband_detection (bool): Check groups of nearby peaks using a single wideband capture, split into
+                per-peak channels, instead of re-tuning rtl_fm to each peak.
+            sdr_server (SDRServer): If provided, scan and detect using this persistent SDR Server, instead of
+                starting rtl_power / rtl_fm for each scan and detection.
         """
 
         # Thread flag. This is set to True when a scan is running.
@@ -642,12 +1343,17 @@ class SondeScanner(object):
         self.rs_path = rs_path
         self.sdr_power = sdr_power
         self.sdr_fm = sdr_fm
+        self.sdr_rx = sdr_rx
         self.device_idx = device_idx
         self.gain = gain
         self.ppm = ppm
         self.bias = bias
         self.callback = callback
         self.save_detection_audio = save_detection_audio
+        self.detect_sdr_allocate = detect_sdr_allocate
+        self.detect_sdr_release = detect_sdr_release
+        self.wideband_detection = wideband_detection
+        self.sdr_server = sdr_server
 
         # Temporary block list.
         self.temporary_block_list = temporary_block_list.copy()
@@ -673,7 +1379,7 @@ class SondeScanner(object):
         self.sonde_scan_thread = None
 
         # Test if the supplied RTLSDR is working.
-        _rtlsdr_ok = rtlsdr_test(device_idx)
+        _rtlsdr_ok = self.sdr_test()
 
         # TODO: How should this error be handled?
         if not _rtlsdr_ok:
@@ -696,17 +1402,18 @@ class SondeScanner(object):
         else:
             self.log_warning("Sonde scan already running!")
 
-    def send_to_callback(self, results):
+    def send_to_callback(self, results, while_stopping=False):
         """Send scan results to a callback.
 
         Args:
             results (list): List consisting of [freq, type)]
+            while_stopping (bool): Send the results even if the scanner is being stopped.
 
         """
         try:
             # Only send scan results to the callback if we are still running.
             # This avoids sending scan results when the scanner is being shutdown.
-            if (self.callback != None) and self.sonde_scanner_running:
+            if (self.callback != None) and (self.sonde_scanner_running or while_stopping):
                 self.callback(results)
         except Exception as e:
             self.log_error("Error handling scan results - %s" % str(e))
@@ -730,7 +1437,7 @@ class SondeScanner(object):
                 self.scan_counter += 1
                 if (self.scan_counter % self.scan_check_interval) == 0:
                     self.log_debug("Performing periodic check of RTLSDR.")
-                    _rtlsdr_ok = rtlsdr_test(self.device_idx)
+                    _rtlsdr_ok = self.sdr_test()
                     if not _rtlsdr_ok:
                         self.log_error(
                             "Unrecoverable RTLSDR error. Closing scan thread."
@@ -741,7 +1448,7 @@ class SondeScanner(object):
                 _results = self.sonde_search()
 
             except (IOError, ValueError) as e:
-                # No log file produced. Reset the RTLSDR and try again.
+                # No spectrum data produced. Reset the RTLSDR and try again.
                 # traceback.print_exc()
                 self.log_warning("RTLSDR produced no output... resetting and retrying.")
                 self.error_retries += 1
@@ -753,6 +1460,10 @@ class SondeScanner(object):
                     # Otherwise, we reset the specific RTLSDR
                     reset_rtlsdr_by_serial(self.device_idx)
 
+                # The SDR Server will have lost its connection to the RTLSDR.
+                if self.sdr_server is not None:
+                    self.sdr_server.restart()
+
                 time.sleep(10)
                 continue
             except Exception as e:
@@ -773,9 +1484,9 @@ class SondeScanner(object):
         """Perform a frequency scan across a defined frequency range, and test each detected peak for the presence of a radiosonde.
 
         In order, this function:
-        - Runs rtl_power to capture spectrum data across the frequency range of interest.
+        - Runs rtl_power to capture spectrum data across the frequency range of interest (read directly from its output).
         - Thresholds and quantises peaks detected in the spectrum.
-        - On each peak run rs_detect to determine if a radiosonce is present.
+        - On each peak run rs_detect to determine if a radiosonce is present (in parallel, if idle SDRs can be borrowed).
         - Returns either the first, or a list of all detected sondes.
 
         Performing a search can take some time (many minutes if there are lots of peaks detected). This function can be exited quickly
@@ -790,46 +1501,50 @@ class SondeScanner(object):
         """
         global scan_result
 
-        _search_results = []
-
         if len(self.only_scan) == 0:
             # No only_scan frequencies provided - perform a scan.
-            run_rtl_power(
-                self.min_freq * 1e6,
-                self.max_freq * 1e6,
-                self.search_step,
-                filename="log_power_%s.csv" % self.device_idx,
-                dwell=self.scan_dwell_time,
-                sdr_power=self.sdr_power,
-                device_idx=self.device_idx,
-                ppm=self.ppm,
-                gain=self.gain,
-                bias=self.bias,
-            )
+            if self.sdr_server is not None:
+                (freq, power, step) = self.sdr_server.spectrum(
+                    self.min_freq * 1e6,
+                    self.max_freq * 1e6,
+                    self.search_step,
+                    dwell=self.scan_dwell_time,
+                )
+            else:
+                # The spectrum data is read directly from rtl_power's output, without going via a log file.
+                (freq, power, step) = stream_rtl_power(
+                    self.min_freq * 1e6,
+                    self.max_freq * 1e6,
+                    self.search_step,
+                    dwell=self.scan_dwell_time,
+                    sdr_power=self.sdr_power,
+                    device_idx=self.device_idx,
+                    ppm=self.ppm,
+                    gain=self.gain,
+                    bias=self.bias,
+                )
 
             # Exit opportunity.
             if self.sonde_scanner_running == False:
                 return []
 
-            # Read in result.
-            # This step will throw an IOError if the file does not exist.
-            (freq, power, step) = read_rtl_power("log_power_%s.csv" % self.device_idx)
             # Sanity check results.
             if step == 0 or len(freq) == 0 or len(power) == 0:
-                # Otherwise, if a file has been written but contains no data, it can indicate
+                # If rtl_power exited without producing any data, it can indicate
                 # an issue with the RTLSDR. Sometimes these issues can be resolved by issuing a usb reset to the RTLSDR.
-                raise ValueError("Invalid Log File")
+                raise ValueError("Invalid rtl_power output")
 
-            # Update the global scan result
+            # Update the global scan result.
+            # This is serialised to JSON for the web client, so only plain python floats are stored.
             (_freq_decimate, _power_decimate) = peak_decimation(freq / 1e6, power, 10)
-            scan_result["freq"] = list(_freq_decimate)
-            scan_result["power"] = list(_power_decimate)
+            scan_result["freq"] = np.asarray(_freq_decimate, dtype=np.float64).tolist()
+            scan_result["power"] = np.asarray(_power_decimate, dtype=np.float64).tolist()
             scan_result["timestamp"] = datetime.datetime.utcnow().isoformat()
             scan_result["peak_freq"] = []
             scan_result["peak_lvl"] = []
 
             # Rough approximation of the noise floor of the received power spectrum.
-            power_nf = np.mean(power)
+            power_nf = float(np.mean(power))
             # Pass the threshold data to the web client for plotting
             scan_result["threshold"] = power_nf
 
@@ -930,9 +1645,9 @@ class SondeScanner(object):
                     )
                     # Grab the maximum value, and append it and the frequency to the output arrays
                     _peak_lvl.append(
-                        max(scan_result["power"][_peak_search_min:_peak_search_max])
+                        float(max(scan_result["power"][_peak_search_min:_peak_search_max]))
                     )
-                    _peak_freq.append(_peak / 1e6)
+                    _peak_freq.append(float(_peak / 1e6))
                 except:
                     pass
             # Add the peak results to our global scan result dictionary.
@@ -958,46 +1673,256 @@ class SondeScanner(object):
             )
 
         # Run rs_detect on each peak frequency, to determine if there is a sonde there.
-        for freq in peak_frequencies:
+        _search_results = self.run_detection(peak_frequencies, first_only=first_only)
 
-            _freq = float(freq)
+        if len(_search_results) == 0:
+            self.log_debug("No sondes detected.")
+        else:
+            self.log_debug("Scan Detected Sondes: %s" % str(_search_results))
 
-            # Exit opportunity.
-            if self.sonde_scanner_running == False:
-                return []
+        return _search_results
 
-            (detected, offset_est) = detect_sonde(
-                _freq,
-                sdr_fm=self.sdr_fm,
-                device_idx=self.device_idx,
-                ppm=self.ppm,
-                gain=self.gain,
-                bias=self.bias,
-                dwell_time=self.detect_dwell_time,
-                save_detection_audio=self.save_detection_audio,
+    def run_detection(self, peak_frequencies, first_only=False):
+        """Run sonde detection over a list of peak frequencies.
+
+        If a detect_sdr_allocate function has been provided, any idle SDRs are borrowed, and detection is
+        run on multiple peaks in parallel. Results are passed on to the callback as each detection finishes.
+
+        Args:
+            peak_frequencies (list): List of frequencies to run detection on, in Hz.
+            first_only (bool): If True, return after detecting the first sonde.
+
+        Returns:
+            list: A list of [frequency (Hz), Sonde Type] entries, as per sonde_search.
+        """
+
+        _search_results = []
+
+        # Check groups of nearby peaks using wideband captures on our own SDR first.
+        if self.wideband_detection:
+            (_groups, peak_frequencies) = group_wideband_peaks(peak_frequencies)
+
+            for (_centre, _peaks) in _groups:
+                # Exit opportunity.
+                if self.sonde_scanner_running == False:
+                    return _search_results
+
+                _results = detect_sonde_wideband(
+                    _peaks,
+                    _centre,
+                    rs_path=self.rs_path,
+                    dwell_time=self.detect_dwell_time,
+                    sdr_rx=self.sdr_rx,
+                    device_idx=self.device_idx,
+                    ppm=self.ppm,
+                    gain=self.gain,
+                    bias=self.bias,
+                    save_detection_audio=self.save_detection_audio,
+                    sdr_server=self.sdr_server,
+                )
+
+                for (_freq, detected, offset_est) in _results:
+                    self.handle_detection(_freq, detected, offset_est, _search_results)
+
+                if first_only and (len(_search_results) > 0):
+                    return _search_results[:1]
+
+            if len(peak_frequencies) == 0:
+                return _search_results
+
+        # SDRs to run detection on, starting with the scanner's own SDR.
+        _sdrs = [
+            {
+                "device_idx": self.device_idx,
+                "ppm": self.ppm,
+                "gain": self.gain,
+                "bias": self.bias,
+                "sdr_server": self.sdr_server,
+            }
+        ]
+
+        # Borrow any idle SDRs, up to one per peak.
+        if self.detect_sdr_allocate is not None:
+            while len(_sdrs) < len(peak_frequencies):
+                try:
+                    _sdr = self.detect_sdr_allocate()
+                except Exception as e:
+                    self.log_error("Error allocating SDR for detection - %s" % str(e))
+                    _sdr = None
+
+                if _sdr is None:
+                    break
+
+                _sdrs.append(_sdr)
+
+        if len(_sdrs) > 1:
+            self.log_info(
+                "Running detection on SDRs %s in parallel."
+                % str([_sdr["device_idx"] for _sdr in _sdrs])
             )
 
-            if detected != None:
-                # Quantize the detected frequency (with offset) to 1 kHz
-                _freq = round((_freq + offset_est) / 1000.0) * 1000.0
+        _peak_queue = Queue()
+        for _freq in peak_frequencies:
+            _peak_queue.put(float(_freq))
 
-                # Add a detected sonde to the output array
-                _search_results.append([_freq, detected])
+        _result_queue = Queue()
+        _stop_detection = Event()
+
+        _workers = []
+        for _sdr in _sdrs:
+            _worker = Thread(
+                target=self.detection_worker,
+                args=(_sdr, _peak_queue, _result_queue, _stop_detection),
+            )
+            _worker.start()
+            _workers.append(_worker)
+
+        # Handle results as they arrive, until all the detection workers have finished.
+        _active_workers = len(_workers)
+        _error = None
+        while _active_workers > 0:
+            _result = _result_queue.get()
+
+            if _result is None:
+                # A worker has finished.
+                _active_workers -= 1
+
+                if (
+                    (_active_workers == 0)
+                    and (_error is None)
+                    and (not _peak_queue.empty())
+                    and (not _stop_detection.is_set())
+                    and self.sonde_scanner_running
+                ):
+                    # A borrowed SDR locked up and handed its peak back after the other workers had run out
+                    # of peaks, so check the remaining peaks using our own SDR.
+                    _worker = Thread(
+                        target=self.detection_worker,
+                        args=(_sdrs[0], _peak_queue, _result_queue, _stop_detection),
+                    )
+                    _worker.start()
+                    _workers.append(_worker)
+                    _active_workers += 1
+                continue
 
-                # Immediately send this result to the callback.
-                self.send_to_callback([[_freq, detected]])
-                # If we only want the first detected sonde, then return now.
+            if isinstance(_result, Exception):
+                # An error on the scanner's own SDR, which we need to pass up to the scan loop.
+                _error = _result
+                continue
+
+            (_freq, detected, offset_est) = _result
+
+            if self.handle_detection(_freq, detected, offset_est, _search_results):
+                # If we only want the first detected sonde, stop the workers once their current detection is done.
                 if first_only:
-                    return _search_results
+                    _stop_detection.set()
 
-                # Otherwise, we continue....
+        for _worker in _workers:
+            _worker.join()
 
-        if len(_search_results) == 0:
-            self.log_debug("No sondes detected.")
+        if _error is not None:
+            raise _error
+
+        if first_only:
+            return _search_results[:1]
         else:
-            self.log_debug("Scan Detected Sondes: %s" % str(_search_results))
+            return _search_results
 
-        return _search_results
+    def handle_detection(self, freq, detected, offset_est, search_results):
+        """Handle the result of a detection attempt.
+
+        Args:
+            freq (float): Frequency the detection was run on, in Hz.
+            detected (str): Detected sonde type, or None.
+            offset_est (float): Frequency offset estimate, in Hz.
+            search_results (list): List of search results, which detected sondes are appended to.
+
+        Returns:
+            bool: True if a sonde was detected.
+        """
+        if detected == None:
+            return False
+
+        # Quantize the detected frequency (with offset) to 1 kHz
+        _freq = round((freq + offset_est) / 1000.0) * 1000.0
+
+        # Add a detected sonde to the output array
+        search_results.append([_freq, detected])
+
+        # Immediately send this result to the callback.
+        # The scanner may have been stopped to free up a SDR for a decoder while other detections were in progress.
+        # These detections still need to be decoded, so are always sent.
+        self.send_to_callback([[_freq, detected]], while_stopping=True)
+
+        return True
+
+    def detection_worker(self, sdr, peak_queue, result_queue, stop_detection):
+        """Run sonde detection on peak frequencies from a queue using a single SDR.
+
+        Borrowed SDRs are returned as soon as the worker has finished, so they can be used by decoders.
+
+        Args:
+            sdr (dict): The device_idx, ppm, gain and bias settings of the SDR to use, and its SDR Server (if any).
+            peak_queue (Queue): Queue of frequencies to run detection on, in Hz.
+            result_queue (Queue): Queue to write (frequency, sonde type, offset) results to.
+                None is written once this worker has finished.
+            stop_detection (Event): Set when no more detections should be started.
+        """
+        try:
+            while self.sonde_scanner_running and not stop_detection.is_set():
+                try:
+                    _freq = peak_queue.get_nowait()
+                except Empty:
+                    break
+
+                try:
+                    if sdr.get("sdr_server") is not None:
+                        (detected, offset_est) = sdr["sdr_server"].detect_sonde(
+                            _freq,
+                            rs_path=self.rs_path,
+                            dwell_time=self.detect_dwell_time,
+                            save_detection_audio=self.save_detection_audio,
+                        )
+                    else:
+                        (detected, offset_est) = detect_sonde(
+                            _freq,
+                            rs_path=self.rs_path,
+                            sdr_fm=self.sdr_fm,
+                            device_idx=sdr["device_idx"],
+                            ppm=sdr["ppm"],
+                            gain=sdr["gain"],
+                            bias=sdr["bias"],
+                            dwell_time=self.detect_dwell_time,
+                            save_detection_audio=self.save_detection_audio,
+                        )
+                except IOError as e:
+                    if sdr["device_idx"] == self.device_idx:
+                        # Our own SDR has locked up - let the scan loop handle this.
+                        result_queue.put(e)
+                    else:
+                        # A borrowed SDR has locked up. Reset it, and hand the peak back for another SDR to check.
+                        self.log_warning(
+                            "Borrowed SDR #%s produced no output... resetting."
+                            % str(sdr["device_idx"])
+                        )
+                        peak_queue.put(_freq)
+                        reset_rtlsdr_by_serial(sdr["device_idx"])
+                        if sdr.get("sdr_server") is not None:
+                            sdr["sdr_server"].restart()
+                    break
+
+                result_queue.put((_freq, detected, offset_est))
+        finally:
+            # Return a borrowed SDR.
+            if (sdr["device_idx"] != self.device_idx) and (self.detect_sdr_release is not None):
+                try:
+                    self.detect_sdr_release(sdr["device_idx"])
+                except Exception as e:
+                    self.log_error(
+                        "Error releasing SDR #%s - %s" % (str(sdr["device_idx"]), str(e))
+                    )
+
+            result_queue.put(None)
 
     def oneshot(self, first_only=False):
         """Perform a once-off scan attempt
@@ -1034,6 +1959,17 @@ class SondeScanner(object):
         """Check if the scanner is running"""
         return self.sonde_scanner_running
 
+    def sdr_test(self):
+        """Check the SDR used by this scanner is working.
+
+        Returns:
+            bool: True if the SDR (or its SDR Server) is working.
+        """
+        if self.sdr_server is not None:
+            return self.sdr_server.running()
+        else:
+            return rtlsdr_test(self.device_idx)
+
     def add_temporary_block(self, frequency):
         """Add a frequency to the temporary block list.
 
@@ -0,0 +1,711 @@
+#!/usr/bin/env python
+#
+#   radiosonde_auto_rx - Persistent SDR Sample Server
+#
+#   Copyright (C) 2018  Mark Jessop <vk5qi@rfhead.net>
+#   Released under GNU GPL v3 or later
+#
+#   Keeps a long-running rtl_tcp server open on each RTLSDR, so the scanner and decoders can
+#   re-tune the SDR over a local TCP connection, instead of paying the USB open / tuner settling
+#   cost of starting a new rtl_power or rtl_fm process for every task.
+#
+#   Any rtl_tcp compatible server can be used (refer test/rtl_tcp_replay.py for a file-replay stand-in).
+#
+import logging
+import os
+import shlex
+import socket
+import struct
+import subprocess
+import time
+import numpy as np
+from threading import Lock, Thread
+from .scan import (
+    StreamingChannelizer,
+    StreamingDFTDetect,
+    iq_to_cs16,
+    parse_dft_detect_output,
+)
+
+
+# rtl_tcp command codes
+RTLTCP_SET_FREQ = 0x01
+RTLTCP_SET_SAMPLE_RATE = 0x02
+RTLTCP_SET_GAIN_MODE = 0x03
+RTLTCP_SET_GAIN = 0x04
+RTLTCP_SET_FREQ_CORRECTION = 0x05
+RTLTCP_SET_AGC_MODE = 0x08
+RTLTCP_SET_BIAS_TEE = 0x0E
+
+# Valid RTLSDR sample rate ranges, in Hz.
+RTLSDR_SAMPLE_RATES = [(225001, 300000), (900001, 3200000)]
+
+# Sample rate used for spectrum scans. rtl_power uses a similar rate.
+SPECTRUM_SAMPLE_RATE = 2048000
+# Fraction of each spectrum hop discarded at the band edges (as per rtl_power -c 20%).
+SPECTRUM_CROP = 0.2
+
+# Time to discard samples for after re-tuning, to allow the tuner (and AGC) to settle.
+RETUNE_SETTLE_TIME = 0.05
+
+# rtl_fm options (which take a value) that can be reproduced when running a decoder via the SDR Server.
+RTLFM_VALUE_OPTIONS = ("-M", "-s", "-f", "-p", "-g", "-d", "-F")
+
+
+def valid_sample_rate(sample_rate):
+    """Check if a sample rate can be used by a RTLSDR."""
+    for (_min, _max) in RTLSDR_SAMPLE_RATES:
+        if _min <= sample_rate <= _max:
+            return True
+
+    return False
+
+
+def capture_sample_rate(channel_rate, min_decimation=4):
+    """Find a RTLSDR sample rate which is an integer multiple of a channel sample rate.
+
+    Args:
+        channel_rate (int): The required channel sample rate, in Hz.
+        min_decimation (int): Minimum ratio of capture rate to channel rate. This must be at least 4 to allow
+            for the offset tuning used to avoid the RTLSDR DC spike.
+
+    Returns:
+        int: A valid RTLSDR sample rate, in Hz.
+    """
+    _decimation = min_decimation
+    while _decimation * channel_rate <= RTLSDR_SAMPLE_RATES[-1][1]:
+        if valid_sample_rate(_decimation * channel_rate):
+            return _decimation * channel_rate
+        _decimation += 1
+
+    raise ValueError("No valid capture sample rate for channel rate %d Hz" % channel_rate)
+
+
+def fm_demodulate(samples, previous=1 + 0j):
+    """FM-demodulate complex samples, producing output scaled as per rtl_fm -M fm.
+
+    Args:
+        samples (np.array): Complex samples.
+        previous (complex): The sample preceding this block, for continuity between blocks.
+
+    Returns:
+        np.array: Demodulated audio, as signed 16-bit samples.
+    """
+    _prev = np.concatenate((np.array([previous], dtype=np.complex64), samples[:-1]))
+    _angle = np.angle(samples * np.conj(_prev))
+    return (_angle * (2 ** 14) / np.pi).astype(np.int16)
+
+
+def split_rx_command(command):
+    """Split the leading rtl_fm stage off a decoder or detection command.
+
+    The SDR Server is always tuned to the decoder's SDR, and the rtl_fm -F filter is replaced by the
+    SDR Server Source's channel filter, so the -d and -F options are not needed. The -p, -g and -T options
+    are returned so they can be applied to the SDR Server connection.
+
+    Args:
+        command (str): A shell command of the form 'rtl_fm ... -M <mode> ... -s <rate> -f <freq> ... | <rest>'
+
+    Returns:
+        tuple: (mode, sample rate (Hz), frequency (Hz), options, remainder of command), or None if the
+            command does not start with a rtl_fm stage. options is a dict of the ppm, gain and bias settings
+            given in the command, as accepted by SDRServer.connect.
+
+    Raises:
+        ValueError: If the rtl_fm stage uses options which cannot be reproduced by the SDR Server.
+    """
+    if "|" not in command:
+        return None
+
+    (_rx, _rest) = command.split("|", 1)
+    _args = []
+    for _arg in shlex.split(_rx)[1:]:
+        # Options may be given with their value attached, i.e. -F9
+        if (len(_arg) > 2) and (_arg[:2] in RTLFM_VALUE_OPTIONS):
+            _args += [_arg[:2], _arg[2:]]
+        else:
+            _args.append(_arg)
+
+    if "-M" not in _args:
+        return None
+
+    _mode = None
+    _sample_rate = None
+    _frequency = None
+    _options = {}
+
+    _i = 0
+    while _i < len(_args):
+        _arg = _args[_i]
+
+        if _arg.startswith("2>"):
+            # Redirection of rtl_fm's stderr.
+            _i += 1
+            continue
+
+        if _arg == "-T":
+            _options["bias"] = True
+            _i += 1
+            continue
+
+        if (_arg not in RTLFM_VALUE_OPTIONS) or (_i + 1 >= len(_args)):
+            raise ValueError("Unsupported rtl_fm option: %s" % _arg)
+
+        _value = _args[_i + 1]
+        if _arg == "-M":
+            _mode = _value
+        elif _arg == "-s":
+            if _value.endswith("k"):
+                _sample_rate = int(float(_value[:-1]) * 1000)
+            else:
+                _sample_rate = int(float(_value))
+        elif _arg == "-f":
+            _frequency = int(float(_value))
+        elif _arg == "-p":
+            _options["ppm"] = int(_value)
+        elif _arg == "-g":
+            _options["gain"] = float(_value)
+
+        _i += 2
+
+    if _mode not in ("fm", "raw"):
+        raise ValueError("Unsupported rtl_fm mode: %s" % str(_mode))
+
+    if (_sample_rate is None) or (_frequency is None):
+        raise ValueError("rtl_fm command is missing a sample rate or frequency.")
+
+    return (_mode, _sample_rate, _frequency, _options, _rest.strip())
+
+
+class RTLTCPClient(object):
+    """A client for a rtl_tcp compatible sample server."""
+
+    def __init__(self, host="127.0.0.1", port=1234, timeout=5, on_close=None):
+        """Connect to a rtl_tcp server.
+
+        Args:
+            host (str): Hostname of the server.
+            port (int): TCP port of the server.
+            timeout (float): Socket timeout, in seconds.
+            on_close (function): Called once this client is closed.
+        """
+        self.on_close = on_close
+        self.sample_rate = None
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+
+        try:
+            _header = self.read_bytes(12)
+        except IOError:
+            self.sock.close()
+            raise
+
+        if _header[:4] != b"RTL0":
+            self.sock.close()
+            raise IOError("Invalid rtl_tcp header.")
+
+        (self.tuner_type, self.gain_count) = struct.unpack(">II", _header[4:])
+
+    def command(self, cmd, param):
+        """Send a command to the server."""
+        self.sock.sendall(struct.pack(">BI", cmd, int(param) & 0xFFFFFFFF))
+
+    def set_frequency(self, frequency):
+        self.command(RTLTCP_SET_FREQ, int(frequency))
+
+    def set_sample_rate(self, sample_rate):
+        self.sample_rate = int(sample_rate)
+        self.command(RTLTCP_SET_SAMPLE_RATE, self.sample_rate)
+
+    def set_freq_correction(self, ppm):
+        self.command(RTLTCP_SET_FREQ_CORRECTION, int(ppm))
+
+    def set_gain(self, gain):
+        """Set the SDR gain, in dB. A gain setting of -1 enables the RTLSDR AGC."""
+        if gain == -1:
+            self.command(RTLTCP_SET_GAIN_MODE, 0)
+            self.command(RTLTCP_SET_AGC_MODE, 1)
+        else:
+            self.command(RTLTCP_SET_AGC_MODE, 0)
+            self.command(RTLTCP_SET_GAIN_MODE, 1)
+            self.command(RTLTCP_SET_GAIN, int(gain * 10))
+
+    def set_bias_tee(self, bias):
+        self.command(RTLTCP_SET_BIAS_TEE, 1 if bias else 0)
+
+    def read_bytes(self, num_bytes):
+        """Read exactly num_bytes from the server."""
+        _buffer = bytearray(num_bytes)
+        _view = memoryview(_buffer)
+        _read = 0
+        while _read < num_bytes:
+            try:
+                _n = self.sock.recv_into(_view[_read:])
+            except socket.timeout:
+                raise IOError("Timeout reading from rtl_tcp.")
+            if _n == 0:
+                raise IOError("rtl_tcp connection closed.")
+            _read += _n
+
+        return _buffer
+
+    def read_iq(self, num_samples):
+        """Read a block of IQ samples.
+
+        Args:
+            num_samples (int): Number of complex samples to read.
+
+        Returns:
+            np.array: Complex (complex64) IQ samples, normalised to +/- 1.0.
+        """
+        # rtl_tcp produces interleaved unsigned 8-bit I/Q samples.
+        _iq = np.frombuffer(self.read_bytes(2 * num_samples), dtype=np.uint8)
+        _iq = (_iq.astype(np.float32) - 127.5) / 128.0
+        return _iq.view(np.complex64)
+
+    def discard(self, duration):
+        """Discard duration seconds of samples, i.e. while the tuner settles after re-tuning."""
+        self.read_bytes(2 * int(duration * self.sample_rate))
+
+    def close(self):
+        try:
+            self.sock.close()
+        except Exception:
+            pass
+
+        if self.on_close is not None:
+            _on_close = self.on_close
+            self.on_close = None
+            _on_close()
+
+
+class SDRServer(object):
+    """Runs a persistent rtl_tcp server on a RTLSDR, and provides scan, detection and capture functions over it.
+
+    rtl_tcp only supports a single client at a time, so connections are handed out one at a time.
+    """
+
+    def __init__(
+        self,
+        device_idx=0,
+        port=1234,
+        rtl_tcp="rtl_tcp",
+        host="127.0.0.1",
+        ppm=0,
+        gain=-1,
+        bias=False,
+    ):
+        """Initialise a SDR Server.
+
+        Args:
+            device_idx (int or str): Device index or serial number of the RTLSDR.
+            port (int): TCP port to run the server on.
+            rtl_tcp (str): Path to rtl_tcp, or drop-in equivalent. Defaults to 'rtl_tcp'
+            host (str): Address to bind the server to. Defaults to localhost only.
+            ppm (int): SDR Frequency accuracy correction, in ppm.
+            gain (float): SDR Gain setting, in dB. A gain setting of -1 enables the RTLSDR AGC.
+            bias (bool): If True, enable the bias tee on the SDR.
+        """
+        self.device_idx = device_idx
+        self.port = port
+        self.rtl_tcp = rtl_tcp
+        self.host = host
+        self.ppm = ppm
+        self.gain = gain
+        self.bias = bias
+
+        self.server_process = None
+        self.client_lock = Lock()
+
+    def start(self):
+        """Start the rtl_tcp server process."""
+        if self.running():
+            return
+
+        _command = "exec %s -a %s -p %d -d %s" % (
+            self.rtl_tcp,
+            self.host,
+            self.port,
+            str(self.device_idx),
+        )
+
+        logging.debug(
+            "SDR Server #%s - Starting server: %s" % (str(self.device_idx), _command)
+        )
+
+        self.server_process = subprocess.Popen(
+            _command,
+            shell=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def stop(self):
+        """Stop the rtl_tcp server process."""
+        if self.server_process is None:
+            return
+
+        try:
+            self.server_process.terminate()
+            self.server_process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.server_process.kill()
+            self.server_process.wait()
+        except Exception as e:
+            logging.error(
+                "SDR Server #%s - Error stopping server - %s"
+                % (str(self.device_idx), str(e))
+            )
+
+        self.server_process = None
+
+    def restart(self):
+        """Restart the server, i.e. after a USB reset of the RTLSDR."""
+        logging.info("SDR Server #%s - Restarting server." % str(self.device_idx))
+        self.stop()
+        self.start()
+
+    def running(self):
+        """Check if the server process is running.
+
+        Returns:
+            bool: True if the server process is running.
+        """
+        return (self.server_process is not None) and (self.server_process.poll() is None)
+
+    def connect(self, frequency, sample_rate, timeout=10, ppm=None, gain=None, bias=None):
+        """Connect to the server, and tune the SDR.
+
+        Only one client may be connected at a time. The returned client must be closed when finished with.
+
+        Args:
+            frequency (float): Centre frequency, in Hz.
+            sample_rate (int): Sample rate, in Hz.
+            timeout (float): Time to wait for the server to become available, in seconds.
+            ppm, gain, bias: If provided, use these SDR settings instead of the server's settings.
+
+        Returns:
+            RTLTCPClient: A connected and tuned client.
+        """
+        if not self.client_lock.acquire(timeout=timeout):
+            raise IOError("SDR Server #%s busy." % str(self.device_idx))
+
+        _start = time.time()
+        _client = None
+        while _client is None:
+            try:
+                _client = RTLTCPClient(
+                    self.host, self.port, on_close=self.client_lock.release
+                )
+            except (IOError, OSError) as e:
+                # The server may still be starting up.
+                if (time.time() - _start > timeout) or (not self.running()):
+                    self.client_lock.release()
+                    raise IOError(
+                        "Could not connect to SDR Server #%s - %s"
+                        % (str(self.device_idx), str(e))
+                    )
+                time.sleep(0.2)
+
+        try:
+            _client.set_sample_rate(sample_rate)
+            _client.set_freq_correction(self.ppm if ppm is None else ppm)
+            _client.set_gain(self.gain if gain is None else gain)
+            _client.set_bias_tee(self.bias if bias is None else bias)
+            _client.set_frequency(frequency)
+            _client.discard(RETUNE_SETTLE_TIME)
+        except (IOError, OSError):
+            _client.close()
+            raise
+
+        return _client
+
+    def stream(self, frequency, duration, sample_rate, block_duration=0.1):
+        """Capture IQ samples, producing blocks of samples as they are received.
+
+        Args:
+            frequency (float): Centre frequency of the capture, in Hz.
+            duration (float): Length of the capture, in seconds.
+            sample_rate (int): Capture sample rate, in Hz.
+            block_duration (float): Length of each block of samples, in seconds.
+
+        Yields:
+            np.array: Complex (complex64) IQ samples, normalised to +/- 1.0.
+        """
+        _client = self.connect(frequency, sample_rate)
+        try:
+            _remaining = int(duration * sample_rate)
+            _block_size = int(block_duration * sample_rate)
+            while _remaining > 0:
+                _samples = min(_block_size, _remaining)
+                yield _client.read_iq(_samples)
+                _remaining -= _samples
+        finally:
+            _client.close()
+
+    def stream_channel(self, frequency, duration, channel_rate, block_duration=0.1):
+        """Capture IQ samples centred on a frequency, avoiding the RTLSDR DC spike, producing blocks of
+        samples as they are received.
+
+        The SDR is tuned away from the frequency of interest, and the channel is then extracted from the capture.
+
+        Args:
+            frequency (float): Centre frequency of the channel, in Hz.
+            duration (float): Length of the capture, in seconds.
+            channel_rate (int): Sample rate of the channel, in Hz.
+            block_duration (float): Length of each block of samples, in seconds.
+
+        Yields:
+            np.array: Complex (complex64) IQ samples, at channel_rate.
+        """
+        _sample_rate = capture_sample_rate(channel_rate)
+        _offset = _sample_rate / 4
+
+        _channelizer = StreamingChannelizer(
+            -_offset, sample_rate=_sample_rate, channel_rate=channel_rate
+        )
+        _source = self.stream(
+            frequency + _offset, duration, _sample_rate, block_duration=block_duration
+        )
+        try:
+            for _iq in _source:
+                yield _channelizer.process(_iq)
+        finally:
+            _source.close()
+
+    def spectrum(self, start, stop, step, dwell=20):
+        """Measure the power spectrum across a frequency range, as rtl_power would.
+
+        Args:
+            start (float): Start of the frequency range, in Hz.
+            stop (float): End of the frequency range, in Hz.
+            step (float): Frequency resolution, in Hz.
+            dwell (float): Total time to average the spectrum over, in seconds.
+
+        Returns:
+            tuple: (freq, power, step) - as per read_rtl_power.
+        """
+        # Use a power-of-two FFT size with a resolution of at least 'step'.
+        _fft_size = int(2 ** np.ceil(np.log2(SPECTRUM_SAMPLE_RATE / step)))
+        _bin_width = SPECTRUM_SAMPLE_RATE / _fft_size
+
+        _crop = int(_fft_size * SPECTRUM_CROP / 2)
+        _hop_width = (_fft_size - 2 * _crop) * _bin_width
+        _hops = int(np.ceil((stop - start) / _hop_width))
+
+        _samples_per_hop = int(dwell * SPECTRUM_SAMPLE_RATE / _hops)
+        _frames_per_block = max(1, int(0.1 * SPECTRUM_SAMPLE_RATE) // _fft_size)
+        _window = np.hanning(_fft_size).astype(np.float32)
+
+        freq = np.zeros(_hops * (_fft_size - 2 * _crop), dtype=np.float64)
+        power = np.zeros(_hops * (_fft_size - 2 * _crop), dtype=np.float64)
+
+        _client = self.connect(start + _hop_width / 2, SPECTRUM_SAMPLE_RATE)
+        try:
+            for _hop in range(_hops):
+                _hop_start = start + _hop * _hop_width
+                if _hop > 0:
+                    _client.set_frequency(_hop_start + _hop_width / 2)
+                    _client.discard(RETUNE_SETTLE_TIME)
+
+                _accumulator = np.zeros(_fft_size, dtype=np.float64)
+                _frames = 0
+                while _frames * _fft_size < _samples_per_hop:
+                    _block = _client.read_iq(_frames_per_block * _fft_size)
+                    _spectrum = np.fft.fft(
+                        _block.reshape(_frames_per_block, _fft_size) * _window, axis=1
+                    )
+                    _accumulator += np.sum(np.abs(_spectrum) ** 2, axis=0)
+                    _frames += _frames_per_block
+
+                _accumulator = np.fft.fftshift(_accumulator / _frames)
+
+                _n = _fft_size - 2 * _crop
+                freq[_hop * _n : (_hop + 1) * _n] = (
+                    _hop_start + np.arange(_n) * _bin_width
+                )
+                power[_hop * _n : (_hop + 1) * _n] = 10 * np.log10(
+                    _accumulator[_crop : _fft_size - _crop] + 1e-20
+                )
+        finally:
+            _client.close()
+
+        return (freq, power, _bin_width)
+
+    def detect_sonde(
+        self,
+        frequency,
+        rs_path="./",
+        dwell_time=10,
+        save_detection_audio=False,
+        ngp_tweak=False,
+    ):
+        """Attempt to detect a radiosonde, using the same detection settings as scan.detect_sonde.
+
+        Args:
+            frequency (int): Frequency to perform the detection on, in Hz.
+            rs_path (str): Path to the RS binaries (i.e dft_detect). Defaults to ./
+            dwell_time (int): Timeout before giving up detection.
+            save_detection_audio (bool): Save the samples used in detection to a file.
+            ngp_tweak (bool): When scanning in the 1680 MHz sonde band, use a narrower filter for better RS92-NGP detection.
+
+        Returns:
+            tuple: (sonde type, frequency offset estimate in Hz), as per scan.detect_sonde.
+        """
+        logging.debug(
+            "Scanner #%s - Attempting sonde detection on %.3f MHz via SDR Server"
+            % (str(self.device_idx), frequency / 1e6)
+        )
+
+        # Samples are passed to dft_detect as they are received, and the capture is stopped as soon as
+        # dft_detect has finished (i.e. after making a detection).
+        if (frequency < 1000e6) or ngp_tweak:
+            # IQ detection
+            _if_bw = 20 if frequency < 1000e6 else 32
+            _detect = StreamingDFTDetect(
+                rs_path=rs_path,
+                dwell_time=dwell_time,
+                sample_rate=48000,
+                if_bw=_if_bw,
+                device_idx=self.device_idx,
+                save_filename=(
+                    "detect_%s.raw" % str(self.device_idx) if save_detection_audio else None
+                ),
+            )
+
+            _source = self.stream_channel(frequency, dwell_time, 48000)
+            try:
+                for _iq in _source:
+                    _detect.write(_iq)
+                    if not _detect.running:
+                        break
+            finally:
+                _source.close()
+                _result = _detect.result()
+
+            return _result
+
+        # LMS6-1680 detection, using a wide FM demodulator.
+        _rx_bw = 250000
+
+        _detect_command = (
+            "sox -t raw -r %d -e s -b 16 -c 1 - -r 48000 -t wav - highpass 20 2>/dev/null | "
+            % _rx_bw
+        )
+        if save_detection_audio:
+            _detect_command += "tee detect_%s.wav | " % str(self.device_idx)
+        _detect_command += (
+            os.path.join(rs_path, "dft_detect") + " -t %d 2>/dev/null" % dwell_time
+        )
+
+        try:
+            _detect = subprocess.Popen(
+                _detect_command, shell=True, stdin=subprocess.PIPE, stdout=subprocess.PIPE
+            )
+        except Exception as e:
+            logging.error(
+                "Scanner #%s - Error when running dft_detect - %s"
+                % (str(self.device_idx), str(e))
+            )
+            return (None, 0.0)
+
+        _source = self.stream_channel(frequency, dwell_time, _rx_bw)
+        try:
+            _previous = 1 + 0j
+            for _channel in _source:
+                try:
+                    _detect.stdin.write(fm_demodulate(_channel, _previous).tobytes())
+                    _detect.stdin.flush()
+                except (BrokenPipeError, OSError):
+                    # dft_detect has exited (i.e. after making a detection).
+                    break
+                _previous = _channel[-1]
+        finally:
+            _source.close()
+            try:
+                _detect.stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
+            _output = _detect.stdout.read()
+            _detect.stdout.close()
+            _detect.wait()
+
+        # dft_detect returns a code of 1 if no sonde is detected.
+        if _detect.returncode == 1:
+            return (None, 0.0)
+
+        return parse_dft_detect_output(_output.decode("utf8"), self.device_idx)
+
+
+class SDRServerSource(Thread):
+    """Feeds samples from a SDR Server into the stdin of a decoder pipeline, in place of rtl_fm.
+
+    Samples are produced in the same format as rtl_fm: interleaved signed 16-bit IQ for '-M raw',
+    or signed 16-bit FM-demodulated audio for '-M fm'.
+    """
+
+    # Block length, in seconds.
+    BLOCK_TIME = 0.1
+
+    def __init__(self, server, output, mode, sample_rate, frequency, options={}):
+        """Initialise a SDR Server Source.
+
+        Args:
+            server (SDRServer): The SDR Server to read samples from.
+            output (file): Binary file object to write samples to, i.e. a decoder process' stdin.
+            mode (str): 'raw' or 'fm', as per the rtl_fm -M option.
+            sample_rate (int): Output sample rate, in Hz.
+            frequency (float): Centre frequency, in Hz.
+            options (dict): ppm, gain and bias settings to use instead of the server's settings (refer split_rx_command).
+        """
+        Thread.__init__(self)
+        self.daemon = True
+
+        self.server = server
+        self.output = output
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.frequency = frequency
+
+        self.capture_rate = capture_sample_rate(sample_rate)
+        self.offset = self.capture_rate / 4
+
+        self.client = self.server.connect(
+            self.frequency + self.offset, self.capture_rate, **options
+        )
+        self.running = True
+
+    def run(self):
+        _channelizer = StreamingChannelizer(
+            -self.offset, sample_rate=self.capture_rate, channel_rate=self.sample_rate
+        )
+        _block_size = int(self.BLOCK_TIME * self.capture_rate)
+        _previous = 1 + 0j
+
+        try:
+            while self.running:
+                _channel = _channelizer.process(self.client.read_iq(_block_size))
+
+                if self.mode == "fm":
+                    _output = fm_demodulate(_channel, _previous).tobytes()
+                    _previous = _channel[-1]
+                else:
+                    _output = iq_to_cs16(_channel)
+
+                self.output.write(_output)
+                self.output.flush()
+        except (IOError, OSError, ValueError) as e:
+            # The decoder has exited (broken pipe), or the server connection has been lost.
+            if self.running:
+                logging.debug(
+                    "SDR Server #%s - Sample source closed - %s"
+                    % (str(self.server.device_idx), str(e))
+                )
+        finally:
+            self.client.close()
+            try:
+                self.output.close()
+            except Exception:
+                pass
+
+    def stop(self):
+        self.running = False
@@ -11,6 +11,9 @@
 #   Plot SNR Map: 
 #       python3 -m autorx.stats --snrmap
 #
+#   Add new log files to the station coverage map (used by the SNR maps):
+#       python3 -m autorx.stats --update-coverage
+#
 #   Copyright (C) 2021  Mark Jessop <vk5qi@rfhead.net>
 #   Released under GNU GPL v3 or later
 #
@@ -31,9 +34,9 @@ from autorx.utils import (
     short_type_lookup,
     readable_timedelta,
     strip_sonde_serial,
-    position_info,
 )
-from autorx.log_files import list_log_files, read_log_by_serial
+from autorx.coverage import CoverageMap
+from autorx.log_files import list_log_files
 
 
 def radio_horizon_plot(log_files, min_range_km=10, max_range_km=1000, save_figure=None):
@@ -74,73 +77,15 @@ def radio_horizon_plot(log_files, min_range_km=10, max_range_km=1000, save_figur
     plt.grid()
 
 
-def normalised_snr(log_files, min_range_km=10, max_range_km=1000, maxsnr=False, meansnr=True, normalise=True):
-    """ Read in ALL log files and store snr data into a set of bins, normalised to 50km range. """
-
-    _norm_range = 50 # km
-
-    _snr_count = 0
+def normalised_snr(coverage, maxsnr=False, meansnr=True, normalise=True):
+    """ Plot an SNR map (binned by bearing/elevation) from a station coverage map, optionally normalised to 50km range. """
 
     _title = autorx.config.global_config['habitat_uploader_callsign'] + " SNR Map"
 
-    # Initialise output array
-    _map = np.ones((360,90))*-100.0
-
-    _station = (
-        autorx.config.global_config['station_lat'],
-        autorx.config.global_config['station_lon'],
-        autorx.config.global_config['station_alt']
-    )
-
-    for _log in log_files:
-
-        if 'has_snr' in _log:
-            if _log['has_snr'] == False:
-                continue
-        
-        # Read in the file.
-        _data = read_log_by_serial(_log['serial'])
-
-        if 'snr' not in _data:
-            # No SNR information, move on.
-            continue
-
-        logging.debug(f"Got SNR data ({len(_data['snr'])}) for {_log['serial']}")
-        for _i in range(len(_data['path'])):
-            _snr = _data['snr'][_i]
-            # Discard obviously sus SNR values
-            if _snr > 40.0 or _snr < 5.0:
-                continue
-
-            _balloon = _data['path'][_i]
-            _pos_info = position_info(_station, _balloon)
-
-            _range = _pos_info['straight_distance']/1000.0
-            _bearing = int(math.floor(_pos_info['bearing']))
-            _elevation = int(math.floor(_pos_info['elevation']))
-
-            if _range < min_range_km or _range > max_range_km:
-                continue
-
-            # Limit elevation data to 0-90
-            if _elevation < 0:
-                _elevation = 0
-            
-            if normalise:
-                _snr =  _snr + 20*np.log10(_range/_norm_range)
-
-            #print(f"{_bearing},{_elevation}: {_range} km, {_snr} dB, {_norm_snr} dB")
-
-            if _map[_bearing,_elevation] < -10.0:
-                _map[_bearing,_elevation] = _snr
-            else:
-                if meansnr:
-                    _map[_bearing,_elevation] = np.mean([_map[_bearing,_elevation],_snr])
-                elif maxsnr:
-                    if _snr > _map[_bearing,_elevation]:
-                        _map[_bearing,_elevation] = _snr
-
+    _map = coverage.snr_map(normalise=normalise, maxsnr=(maxsnr or not meansnr))
 
+    # Fill empty cells with a value below the plot range.
+    _map = np.nan_to_num(_map, nan=-100.0)
 
     print(_map)
 
@@ -199,6 +144,25 @@ if __name__ == "__main__":
         help="Generate Normalised SNR Map (Maximum SNR)"
     )
 
+    parser.add_argument(
+        "--update-coverage",
+        action="store_true",
+        default=False,
+        help="Add any new log files to the station coverage map."
+    )
+    parser.add_argument(
+        "--rebuild-coverage",
+        action="store_true",
+        default=False,
+        help="Rebuild the station coverage map from all log files."
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes to use when reading log files. Default: One per CPU"
+    )
     parser.add_argument(
         "-v", "--verbose", help="Enable debug output.", action="store_true"
     )
@@ -218,23 +182,31 @@ if __name__ == "__main__":
     autorx.config.global_config = _temp_cfg
 
 
-    # Read in the log files.
-    logging.info("Quick-Looking Log Files")
-    log_list = list_log_files(quicklook=True)
-    logging.info(f"Loaded in {len(log_list)} log files.")
-
+    autorx.logging_path = args.log
 
     if args.horizon:
+        # Read in the log files.
+        logging.info("Quick-Looking Log Files")
+        log_list = list_log_files(quicklook=True)
+        logging.info(f"Loaded in {len(log_list)} log files.")
+
         radio_horizon_plot(log_list)
 
+    if args.snrmap or args.snrmapmax or args.snrmapmaxnorm or args.update_coverage or args.rebuild_coverage:
+        # Load the coverage map, and add in any log files which are not yet included.
+        coverage = CoverageMap(args.log)
+        coverage.update(rebuild=args.rebuild_coverage, workers=args.workers)
+        coverage.save()
+        logging.info(f"Coverage map contains {int(coverage.count.sum())} observations from {len(coverage.logs)} log files.")
+
     if args.snrmap:
-        normalised_snr(log_list)
+        normalised_snr(coverage)
     
     if args.snrmapmax:
-        normalised_snr(log_list, meansnr=False, maxsnr=True, normalise=False)
+        normalised_snr(coverage, meansnr=False, maxsnr=True, normalise=False)
 
     if args.snrmapmaxnorm:
-        normalised_snr(log_list, meansnr=False, maxsnr=True, normalise=True)
+        normalised_snr(coverage, meansnr=False, maxsnr=True, normalise=True)
 
     plt.show()
 
@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+#
+#   radiosonde_auto_rx - Telemetry Bus
+#
+#   Copyright (C) 2018  Mark Jessop <vk5qi@rfhead.net>
+#   Released under GNU GPL v3 or later
+#
+#   Fans telemetry out from the decoders to each of the exporters (logger, uploaders, web interface, etc).
+#   Each exporter gets its own bounded queue and delivery thread, so a slow exporter (i.e. an uploader
+#   during a network outage) can neither stall the decoders, nor grow memory without limit.
+#
+import logging
+import time
+from collections import OrderedDict, deque
+from threading import Condition, Thread
+
+
+# Overflow policies
+# Discard the oldest queued telemetry when the queue is full.
+POLICY_DROP_OLDEST = "drop_oldest"
+# Only keep the latest queued telemetry for each sonde serial number. If the queue is still full, discard the oldest.
+POLICY_COALESCE = "coalesce"
+
+OVERFLOW_POLICIES = [POLICY_DROP_OLDEST, POLICY_COALESCE]
+
+
+class TelemetrySubscriber(object):
+    """A single exporter's bounded telemetry queue and delivery thread."""
+
+    # Wait this long before re-checking a backed-up exporter.
+    BACKLOG_WAIT = 0.1
+
+    def __init__(
+        self, name, callback, max_size=500, policy=POLICY_DROP_OLDEST, backlog=None
+    ):
+        """Initialise a Telemetry Subscriber.
+
+        Args:
+            name (str): Exporter name, used in logging and metrics.
+            callback (function): Exporter function, which accepts a single telemetry dictionary.
+            max_size (int): Maximum number of telemetry dictionaries to hold for this exporter.
+            policy (str): Overflow policy, either 'drop_oldest' or 'coalesce'.
+            backlog (function): Optional function returning the number of items still queued within the exporter itself.
+                Telemetry is held back on the bus (where the overflow policy applies) while this is at or above max_size.
+        """
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError("Unknown overflow policy: %s" % policy)
+
+        self.name = name
+        self.callback = callback
+        self.max_size = max_size
+        self.policy = policy
+        self.backlog = backlog
+
+        # Queued telemetry, as (enqueue time, telemetry) tuples.
+        # Coalescing queues are keyed by sonde serial number.
+        if self.policy == POLICY_COALESCE:
+            self.queue = OrderedDict()
+        else:
+            self.queue = deque()
+
+        self.condition = Condition()
+
+        # Metrics
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.latency_avg = 0.0
+        self.latency_max = 0.0
+
+        self.running = True
+        self.delivery_thread = Thread(target=self.delivery_loop)
+        self.delivery_thread.daemon = True
+        self.delivery_thread.start()
+
+    def put(self, telemetry):
+        """Add telemetry to the queue. This never blocks."""
+        with self.condition:
+            if not self.running:
+                return
+
+            self.published += 1
+            _item = (time.time(), telemetry)
+
+            if self.policy == POLICY_COALESCE:
+                _key = telemetry.get("id", None)
+                if _key in self.queue:
+                    # Replace the older, undelivered, telemetry from this sonde.
+                    # This keeps the original enqueue time, so latency reflects how long the sonde has waited.
+                    self.queue[_key] = (self.queue[_key][0], telemetry)
+                    self.coalesced += 1
+                else:
+                    self.queue[_key] = _item
+            else:
+                self.queue.append(_item)
+
+            while len(self.queue) > self.max_size:
+                self.pop_item()
+                self.dropped += 1
+                if self.dropped == 1:
+                    logging.warning(
+                        "Telemetry Bus - %s queue full, discarding old telemetry."
+                        % self.name
+                    )
+
+            self.max_depth = max(self.max_depth, len(self.queue))
+            self.condition.notify()
+
+    def pop_item(self):
+        """Remove and return the oldest queued item. Must be called with the condition held."""
+        if self.policy == POLICY_COALESCE:
+            return self.queue.popitem(last=False)[1]
+        else:
+            return self.queue.popleft()
+
+    def delivery_loop(self):
+        """Deliver queued telemetry to the exporter."""
+        while self.running:
+            # Hold telemetry on the bus while the exporter is backed up.
+            if self.backlog is not None:
+                try:
+                    if self.backlog() >= self.max_size:
+                        time.sleep(self.BACKLOG_WAIT)
+                        continue
+                except Exception:
+                    pass
+
+            with self.condition:
+                while self.running and (len(self.queue) == 0):
+                    self.condition.wait()
+
+                if not self.running:
+                    break
+
+                (_enqueue_time, _telemetry) = self.pop_item()
+
+            try:
+                self.callback(_telemetry)
+            except Exception as e:
+                self.errors += 1
+                logging.error(
+                    "Telemetry Bus - Error passing telemetry to %s - %s"
+                    % (self.name, str(e))
+                )
+
+            _latency = time.time() - _enqueue_time
+            self.delivered += 1
+            self.latency_max = max(self.latency_max, _latency)
+            # Exponentially weighted moving average of the latency.
+            self.latency_avg = 0.9 * self.latency_avg + 0.1 * _latency
+
+    def metrics(self):
+        """Return the current metrics for this subscriber.
+
+        Returns:
+            dict: Queue depth, delivery/drop counts and latency (seconds) for this exporter.
+        """
+        with self.condition:
+            return {
+                "depth": len(self.queue),
+                "max_depth": self.max_depth,
+                "max_size": self.max_size,
+                "policy": self.policy,
+                "published": self.published,
+                "delivered": self.delivered,
+                "dropped": self.dropped,
+                "coalesced": self.coalesced,
+                "errors": self.errors,
+                "latency_avg": self.latency_avg,
+                "latency_max": self.latency_max,
+            }
+
+    def close(self):
+        """Stop the delivery thread. Any undelivered telemetry is discarded."""
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+
+
+class TelemetryBus(object):
+    """Publishes telemetry from the decoders to a set of exporters, via a bounded queue per exporter."""
+
+    def __init__(self, max_size=500, policy=POLICY_DROP_OLDEST):
+        """Initialise a Telemetry Bus.
+
+        Args:
+            max_size (int): Default maximum queue size for each exporter.
+            policy (str): Default overflow policy, either 'drop_oldest' or 'coalesce'.
+        """
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError("Unknown overflow policy: %s" % policy)
+
+        self.max_size = max_size
+        self.policy = policy
+        self.subscribers = []
+
+    def subscribe(self, name, callback, max_size=None, policy=None, backlog=None):
+        """Add an exporter to the bus.
+
+        Args:
+            name (str): Exporter name, used in logging and metrics.
+            callback (function): Exporter function, which accepts a single telemetry dictionary.
+            max_size (int): Maximum queue size for this exporter. Defaults to the bus setting.
+            policy (str): Overflow policy for this exporter. Defaults to the bus setting.
+            backlog (function): Optional function returning the number of items queued within the exporter itself.
+
+        Returns:
+            TelemetrySubscriber: The new subscriber.
+        """
+        _subscriber = TelemetrySubscriber(
+            name,
+            callback,
+            max_size=self.max_size if max_size is None else max_size,
+            policy=self.policy if policy is None else policy,
+            backlog=backlog,
+        )
+        self.subscribers.append(_subscriber)
+
+        return _subscriber
+
+    def publish(self, telemetry):
+        """Pass telemetry to all exporters. This never blocks on a slow exporter.
+
+        Args:
+            telemetry (dict): Telemetry dictionary, as produced by SondeDecoder.
+        """
+        for _subscriber in self.subscribers:
+            _subscriber.put(telemetry)
+
+    def metrics(self):
+        """Return the metrics for all exporters.
+
+        Returns:
+            dict: Metrics dictionaries (refer TelemetrySubscriber.metrics), keyed by exporter name.
+        """
+        return {_sub.name: _sub.metrics() for _sub in self.subscribers}
+
+    def close(self):
+        """Stop all delivery threads."""
+        for _subscriber in self.subscribers:
+            _subscriber.close()
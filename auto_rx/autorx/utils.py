@@ -14,6 +14,7 @@ import os
 import platform
 import re
 import requests
+import selectors
 import subprocess
 import threading
 import time
@@ -381,6 +382,125 @@ class AsynchronousFileReader(threading.Thread):
             yield self.queue.get()
 
 
+class LineDispatcher(threading.Thread):
+    """ Line Dispatcher
+    Reads lines from many file objects (i.e. the pipes of every running decoder subprocess)
+    using a single thread and selector, and passes each line to a per-file callback as soon as it arrives.
+    This avoids needing a reader thread per pipe, and a consumer thread polling each reader's queue.
+    """
+
+    # Maximum number of bytes to read from a file at a time.
+    READ_SIZE = 65536
+
+    def __init__(self):
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+        self.selector = selectors.DefaultSelector()
+
+        # Files to add to the selector. These are registered from within the dispatcher thread.
+        self.pending = Queue()
+
+        # Pipe used to wake up the selector when a file is added.
+        (self._wake_read, self._wake_write) = os.pipe()
+        os.set_blocking(self._wake_read, False)
+        self.selector.register(self._wake_read, selectors.EVENT_READ, None)
+
+        self.start()
+
+    def add(self, fd, line_callback, eof_callback=None):
+        """ Start reading lines from a file.
+
+        Args:
+            fd (file): A binary file object, i.e. a subprocess stdout or stderr pipe.
+                The dispatcher takes ownership of this file, and closes it once EOF is reached.
+            line_callback (function): Called with each line (as bytes, including the trailing newline).
+                This is called from the dispatcher thread, so must not block.
+            eof_callback (function): Called once EOF is reached.
+        """
+        self.pending.put((fd, line_callback, eof_callback))
+        os.write(self._wake_write, b"\0")
+
+    def run(self):
+        while True:
+            for (_key, _mask) in self.selector.select():
+                if _key.data is None:
+                    # Wake-up request - register any new files.
+                    try:
+                        os.read(self._wake_read, 4096)
+                    except BlockingIOError:
+                        pass
+
+                    while not self.pending.empty():
+                        (_fd, _line_callback, _eof_callback) = self.pending.get()
+                        os.set_blocking(_fd.fileno(), False)
+                        self.selector.register(
+                            _fd,
+                            selectors.EVENT_READ,
+                            {
+                                "line": _line_callback,
+                                "eof": _eof_callback,
+                                "buffer": b"",
+                            },
+                        )
+                else:
+                    self.read(_key)
+
+    def read(self, key):
+        """ Read available data from a file, and dispatch any complete lines. """
+        _handler = key.data
+
+        try:
+            _data = os.read(key.fd, self.READ_SIZE)
+        except BlockingIOError:
+            return
+        except OSError:
+            _data = b""
+
+        if _data:
+            _lines = (_handler["buffer"] + _data).split(b"\n")
+            _handler["buffer"] = _lines.pop()
+            for _line in _lines:
+                self.dispatch(_handler["line"], _line + b"\n")
+            return
+
+        # EOF - Pass on any partial last line, then stop reading from this file.
+        if _handler["buffer"]:
+            self.dispatch(_handler["line"], _handler["buffer"])
+
+        self.selector.unregister(key.fileobj)
+        try:
+            key.fileobj.close()
+        except Exception:
+            pass
+
+        if _handler["eof"] is not None:
+            self.dispatch(_handler["eof"])
+
+    def dispatch(self, callback, *args):
+        """ Run a callback, making sure an error in one callback does not stop the dispatcher. """
+        try:
+            callback(*args)
+        except Exception as e:
+            logging.exception("Line Dispatcher - Error in callback - %s" % str(e))
+
+
+# The shared line dispatcher, started on first use.
+_line_dispatcher = None
+_line_dispatcher_lock = threading.Lock()
+
+
+def get_line_dispatcher():
+    """ Get the shared LineDispatcher instance, starting it if required. """
+    global _line_dispatcher
+
+    with _line_dispatcher_lock:
+        if _line_dispatcher is None:
+            _line_dispatcher = LineDispatcher()
+
+    return _line_dispatcher
+
+
 #
 #   Peak Search Utilities, used by the sonde scanning functions.
 #
@@ -1029,6 +1149,76 @@ def position_info(listener, balloon):
     }
 
 
+# Fields returned by position_info_array
+POSITION_INFO_DTYPE = np.dtype(
+    [
+        ("angle_at_centre", np.float64),
+        ("bearing", np.float64),
+        ("great_circle_distance", np.float64),
+        ("straight_distance", np.float64),
+        ("elevation", np.float64),
+    ]
+)
+
+
+def position_info_array(listener, balloon):
+    """
+    Vectorised version of position_info, for calculating the relative positions of many points at once.
+
+    Args:
+        listener: A single (lat, lon, alt) tuple, or an array of shape (N, 3).
+        balloon: A single (lat, lon, alt) tuple, or an array of shape (N, 3).
+            Listener and balloon positions are broadcast against each other, so a single listener
+            can be compared with many balloon positions, or vice versa.
+
+    Returns:
+        np.ndarray: Structured array (refer POSITION_INFO_DTYPE), with fields angle_at_centre, bearing,
+            great_circle_distance, straight_distance and elevation, in the same units as position_info.
+    """
+
+    # Earth:
+    radius = 6371000.0
+
+    listener = np.asarray(listener, dtype=np.float64)
+    balloon = np.asarray(balloon, dtype=np.float64)
+
+    lat1 = np.radians(listener[..., 0])
+    lon1 = np.radians(listener[..., 1])
+    alt1 = listener[..., 2]
+    lat2 = np.radians(balloon[..., 0])
+    lon2 = np.radians(balloon[..., 1])
+    alt2 = balloon[..., 2]
+
+    # Refer position_info for the derivation of the following.
+    d_lon = lon2 - lon1
+    sa = np.cos(lat2) * np.sin(d_lon)
+    sb = (np.cos(lat1) * np.sin(lat2)) - (np.sin(lat1) * np.cos(lat2) * np.cos(d_lon))
+    bearing = np.arctan2(sa, sb)
+    aa = np.sqrt((sa ** 2) + (sb ** 2))
+    ab = (np.sin(lat1) * np.sin(lat2)) + (np.cos(lat1) * np.cos(lat2) * np.cos(d_lon))
+    angle_at_centre = np.arctan2(aa, ab)
+
+    ta = radius + alt1
+    tb = radius + alt2
+    ea = (np.cos(angle_at_centre) * tb) - ta
+    eb = np.sin(angle_at_centre) * tb
+    elevation = np.arctan2(ea, eb)
+
+    distance = np.sqrt((ta ** 2) + (tb ** 2) - 2 * tb * ta * np.cos(angle_at_centre))
+
+    # Give a bearing in range 0 <= b < 2pi
+    bearing = np.where(bearing < 0, bearing + 2 * np.pi, bearing)
+
+    _output = np.empty(np.shape(angle_at_centre), dtype=POSITION_INFO_DTYPE)
+    _output["angle_at_centre"] = np.degrees(angle_at_centre)
+    _output["bearing"] = np.degrees(bearing)
+    _output["great_circle_distance"] = angle_at_centre * radius
+    _output["straight_distance"] = distance
+    _output["elevation"] = np.degrees(elevation)
+
+    return _output
+
+
 def peak_decimation(freq, power, factor):
     """ Peak-preserving Decimation.
 
@@ -6,8 +6,10 @@
 #   Released under MIT License
 #
 import base64
-import copy
+import bisect
 import datetime
+import gzip
+import hashlib
 import json
 import logging
 import random
@@ -18,12 +20,26 @@ import sys
 import autorx
 import autorx.config
 import autorx.scan
-from autorx.geometry import GenericTrack
+from autorx.coverage import get_coverage_map
+from autorx.geometry import (
+    GenericTrack,
+    PathSimplifier,
+    simplify_path,
+    track_positions,
+    zoom_to_tolerance,
+)
 from autorx.utils import check_autorx_versions
-from autorx.log_files import list_log_files, read_log_by_serial, zip_log_files
-from threading import Thread
+from autorx.log_files import (
+    list_log_files,
+    log_summaries_pending,
+    query_logs,
+    read_log_by_serial_json,
+    zip_log_files,
+)
+from collections import deque
+from threading import Thread, Lock
 import flask
-from flask import request, abort, make_response, send_file
+from flask import request, abort, make_response
 from flask_socketio import SocketIO
 import re
 
@@ -64,10 +80,19 @@ socketio = SocketIO(app, async_mode="threading")
 # Under each key (which will be the sonde ID), we will have a dictionary containing:
 #   'latest_timestamp': timestamp (unix timestamp) of when the last packet was received.
 #   'latest_telem': telemetry dictionary.
-#   'path': list of [lat,lon,alt] pairs
-#   'track': A GenericTrack object, which is used to determine the current ascent/descent rate.
+#   'seq': sequence number of the latest update.
+#   'simplifier': A PathSimplifier object, which holds a simplified copy of the path (None if disabled).
+#   'track': A GenericTrack object, which holds the sonde's path (with the sequence number of each position),
+#       and is used to determine the current ascent/descent rate.
+#
+# Every update to the store is given a monotonically increasing sequence number, so clients can request
+# only the data added since their last update. The sequence numbers restart when auto_rx is restarted, so they
+# are accompanied by an instance ID (the start time of this instance), which lets clients detect a restart.
 #
 flask_telemetry_store = {}
+flask_telemetry_seq = 0
+flask_telemetry_instance = "%d" % int(time.time() * 1000)
+flask_telemetry_lock = Lock()
 
 #
 # Globally called 'emit' function
@@ -107,6 +132,15 @@ def flask_get_version():
     return json.dumps({"current": autorx.__version__, "latest": _newer})
 
 
+@app.route("/get_exporter_stats")
+def flask_get_exporter_stats():
+    """ Return the queue depth, drop counts and latency of each exporter """
+    if autorx.telemetry_bus is None:
+        return json.dumps({})
+
+    return json.dumps(autorx.telemetry_bus.metrics())
+
+
 @app.route("/get_task_list")
 def flask_get_task_list():
     """ Return the current list of active SDRs, and their active task names """
@@ -154,36 +188,8 @@ def flask_get_kml():
     return kml.kml(), 200, {"content-type": "application/vnd.google-earth.kml+xml"}
 
 
-@app.route("/rs_feed.kml")
-def flask_get_kml_feed():
-    """ Return KML with RS telemetry """
-    kml = Kml()
-    kml.resetidcounter()
-    kml.document.name = "Track"
-    kml.document.open = 1
-    # Station Placemark
-    pnt = kml.newpoint(
-        name="Ground Station",
-        altitudemode=AltitudeMode.absolute,
-        description="AutoRX Ground Station",
-    )
-    pnt.open = 1
-    pnt.iconstyle.icon.href = flask.request.host_url + "static/img/antenna-green.png"
-    pnt.coords = [
-        (
-            autorx.config.global_config["station_lon"],
-            autorx.config.global_config["station_lat"],
-            autorx.config.global_config["station_alt"],
-        )
-    ]
-    for rs_id in flask_telemetry_store:
-        try:
-            coordinates = []
-
-            for tp in flask_telemetry_store[rs_id]["track"].track_history:
-                coordinates.append((tp[2], tp[1], tp[3]))
-
-            rs_data = """\
+# Description of a sonde in the KML feed, formatted with the sonde's latest telemetry.
+KML_SONDE_DESCRIPTION = """\
             {type}/{subtype}
             Frequency: {freq}
             Altitude: {alt:.1f} m
@@ -194,62 +200,287 @@ def flask_get_kml_feed():
             Humidity: {humidity:.1f} %
             Pressure: {pressure:.1f} hPa
             """
-            if flask_telemetry_store[rs_id]["latest_telem"]["vel_v"] > -5:
-                icon = flask.request.host_url + "static/img/balloon-green.png"
+
+# Placeholder for the track coordinates within a KML sonde fragment, replaced with the cached coordinate text.
+KML_TRACK_PLACEHOLDER = (0.123456789, 0.123456789, 0.123456789)
+
+
+class TelemetryFeedCache(object):
+    """
+    Produces the KML (Google Earth network link) and GeoJSON telemetry feeds, caching the output so that clients
+    polling the feeds only cause the feed to be rebuilt when the telemetry store changes.
+
+    Each sonde's part of the feed (its 'fragment') is cached separately, and only rebuilt when that sonde has new
+    telemetry. The track coordinate text for each sonde is extended with only the newly received positions.
+    Complete feeds are cached (along with a gzip-compressed copy), keyed on the telemetry store sequence number.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+
+        # Per-sonde state, containing:
+        #   'seq': Sequence number of the sonde's telemetry the fragments were built from.
+        #   'track_seq': Sequence number of the last track position in the coordinate text.
+        #   'kml_coords', 'geojson_coords': Lists of the coordinate text for each track position.
+        #   'kml', 'geojson': (key, fragment) tuples.
+        self.sondes = {}
+
+        # Complete feeds, by format: (key, etag, feed, gzip-compressed feed or None)
+        self.feeds = {}
+
+    def get_feed(self, feed_format, host_url):
+        """ Get a telemetry feed, rebuilding it if the telemetry store has changed.
+
+        Args:
+            feed_format (str): 'kml' or 'geojson'
+            host_url (str): URL of the web interface, used to reference the icons in the KML feed.
+
+        Returns:
+            tuple: (etag, feed, gzip-compressed feed or None if not yet compressed)
+        """
+        _station = (
+            autorx.config.global_config["station_lon"],
+            autorx.config.global_config["station_lat"],
+            autorx.config.global_config["station_alt"],
+        )
+
+        with self.lock:
+            with flask_telemetry_lock:
+                _key = (flask_telemetry_seq, host_url, _station)
+                if (feed_format in self.feeds) and (self.feeds[feed_format][0] == _key):
+                    return self.feeds[feed_format][1:]
+
+                _updates = self.collect_updates()
+
+            self.apply_updates(_updates)
+
+            _fragments = []
+            for _id in sorted(self.sondes):
+                _state = self.sondes[_id]
+                _fragment_key = (_state["seq"], host_url, _station)
+                if (_state.get(feed_format) is None) or (_state[feed_format][0] != _fragment_key):
+                    try:
+                        if feed_format == "kml":
+                            _fragment = self.kml_fragment(_id, _state, host_url, _station)
+                        else:
+                            _fragment = self.geojson_fragment(_id, _state, _station)
+                    except Exception as e:
+                        logging.error(
+                            "Feed - Could not parse data from RS %s - %s" % (_id, str(e))
+                        )
+                        _fragment = None
+
+                    _state[feed_format] = (_fragment_key, _fragment)
+
+                if _state[feed_format][1]:
+                    _fragments.append(_state[feed_format][1])
+
+            if feed_format == "kml":
+                _feed = self.kml_feed(_fragments, host_url, _station)
             else:
-                icon = flask.request.host_url + "static/img/parachute-green.png"
-
-            # Add folder
-            fol = kml.newfolder(name=rs_id)
-            # HAB Placemark
-            pnt = fol.newpoint(
-                name=rs_id,
-                altitudemode=AltitudeMode.absolute,
-                description=rs_data.format(
-                    **flask_telemetry_store[rs_id]["latest_telem"]
-                ),
+                _feed = self.geojson_feed(_fragments, _station)
+
+            _etag = hashlib.sha1(repr((feed_format, _key)).encode("utf-8")).hexdigest()
+            self.feeds[feed_format] = (_key, _etag, _feed.encode("utf-8"), None)
+            return self.feeds[feed_format][1:]
+
+    def get_compressed_feed(self, feed_format, etag):
+        """ Get the gzip-compressed copy of a feed (as returned by get_feed), compressing it if required. """
+        with self.lock:
+            (_key, _etag, _feed, _compressed) = self.feeds[feed_format]
+            if _etag != etag:
+                # The feed has been rebuilt in the meantime.
+                return None
+
+            if _compressed is None:
+                _compressed = gzip.compress(_feed, compresslevel=6)
+                self.feeds[feed_format] = (_key, _etag, _feed, _compressed)
+
+            return _compressed
+
+    def collect_updates(self):
+        """ Collect the new telemetry and track positions for each sonde, since the fragments were last built.
+        Must be called with the telemetry store locked. """
+        _updates = {}
+        for (_id, _sonde) in flask_telemetry_store.items():
+            _state = self.sondes.get(_id)
+            if (_state is not None) and (_state["seq"] == _sonde["seq"]):
+                _updates[_id] = None
+                continue
+
+            _track = _sonde["track"]
+            if (_state is None) or _track.max_elements:
+                # New sonde, or a track which drops old positions - start again.
+                _since = 0
+            else:
+                _since = _state["track_seq"]
+
+            _new_track = _track.get_track(_since)
+            _updates[_id] = {
+                "seq": _sonde["seq"],
+                "latest_telem": _sonde["latest_telem"].copy(),
+                "start": _since,
+                "track_seq": int(_new_track["seq"][-1]) if len(_new_track) > 0 else _since,
+                "positions": _track.positions(_since)[:, [1, 0, 2]].tolist(),
+            }
+
+        return _updates
+
+    def apply_updates(self, updates):
+        """ Update the per-sonde state with the output of collect_updates. """
+        for _id in list(self.sondes):
+            if _id not in updates:
+                # Sonde has been removed from the telemetry store.
+                self.sondes.pop(_id)
+
+        for (_id, _update) in updates.items():
+            if _update is None:
+                continue
+
+            if _update["start"] == 0:
+                self.sondes[_id] = {"kml_coords": [], "geojson_coords": []}
+
+            _state = self.sondes[_id]
+            _state["seq"] = _update["seq"]
+            _state["latest_telem"] = _update["latest_telem"]
+            _state["track_seq"] = _update["track_seq"]
+            _state["kml_coords"].extend(
+                "%s,%s,%s" % tuple(_position) for _position in _update["positions"]
             )
-            pnt.iconstyle.icon.href = icon
-            pnt.coords = [
-                (
-                    flask_telemetry_store[rs_id]["latest_telem"]["lon"],
-                    flask_telemetry_store[rs_id]["latest_telem"]["lat"],
-                    flask_telemetry_store[rs_id]["latest_telem"]["alt"],
-                )
-            ]
-            linestring = fol.newlinestring(name="Track")
-            linestring.coords = coordinates
-            linestring.altitudemode = AltitudeMode.absolute
-            linestring.extrude = 1
-            linestring.stylemap.normalstyle.linestyle.color = "ff03bafc"
-            linestring.stylemap.highlightstyle.linestyle.color = "ff03bafc"
-            linestring.stylemap.normalstyle.polystyle.color = "AA03bafc"
-            linestring.stylemap.highlightstyle.polystyle.color = "CC03bafc"
-            # Add LOS line
-            linestring = fol.newlinestring(name="LOS")
-            linestring.altitudemode = AltitudeMode.absolute
-            linestring.coords = [
-                (
-                    autorx.config.global_config["station_lon"],
-                    autorx.config.global_config["station_lat"],
-                    autorx.config.global_config["station_alt"],
-                ),
-                (
-                    flask_telemetry_store[rs_id]["latest_telem"]["lon"],
-                    flask_telemetry_store[rs_id]["latest_telem"]["lat"],
-                    flask_telemetry_store[rs_id]["latest_telem"]["alt"],
-                ),
-            ]
-        except Exception as e:
-            logging.error(
-                "KML - Could not parse data from RS %s - %s" % (rs_id, str(e))
+            _state["geojson_coords"].extend(
+                "[%s,%s,%s]" % tuple(_position) for _position in _update["positions"]
             )
 
-    return (
-        re.sub("<Document.*>", "<Document>", kml.kml()),
-        200,
-        {"content-type": "application/vnd.google-earth.kml+xml"},
-    )
+    def kml_fragment(self, rs_id, state, host_url, station):
+        """ Produce the KML folder for a sonde. """
+        _telem = state["latest_telem"]
+
+        if _telem["vel_v"] > -5:
+            icon = host_url + "static/img/balloon-green.png"
+        else:
+            icon = host_url + "static/img/parachute-green.png"
+
+        kml = Kml()
+        # Add folder
+        fol = kml.newfolder(name=rs_id)
+        # HAB Placemark
+        pnt = fol.newpoint(
+            name=rs_id,
+            altitudemode=AltitudeMode.absolute,
+            description=KML_SONDE_DESCRIPTION.format(**_telem),
+        )
+        pnt.iconstyle.icon.href = icon
+        pnt.coords = [(_telem["lon"], _telem["lat"], _telem["alt"])]
+        linestring = fol.newlinestring(name="Track")
+        # The coordinates are filled in below, from the cached coordinate text.
+        linestring.coords = [KML_TRACK_PLACEHOLDER]
+        linestring.altitudemode = AltitudeMode.absolute
+        linestring.extrude = 1
+        linestring.stylemap.normalstyle.linestyle.color = "ff03bafc"
+        linestring.stylemap.highlightstyle.linestyle.color = "ff03bafc"
+        linestring.stylemap.normalstyle.polystyle.color = "AA03bafc"
+        linestring.stylemap.highlightstyle.polystyle.color = "CC03bafc"
+        # Add LOS line
+        linestring = fol.newlinestring(name="LOS")
+        linestring.altitudemode = AltitudeMode.absolute
+        linestring.coords = [station, (_telem["lon"], _telem["lat"], _telem["alt"])]
+
+        return str(fol).replace(
+            "%s,%s,%s" % KML_TRACK_PLACEHOLDER, " ".join(state["kml_coords"]), 1
+        )
+
+    def geojson_fragment(self, rs_id, state, station):
+        """ Produce the GeoJSON features for a sonde (position, track and line-of-sight), as a JSON fragment. """
+        _telem = state["latest_telem"]
+        _position = [_telem["lon"], _telem["lat"], _telem["alt"]]
+
+        _point = {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": _position},
+            "properties": dict(_telem, name=rs_id, feature="sonde"),
+        }
+        _track = (
+            '{"type": "Feature", "geometry": {"type": "LineString", "coordinates": [%s]}, "properties": %s}'
+            % (
+                ",".join(state["geojson_coords"]),
+                json.dumps({"name": "Track", "serial": rs_id, "feature": "track"}),
+            )
+        )
+        _los = {
+            "type": "Feature",
+            "geometry": {"type": "LineString", "coordinates": [list(station), _position]},
+            "properties": {"name": "LOS", "serial": rs_id, "feature": "los"},
+        }
+
+        return ", ".join([json.dumps(_point, default=str), _track, json.dumps(_los)])
+
+    def kml_feed(self, fragments, host_url, station):
+        """ Produce the KML feed from the sonde fragments. """
+        kml = Kml()
+        kml.document.name = "Track"
+        kml.document.open = 1
+        # Station Placemark
+        pnt = kml.newpoint(
+            name="Ground Station",
+            altitudemode=AltitudeMode.absolute,
+            description="AutoRX Ground Station",
+        )
+        pnt.open = 1
+        pnt.iconstyle.icon.href = host_url + "static/img/antenna-green.png"
+        pnt.coords = [station]
+
+        _kml = re.sub("<Document.*?>", "<Document>", kml.kml(format=False), count=1)
+        return '<?xml version="1.0" encoding="UTF-8"?>\n' + _kml.replace(
+            "</Document>", "".join(fragments) + "</Document>", 1
+        )
+
+    def geojson_feed(self, fragments, station):
+        """ Produce the GeoJSON feed (a FeatureCollection) from the sonde fragments. """
+        _station = {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": list(station)},
+            "properties": {"name": "Ground Station", "feature": "station"},
+        }
+        return '{"type": "FeatureCollection", "features": [%s]}' % ", ".join(
+            [json.dumps(_station)] + fragments
+        )
+
+
+telemetry_feed_cache = TelemetryFeedCache()
+
+
+def feed_response(feed_format, mimetype):
+    """ Respond with a telemetry feed, compressed if the client supports it.
+    An ETag is provided, so clients which already have the latest feed get a 304 (Not Modified) response. """
+    (_etag, _feed, _) = telemetry_feed_cache.get_feed(feed_format, flask.request.host_url)
+
+    _compressed = None
+    if request.accept_encodings["gzip"]:
+        _compressed = telemetry_feed_cache.get_compressed_feed(feed_format, _etag)
+
+    if _compressed is not None:
+        response = make_response(_compressed)
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = make_response(_feed)
+
+    response.mimetype = mimetype
+    response.headers["Vary"] = "Accept-Encoding"
+    response.set_etag(_etag)
+    response.make_conditional(request)
+    return response
+
+
+@app.route("/rs_feed.kml")
+def flask_get_kml_feed():
+    """ Return KML with RS telemetry """
+    return feed_response("kml", "application/vnd.google-earth.kml+xml")
+
+
+@app.route("/rs_feed.geojson")
+def flask_get_geojson_feed():
+    """ Return GeoJSON with RS telemetry (equivalent to the KML feed) """
+    return feed_response("geojson", "application/geo+json")
 
 
 @app.route("/get_config")
@@ -268,15 +499,111 @@ def flask_get_scan_data():
     return json.dumps(autorx.scan.scan_result)
 
 
+def default_path_tolerance():
+    """ The path simplification tolerance (metres) used when a client does not request one. """
+    return autorx.config.global_config.get("web_path_tolerance", 10.0)
+
+
+def path_tolerance_arg():
+    """ Get the path simplification tolerance requested by a client, either as a tolerance in metres
+    (?tolerance=X, where 0 requests the full path), or as a map zoom level (?zoom=X).
+
+    Returns:
+        float: The path tolerance, in metres.
+    """
+    if "tolerance" in request.values:
+        return max(0.0, float(request.values["tolerance"]))
+    elif "zoom" in request.values:
+        return zoom_to_tolerance(float(request.values["zoom"]))
+    else:
+        return default_path_tolerance()
+
+
+def telemetry_archive_snapshot(since=None, tolerance=None):
+    """ Take a snapshot of the telemetry store, suitable for serialising.
+
+    Only the required part of each sonde's track is copied while the store is locked. It is converted to lists
+    (and simplified, if required) afterwards.
+
+    Args:
+        since (int): If provided, only include sondes which have been updated after this sequence number,
+            and only the path entries added after it. The sequence numbers of the path entries are included
+            (as 'path_seq'), so clients can discard any entries they have already received.
+        tolerance (float): Path simplification tolerance, in metres. Defaults to the web_path_tolerance setting,
+            for which the incrementally simplified path is used. If 0, the full path is provided.
+
+    Returns:
+        tuple: (snapshot, sequence number of the latest update)
+    """
+    if tolerance is None:
+        tolerance = default_path_tolerance()
+
+    _snapshot = {}
+
+    with flask_telemetry_lock:
+        for (_id, _sonde) in flask_telemetry_store.items():
+            if (since is not None) and (_sonde["seq"] <= since):
+                continue
+
+            _snapshot[_id] = {
+                "timestamp": _sonde["timestamp"],
+                "latest_telem": _sonde["latest_telem"].copy(),
+                "seq": _sonde["seq"],
+            }
+
+            if (
+                _sonde["simplifier"] is not None
+                and (tolerance == _sonde["simplifier"].tolerance)
+            ):
+                (_path, _path_seq) = _sonde["simplifier"].get_path()
+                _start = 0 if since is None else bisect.bisect_right(_path_seq, since)
+                _snapshot[_id]["path"] = _path[_start:]
+                _snapshot[_id]["path_seq"] = _path_seq[_start:]
+            else:
+                # The full track, which is converted (and simplified) below.
+                _snapshot[_id]["track"] = _sonde["track"].get_track(since or 0).copy()
+
+        _seq = flask_telemetry_seq
+
+    # Convert and simplify the tracks outside of the lock, so we don't hold up incoming telemetry.
+    for _sonde in _snapshot.values():
+        if "track" in _sonde:
+            _track = _sonde.pop("track")
+            _path = track_positions(_track)
+            _keep = simplify_path(_path, tolerance)
+            _sonde["path"] = _path[_keep].tolist()
+            _sonde["path_seq"] = _track["seq"][_keep].tolist()
+
+        if since is None:
+            _sonde.pop("path_seq")
+
+    return (_snapshot, _seq)
+
+
 @app.route("/get_telemetry_archive")
 def flask_get_telemetry_archive():
-    """ Return a copy of the telemetry archive """
-    # Make a copy of the store, and remove the non-serialisable GenericTrack object
-    _temp_store = copy.deepcopy(flask_telemetry_store)
-    for _element in _temp_store:
-        _temp_store[_element].pop("track")
+    """ Return a copy of the telemetry archive.
+    If a 'since' sequence number is provided, only the data added after that update is returned.
+    The latest sequence number and the instance ID are provided in the X-Telemetry-Seq and X-Telemetry-Instance
+    headers. If the instance ID has changed, or the sequence number is less than 'since', auto_rx has been
+    restarted, and clients should discard their data and reload the whole archive.
+    The paths are simplified, as per path_tolerance_arg. """
+    try:
+        _since = request.args.get("since", None)
+        if _since is not None:
+            _since = int(_since)
 
-    return json.dumps(_temp_store)
+        _tolerance = path_tolerance_arg()
+    except ValueError:
+        abort(400)
+
+    (_snapshot, _seq) = telemetry_archive_snapshot(_since, _tolerance)
+
+    _response = make_response(json.dumps(_snapshot))
+    _response.mimetype = "application/json"
+    _response.headers["X-Telemetry-Seq"] = str(_seq)
+    _response.headers["X-Telemetry-Instance"] = flask_telemetry_instance
+    return _response
 
 
 @app.route("/shutdown/<shutdown_key>")
@@ -296,10 +623,100 @@ def flask_get_log_list():
     return json.dumps(list_log_files(quicklook=True))
 
 
+def query_arg_list(name, count=None, convert=float):
+    """ Read a comma-separated query argument, i.e. ?landing_bbox=-35.5,138,-34.5,139
+    Empty entries are returned as None (?range=,20 -> [None, 20.0]). """
+    _value = request.args.get(name, None)
+    if _value is None:
+        return None
+
+    _values = [convert(_v) if _v.strip() else None for _v in _value.split(",")]
+    if (count is not None) and (len(_values) != count):
+        raise ValueError(f"{name} requires {count} values.")
+
+    return _values
+
+
+@app.route("/query_logs")
+def flask_query_logs():
+    """ Find flights in the log archive, returning a list of flight summaries (refer autorx.log_files.query_logs).
+
+    Query arguments (all optional):
+        start, end: Time range (ISO-8601), i.e. 2021-01-01T00:00:00Z
+        type: Comma-separated sonde types, i.e. RS41,DFM
+        freq: Frequency range (MHz), i.e. 400,403
+        burst_bbox, landing_bbox: Bounding box (lat_min,lon_min,lat_max,lon_max)
+        range: Range of the maximum distance from the station (km), i.e. 100,
+        landing_range: Range of the landing distance from the station (km), i.e. ,20
+        limit: Maximum number of flights to return.
+
+    Only flights which have already been summarised are returned. The number of log files still to be summarised
+    (in the background) is provided in the X-Log-Summaries-Pending header.
+    """
+    try:
+        _burst_bbox = query_arg_list("burst_bbox", 4)
+        _landing_bbox = query_arg_list("landing_bbox", 4)
+        if (_burst_bbox and None in _burst_bbox) or (_landing_bbox and None in _landing_bbox):
+            raise ValueError("Incomplete bounding box.")
+
+        _query = {
+            "start": request.args.get("start", None),
+            "end": request.args.get("end", None),
+            "types": query_arg_list("type", convert=str),
+            "freq": query_arg_list("freq", 2),
+            "burst_bbox": _burst_bbox,
+            "landing_bbox": _landing_bbox,
+            "range_km": query_arg_list("range", 2),
+            "landing_range_km": query_arg_list("landing_range", 2),
+            "limit": request.args.get("limit", None, type=int),
+        }
+        if _query["types"]:
+            _query["types"] = [_type.strip() for _type in _query["types"] if _type]
+
+        _response = make_response(json.dumps(query_logs(**_query)))
+        _response.mimetype = "application/json"
+        _response.headers["X-Log-Summaries-Pending"] = str(log_summaries_pending())
+        return _response
+
+    except ValueError as e:
+        logging.error("Web - Invalid log query: " + str(e))
+        abort(400)
+
+
+def log_response(serial, skewt_decimation=25):
+    """ Respond with a processed log file, with an ETag so clients can re-validate their cached copy.
+    The path is simplified, as per path_tolerance_arg. """
+    try:
+        _tolerance = path_tolerance_arg()
+    except ValueError:
+        abort(400)
+
+    (_json, _etag) = read_log_by_serial_json(
+        serial, skewt_decimation=skewt_decimation, path_tolerance=_tolerance
+    )
+
+    response = make_response(_json)
+    if _etag:
+        response.set_etag(_etag)
+        # Allow the client to cache the log, but have it check with us before re-using it.
+        response.headers["Cache-Control"] = "no-cache"
+        response.make_conditional(request)
+
+    return response
+
+
+@app.route("/get_coverage_map")
+def flask_get_coverage_map():
+    """ Return the station coverage map, as a list of populated bearing/elevation cells.
+    The normalised SNR (to a 50km range) is returned unless ?normalise=0 is provided. """
+    _normalise = request.args.get("normalise", "1") != "0"
+    return json.dumps(get_coverage_map().to_dict(normalise=_normalise))
+
+
 @app.route("/get_log_by_serial/<serial>")
 def flask_get_log_by_serial(serial):
     """ Request a log file be read, by serial number """
-    return json.dumps(read_log_by_serial(serial))
+    return log_response(serial)
 
 
 @app.route("/get_log_detail", methods=["POST"])
@@ -320,7 +737,23 @@ def flask_get_log_by_serial_detail():
         else:
             _decim = 25
 
-        return json.dumps(read_log_by_serial(_serial, skewt_decimation=_decim))
+        return log_response(_serial, skewt_decimation=_decim)
+
+
+def zip_response(zip_stream):
+    """ Stream a zip file (as produced by zip_log_files) to the client as a download. """
+
+    _ts = datetime.datetime.strftime(datetime.datetime.utcnow(), "%Y%m%d-%H%M%SZ")
+    _filename = f"autorx_logfiles_{autorx.config.global_config['habitat_uploader_callsign']}_{_ts}.zip"
+
+    response = flask.Response(zip_stream, mimetype="application/zip")
+    response.headers["Content-Disposition"] = f'attachment; filename="{_filename}"'
+
+    # Add header asking client not to cache the download
+    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
+    response.headers["Pragma"] = "no-cache"
+
+    return response
 
 
 @app.route("/export_log_files/<serialb64>")
@@ -335,22 +768,7 @@ def flask_export_selected_log_files(serialb64):
 
         _zip = zip_log_files(_serial_list)
 
-        _ts = datetime.datetime.strftime(datetime.datetime.utcnow(), "%Y%m%d-%H%M%SZ")
-
-        response = make_response(
-            flask.send_file(
-                _zip,
-                mimetype="application/zip",
-                as_attachment=True,
-                attachment_filename=f"autorx_logfiles_{autorx.config.global_config['habitat_uploader_callsign']}_{_ts}.zip",
-            )
-        )
-
-        # Add header asking client not to cache the download
-        response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-        response.headers["Pragma"] = "no-cache"
-
-        return response
+        return zip_response(_zip)
 
     except Exception as e:
         logging.error("Web - Error handling Zip request:" + str(e))
@@ -366,22 +784,7 @@ def flask_export_all_log_files():
     try:
         _zip = zip_log_files()
 
-        _ts = datetime.datetime.strftime(datetime.datetime.utcnow(), "%Y%m%d-%H%M%SZ")
-
-        response = make_response(
-            flask.send_file(
-                _zip,
-                mimetype="application/zip",
-                as_attachment=True,
-                attachment_filename=f"autorx_logfiles_{autorx.config.global_config['habitat_uploader_callsign']}_{_ts}.zip",
-            )
-        )
-
-        # Add header asking client not to cache the download
-        response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-        response.headers["Pragma"] = "no-cache"
-
-        return response
+        return zip_response(_zip)
 
     except Exception as e:
         logging.error("Web - Error handling Zip request:" + str(e))
@@ -565,8 +968,8 @@ def flask_thread(host="0.0.0.0", port=5000):
     socketio.run(app, host=host, port=port)
 
 
-def start_flask(host="0.0.0.0", port=5000):
-    """ Start up the Flask Server """
+def start_flask(host="0.0.0.0", port=5000, refresh_rate=1.0):
+    """ Start up the Flask Server, and the event scheduler, which sends updates to clients every refresh_rate seconds. """
     global flask_app_thread, flask_shutdown_key
     # Generate the shutdown key
     flask_shutdown_key = str(random.randint(10000, 100000000))
@@ -576,10 +979,13 @@ def start_flask(host="0.0.0.0", port=5000):
     flask_app_thread.start()
     logging.info("Started Flask server on http://%s:%d" % (host, port))
 
+    flask_event_scheduler.start(refresh_rate)
+
 
 def stop_flask(host="0.0.0.0", port=5000):
     """ Shutdown the Flask Server by submmitting a shutdown request """
     global flask_shutdown_key
+    flask_event_scheduler.close()
     try:
         r = requests.get("http://%s:%d/shutdown/%s" % (host, port, flask_shutdown_key))
         logging.info("Web - Flask Server Shutdown.")
@@ -588,11 +994,123 @@ def stop_flask(host="0.0.0.0", port=5000):
         traceback.print_exc()
 
 
+class WebEventScheduler(object):
+    """
+    Sends telemetry and log events to web clients at a fixed rate, rather than as they occur.
+
+    Telemetry is coalesced per sonde - each update contains the latest telemetry, along with the path positions
+    received since the previous update (as 'path' and 'path_seq'). Log messages are sent as a bundle (a 'log_events'
+    event containing a list of log entries). Clients which are not keeping up with the updates (i.e. have a large
+    backlog of packets waiting to be sent) are disconnected, rather than queueing more data for them.
+    """
+
+    # Send at most this many log messages per update. Older messages are discarded.
+    MAX_LOG_EVENTS = 200
+
+    # Disconnect clients with more than this many packets waiting to be sent.
+    MAX_CLIENT_QUEUE = 500
+
+    def __init__(self):
+        self.refresh_rate = 1.0
+        self.lock = Lock()
+
+        # Telemetry to be sent, keyed by sonde ID.
+        self.telemetry = {}
+        self.log_events = deque(maxlen=self.MAX_LOG_EVENTS)
+        self.log_events_dropped = 0
+
+        self.running = False
+        self.thread = None
+
+    def start(self, refresh_rate=1.0):
+        """ Start sending updates every refresh_rate seconds. """
+        self.refresh_rate = refresh_rate
+        self.running = True
+        self.thread = Thread(target=self.run)
+        self.thread.start()
+
+    def add_telemetry(self, telemetry, position, seq):
+        """ Queue telemetry to be sent to clients, along with its position and sequence number. """
+        with self.lock:
+            if telemetry["id"] not in self.telemetry:
+                self.telemetry[telemetry["id"]] = {"path": [], "path_seq": []}
+
+            _update = self.telemetry[telemetry["id"]]
+            _update["telem"] = telemetry
+            _update["path"].append(position)
+            _update["path_seq"].append(seq)
+
+    def add_log(self, log_data):
+        """ Queue a log message to be sent to clients. """
+        with self.lock:
+            if len(self.log_events) == self.log_events.maxlen:
+                self.log_events_dropped += 1
+            self.log_events.append(log_data)
+
+    def run(self):
+        while self.running:
+            time.sleep(self.refresh_rate)
+            try:
+                self.send_updates()
+                self.drop_slow_clients()
+            except Exception as e:
+                logging.error("Web - Error sending updates to clients - %s" % str(e))
+
+        logging.debug("Web - Closed event scheduler thread.")
+
+    def send_updates(self):
+        """ Send all queued telemetry and log messages to clients. """
+        # Take the queued data, and emit it outside of the lock, as emitting may produce log messages.
+        with self.lock:
+            _telemetry = self.telemetry
+            self.telemetry = {}
+            _log_events = list(self.log_events)
+            self.log_events.clear()
+            _dropped = self.log_events_dropped
+            self.log_events_dropped = 0
+
+        for _update in _telemetry.values():
+            _telem = _update["telem"].copy()
+            _telem["path"] = _update["path"]
+            _telem["path_seq"] = _update["path_seq"]
+            socketio.emit("telemetry_event", _telem, namespace="/update_status")
+
+        if _dropped > 0:
+            _log_events.insert(
+                0,
+                {
+                    "level": "WARNING",
+                    "timestamp": datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    "msg": "Web - %d log messages were not sent." % _dropped,
+                },
+            )
+
+        if _log_events:
+            socketio.emit("log_events", _log_events, namespace="/update_status")
+
+    def drop_slow_clients(self):
+        """ Disconnect any clients with a large backlog of packets waiting to be sent to them. """
+        for _socket in list(socketio.server.eio.sockets.values()):
+            if (not _socket.closed) and (_socket.queue.qsize() > self.MAX_CLIENT_QUEUE):
+                logging.warning(
+                    "Web - Disconnecting client %s, which is not keeping up with updates."
+                    % _socket.sid
+                )
+                # Don't wait for the backlog to be sent.
+                _socket.close(wait=False, abort=True)
+
+    def close(self):
+        self.running = False
+
+
+flask_event_scheduler = WebEventScheduler()
+
+
 class WebHandler(logging.Handler):
     """ Logging Handler for sending log messages via Socket.IO to a Web Client """
 
     def emit(self, record):
-        """ Emit a log message via SocketIO """
+        """ Send a log message to the web clients (via the event scheduler) """
         if "socket.io" not in record.msg:
 
             # Inhibit flask session disconnected errors
@@ -605,8 +1123,7 @@ class WebHandler(logging.Handler):
                 "timestamp": datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
                 "msg": record.msg,
             }
-            # Emit to all socket.io clients
-            socketio.emit("log_event", log_data, namespace="/update_status")
+            flask_event_scheduler.add_log(log_data)
 
 
 class WebExporter(object):
@@ -660,7 +1177,7 @@ class WebExporter(object):
 
     def handle_telemetry(self, telemetry):
         """ Send incoming telemetry to clients, and add it to the telemetry store. """
-        global flask_telemetry_store
+        global flask_telemetry_store, flask_telemetry_seq
 
         if telemetry == None:
             logging.error("WebExporter - Passed NoneType instead of Telemetry.")
@@ -683,48 +1200,62 @@ class WebExporter(object):
             # Convert to MHz.
             _telem["freq"] = "%.3f MHz" % (_freq / 1e3)
 
-        # Add the telemetry information to the global telemetry store
-        if _telem["id"] not in flask_telemetry_store:
-            flask_telemetry_store[_telem["id"]] = {
-                "timestamp": time.time(),
-                "latest_telem": _telem,
-                "path": [],
-                "track": GenericTrack(),
-            }
-
-        flask_telemetry_store[_telem["id"]]["path"].append(
-            [_telem["lat"], _telem["lon"], _telem["alt"]]
-        )
-        flask_telemetry_store[_telem["id"]]["latest_telem"] = _telem
-        flask_telemetry_store[_telem["id"]]["timestamp"] = time.time()
-
-        # Update the sonde's track and extract the current state.
-        flask_telemetry_store[_telem["id"]]["track"].add_telemetry(
-            {
-                "time": _telem["datetime_dt"],
-                "lat": _telem["lat"],
-                "lon": _telem["lon"],
-                "alt": _telem["alt"],
-            }
-        )
-        _telem_state = flask_telemetry_store[_telem["id"]]["track"].get_latest_state()
+        with flask_telemetry_lock:
+            flask_telemetry_seq += 1
+            _telem["seq"] = flask_telemetry_seq
+            _telem["instance"] = flask_telemetry_instance
+
+            # Add the telemetry information to the global telemetry store
+            if _telem["id"] not in flask_telemetry_store:
+                flask_telemetry_store[_telem["id"]] = {
+                    "timestamp": time.time(),
+                    "latest_telem": _telem,
+                    "seq": 0,
+                    "simplifier": None,
+                    "track": GenericTrack(),
+                }
+                if default_path_tolerance() > 0:
+                    flask_telemetry_store[_telem["id"]]["simplifier"] = PathSimplifier(
+                        tolerance=default_path_tolerance()
+                    )
+
+            _position = [_telem["lat"], _telem["lon"], _telem["alt"]]
+            if flask_telemetry_store[_telem["id"]]["simplifier"] is not None:
+                flask_telemetry_store[_telem["id"]]["simplifier"].add(
+                    _position, flask_telemetry_seq
+                )
+            flask_telemetry_store[_telem["id"]]["seq"] = flask_telemetry_seq
+            flask_telemetry_store[_telem["id"]]["latest_telem"] = _telem
+            flask_telemetry_store[_telem["id"]]["timestamp"] = time.time()
+
+            # Update the sonde's track and extract the current state.
+            flask_telemetry_store[_telem["id"]]["track"].add_telemetry(
+                {
+                    "time": _telem["datetime_dt"],
+                    "lat": _telem["lat"],
+                    "lon": _telem["lon"],
+                    "alt": _telem["alt"],
+                    "seq": flask_telemetry_seq,
+                }
+            )
+            _telem_state = flask_telemetry_store[_telem["id"]]["track"].get_latest_state()
 
-        # Add the calculated vertical and horizontal velocity, and heading to the telemetry dict.
-        _telem["vel_v"] = _telem_state["ascent_rate"]
-        _telem["vel_h"] = _telem_state["speed"]
-        _telem["heading"] = _telem_state["heading"]
+            # Add the calculated vertical and horizontal velocity, and heading to the telemetry dict.
+            _telem["vel_v"] = _telem_state["ascent_rate"]
+            _telem["vel_h"] = _telem_state["speed"]
+            _telem["heading"] = _telem_state["heading"]
 
-        # Remove the datetime object that is part of the telemetry, if it exists.
-        # (it might not be present in test data)
-        if "datetime_dt" in _telem:
-            _telem.pop("datetime_dt")
+            # Remove the datetime object that is part of the telemetry, if it exists.
+            # (it might not be present in test data)
+            if "datetime_dt" in _telem:
+                _telem.pop("datetime_dt")
 
-        # Pass it on to the client.
-        socketio.emit("telemetry_event", _telem, namespace="/update_status")
+        # Pass it on to the clients.
+        flask_event_scheduler.add_telemetry(_telem, _position, _telem["seq"])
 
     def clean_telemetry_store(self):
         """ Remove any old data from the telemetry store """
-        global flask_telemetry_store
+        global flask_telemetry_store, flask_telemetry_seq
 
         _now = time.time()
         _telem_ids = list(flask_telemetry_store.keys())
@@ -732,7 +1263,10 @@ class WebExporter(object):
             # If the most recently telemetry is older than self.max_age, remove all data for
             # that sonde from the archive.
             if (_now - flask_telemetry_store[_id]["timestamp"]) > self.max_age:
-                flask_telemetry_store.pop(_id)
+                with flask_telemetry_lock:
+                    flask_telemetry_store.pop(_id)
+                    # Removing a sonde is also a change to the store.
+                    flask_telemetry_seq += 1
                 logging.debug("WebExporter - Removed Sonde #%s from archive." % _id)
 
     def add(self, telemetry):
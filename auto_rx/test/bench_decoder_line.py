@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+#
+#   Benchmark the decoder output line handler (SondeDecoder.handle_decoder_line).
+#
+#   Copyright (C) 2018  Mark Jessop <vk5qi@rfhead.net>
+#   Released under GNU GPL v3 or later
+#
+#   Replays recorded decoder output (one JSON telemetry line per line, as produced by the decoders,
+#   i.e. ./rs41mod --ptu2 --json) through handle_decoder_line, and reports the per-line handling time.
+#   The individual parsing steps are also timed against the original json/dateutil parsing approach.
+#   If no recording is supplied, synthetic RS41 telemetry lines are used.
+#
+#   Run from this directory with:
+#   python bench_decoder_line.py [--file decoder_output.txt] [--type RS41]
+#
+import argparse
+import json
+import os
+import sys
+import time
+from dateutil.parser import parse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import autorx
+import autorx.decode
+from autorx.decode import SondeDecoder, decoder_json_loads, parse_decoder_datetime
+
+
+class BenchDecoder(SondeDecoder):
+    """ A SondeDecoder which does not start a decoder subprocess, so lines can be fed in directly. """
+
+    def generate_decoder_command(self):
+        return None
+
+
+def generate_lines(count):
+    """ Generate synthetic RS41 decoder output lines. """
+    _lines = []
+    for _i in range(count):
+        _lines.append(
+            json.dumps(
+                {
+                    "type": "RS41",
+                    "frame": 1000 + _i,
+                    "id": "S1234567",
+                    "datetime": "2022-01-01T%02d:%02d:%02d.000Z"
+                    % ((_i // 3600) % 24, (_i // 60) % 60, _i % 60),
+                    "lat": -34.9 + _i * 1e-5,
+                    "lon": 138.5 + _i * 1e-5,
+                    "alt": 1000.0 + _i * 5.0,
+                    "vel_h": 8.6,
+                    "heading": 342.4,
+                    "vel_v": 5.0,
+                    "sats": 9,
+                    "bt": 65535,
+                    "batt": 2.9,
+                    "temp": -10.5,
+                    "humidity": 50.1,
+                    "pressure": 850.2,
+                    "subtype": "RS41-SGP",
+                    "version": autorx.__version__,
+                }
+            ).encode("ascii")
+            + b"\n"
+        )
+    return _lines
+
+
+def load_lines(filename):
+    """ Load recorded decoder output. The version field is updated to match this auto_rx version,
+    so the lines are not rejected by the decoder version check. """
+    _lines = []
+    with open(filename, "rb") as _f:
+        for _line in _f:
+            if _line.startswith(b"{"):
+                try:
+                    _data = json.loads(_line)
+                    _data["version"] = autorx.__version__
+                    _line = json.dumps(_data).encode("ascii") + b"\n"
+                except Exception:
+                    pass
+            _lines.append(_line)
+    return _lines
+
+
+def time_function(func, items, runs):
+    """ Return the best-of-N runtime of func over all items, in seconds. """
+    _best = None
+    for _i in range(runs):
+        _start = time.perf_counter()
+        for _item in items:
+            func(_item)
+        _runtime = time.perf_counter() - _start
+        if (_best is None) or (_runtime < _best):
+            _best = _runtime
+    return _best
+
+
+def original_json(line):
+    """ The original approach: decode the line to ASCII several times, then parse with json. """
+    _first_char = line.decode("ascii")[0]
+    if line.decode("ascii")[0] == "{":
+        return json.loads(line.decode("ascii"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--file", type=str, default=None, help="Recorded decoder output.")
+    parser.add_argument("--type", type=str, default="RS41", help="Sonde type. Default: RS41")
+    parser.add_argument("--lines", type=int, default=10000, help="Number of synthetic lines. Default: 10000")
+    parser.add_argument("--runs", type=int, default=5, help="Number of runs. Default: 5")
+    args = parser.parse_args()
+
+    if args.file:
+        _lines = load_lines(args.file)
+    else:
+        _lines = generate_lines(args.lines)
+
+    # Don't test the SDR.
+    autorx.decode.rtlsdr_test = lambda device_idx: True
+
+    _frames = []
+
+    def count_frame(telemetry):
+        _frames.append(telemetry["frame"])
+
+    _decoder = BenchDecoder(
+        sonde_type=args.type, sonde_freq=401.5e6, exporter=count_frame, timeout=0
+    )
+
+    _json_lines = [_line for _line in _lines if _line.startswith(b"{")]
+    _datetimes = [json.loads(_line)["datetime"] for _line in _json_lines]
+
+    print("JSON Backend: %s" % decoder_json_loads.__module__)
+
+    _old = time_function(original_json, _json_lines, args.runs)
+    _new = time_function(decoder_json_loads, _json_lines, args.runs)
+    print(
+        "JSON parsing: Original: %.2f us/line, New: %.2f us/line, Speedup: %.1fx"
+        % (1e6 * _old / len(_json_lines), 1e6 * _new / len(_json_lines), _old / _new)
+    )
+
+    _old = time_function(parse, _datetimes, args.runs)
+    _new = time_function(parse_decoder_datetime, _datetimes, args.runs)
+    _match = all([parse(_d) == parse_decoder_datetime(_d) for _d in _datetimes])
+    print(
+        "Date/Time parsing: dateutil: %.2f us/line, New: %.2f us/line, Speedup: %.1fx, Outputs Match: %s"
+        % (
+            1e6 * _old / len(_datetimes),
+            1e6 * _new / len(_datetimes),
+            _old / _new,
+            _match,
+        )
+    )
+
+    _total = time_function(_decoder.handle_decoder_line, _lines, args.runs)
+    print(
+        "handle_decoder_line: %.2f us/line (%d lines, %d frames passed to exporters)"
+        % (1e6 * _total / len(_lines), len(_lines), len(_frames) // args.runs)
+    )
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+#
+#   Benchmark the rtl_power log parser used by the sonde scanner.
+#
+#   Copyright (C) 2018  Mark Jessop <vk5qi@rfhead.net>
+#   Released under GNU GPL v3 or later
+#
+#   Generates synthetic rtl_power log files covering a range of scan widths, then times
+#   the original (np.loadtxt / np.append per line) parser against autorx.scan.read_rtl_power,
+#   and checks both produce the same output.
+#
+#   Run from this directory with:
+#   python bench_read_rtl_power.py
+#
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+from io import StringIO
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from autorx.scan import read_rtl_power
+
+
+# Scan ranges to test, as (name, start (MHz), stop (MHz))
+SCAN_RANGES = [
+    ("400-403 MHz", 400.05, 403.0),
+    ("400-406 MHz", 400.05, 406.0),
+    ("1676-1684 MHz", 1676.0, 1684.0),
+]
+
+# rtl_power hops in approximately 1 MHz steps with the default 20% crop.
+HOP_WIDTH = 1.0e6
+
+
+def read_rtl_power_original(filename):
+    """ The original read_rtl_power implementation, for comparison. """
+
+    freq = np.array([])
+    power = np.array([])
+    freq_step = 0
+
+    f = open(filename, "r")
+
+    for line in f:
+        fields = line.split(",")
+
+        start_freq = float(fields[2])
+        stop_freq = float(fields[3])
+        freq_step = float(fields[4])
+
+        samples = np.loadtxt(StringIO(",".join(fields[6:])), delimiter=",")
+        freq_range = np.linspace(start_freq, stop_freq, len(samples))
+
+        freq = np.append(freq, freq_range)
+        power = np.append(power, samples)
+
+    f.close()
+
+    power = np.nan_to_num(power)
+
+    return (freq, power, freq_step)
+
+
+def generate_log(filename, start, stop, step):
+    """ Write out a synthetic rtl_power log file covering start-stop (Hz), with a bin width of step (Hz). """
+
+    _bins = int(HOP_WIDTH / step)
+    _hop_start = start
+
+    with open(filename, "w") as f:
+        while _hop_start < stop:
+            _hop_stop = _hop_start + HOP_WIDTH
+            _samples = np.random.normal(-30.0, 3.0, _bins)
+            # rtl_power occasionally emits nan's.
+            _samples[np.random.randint(0, _bins)] = np.nan
+            f.write(
+                "2022-01-01, 00:00:00, %d, %d, %.2f, %d, %s\n"
+                % (
+                    _hop_start,
+                    _hop_stop,
+                    step,
+                    100,
+                    ", ".join(["%.2f" % _s for _s in _samples]),
+                )
+            )
+            _hop_start = _hop_stop
+
+
+def time_parser(parser, filename, runs):
+    """ Return the best-of-N runtime of a parser, in seconds, along with its output. """
+    _best = None
+    for _i in range(runs):
+        _start = time.time()
+        _result = parser(filename)
+        _runtime = time.time() - _start
+        if (_best is None) or (_runtime < _best):
+            _best = _runtime
+
+    return (_best, _result)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--step",
+        type=float,
+        default=800.0,
+        help="Search step (bin width) in Hz. Default: 800",
+    )
+    parser.add_argument(
+        "--runs", type=int, default=5, help="Number of runs per parser. Default: 5"
+    )
+    args = parser.parse_args()
+
+    _tempdir = tempfile.mkdtemp()
+
+    for (_name, _start, _stop) in SCAN_RANGES:
+        _filename = os.path.join(_tempdir, "log_power_bench.csv")
+        generate_log(_filename, _start * 1e6, _stop * 1e6, args.step)
+
+        (_old_time, _old) = time_parser(read_rtl_power_original, _filename, args.runs)
+        (_new_time, _new) = time_parser(read_rtl_power, _filename, args.runs)
+
+        # Check the outputs match. The new parser produces float32 power values.
+        _match = (
+            np.allclose(_old[0], _new[0])
+            and np.allclose(_old[1], _new[1], atol=0.01)
+            and (_old[2] == _new[2])
+        )
+
+        print(
+            "%s (%d bins): Original: %.1f ms, New: %.1f ms, Speedup: %.1fx, Outputs Match: %s"
+            % (
+                _name,
+                len(_new[0]),
+                _old_time * 1000,
+                _new_time * 1000,
+                _old_time / _new_time,
+                _match,
+            )
+        )
+
+        os.remove(_filename)
+
+    os.rmdir(_tempdir)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+#
+#   rtl_tcp compatible file replay server.
+#
+#   Copyright (C) 2018  Mark Jessop <vk5qi@rfhead.net>
+#   Released under GNU GPL v3 or later
+#
+#   Serves unsigned 8-bit IQ samples (as produced by rtl_sdr) from a file, in a loop, using the rtl_tcp protocol.
+#   Tuning commands are accepted but ignored, so this can be used in place of rtl_tcp when testing the SDR Server
+#   (set sdr_tcp_path in station.cfg to point to this script).
+#
+#   Usage:
+#   python rtl_tcp_replay.py --file capture_u8.bin [-a 127.0.0.1] [-p 1234] [-d 0] [-s 2048000]
+#
+import argparse
+import socket
+import struct
+import sys
+import time
+from threading import Thread
+
+
+def handle_commands(conn):
+    """ Read (and discard) commands from the client. """
+    try:
+        while True:
+            _cmd = conn.recv(5)
+            if len(_cmd) == 0:
+                break
+            if len(_cmd) == 5:
+                (_code, _param) = struct.unpack(">BI", _cmd)
+                sys.stderr.write("Command 0x%02x: %d\n" % (_code, _param))
+    except Exception:
+        pass
+
+
+def serve_client(conn, data, rate):
+    """ Send the file contents to a client at the sample rate, until it disconnects. """
+    # RTL0 header, with a tuner type of R820T (5) and 29 gain steps.
+    conn.sendall(b"RTL0" + struct.pack(">II", 5, 29))
+
+    Thread(target=handle_commands, args=(conn,), daemon=True).start()
+
+    # Send 10 ms blocks of samples (or 64 kB blocks if not rate limited).
+    _block = int(rate * 0.01) * 2 if rate > 0 else 65536
+    _index = 0
+    _next = time.time()
+    try:
+        while True:
+            _chunk = data[_index : _index + _block]
+            _index += _block
+            if len(_chunk) < _block:
+                _index = _block - len(_chunk)
+                _chunk += data[:_index]
+            conn.sendall(_chunk)
+
+            if rate > 0:
+                _next += 0.01
+                _delay = _next - time.time()
+                if _delay > 0:
+                    time.sleep(_delay)
+    except (BrokenPipeError, ConnectionResetError):
+        pass
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--file", type=str, required=True, help="Unsigned 8-bit IQ file to replay.")
+    parser.add_argument("-a", type=str, default="127.0.0.1", help="Listen address.")
+    parser.add_argument("-p", type=int, default=1234, help="Listen port.")
+    parser.add_argument("-d", type=str, default="0", help="Device index (ignored).")
+    parser.add_argument(
+        "-s",
+        type=int,
+        default=0,
+        help="Replay rate in samples/sec. Default: 0 (as fast as the client reads)",
+    )
+    args = parser.parse_args()
+
+    with open(args.file, "rb") as _f:
+        _data = _f.read()
+
+    if len(_data) < 2:
+        print("IQ file is empty!")
+        sys.exit(1)
+
+    _server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    _server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    _server.bind((args.a, args.p))
+    _server.listen(1)
+
+    # As with rtl_tcp, only handle one client at a time.
+    while True:
+        (_conn, _addr) = _server.accept()
+        serve_client(_conn, _data, args.s)
@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+#
+#   Skew-T Regression Test
+#
+#   Copyright (C) 2021  Mark Jessop <vk5qi@rfhead.net>
+#   Released under GNU GPL v3 or later
+#
+#   Compares the array-based log_files.calculate_skewt_data against the original (scalar, per-point)
+#   implementation, using synthetic flights covering the various edge cases, and optionally a set of
+#   real sonde log files.
+#
+#   Run from this directory with:
+#   python skewt_regression.py [log files...]
+#
+import argparse
+import os
+import sys
+import time
+import numpy as np
+from dateutil.parser import parse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import autorx.log_files
+from autorx.geometry import getDensity
+from autorx.utils import position_info
+
+
+# The original scalar implementation, used as the reference.
+def reference_skewt_data(
+    datetime,
+    latitude,
+    longitude,
+    altitude,
+    temperature,
+    humidity,
+    pressure=None,
+    decimation=5,
+):
+    """ Work through a set of sonde data, and produce a dataset suitable for plotting in skewt-js """
+
+    # A few basic checks initially
+
+    # Don't bother to plot data with not enough data points.
+    if len(datetime) < 10:
+        return []
+
+    # Figure out if we have any ascent data at all.
+    _burst_idx = np.argmax(altitude)
+
+    if _burst_idx == 0:
+        # We only have descent data.
+        return []
+
+    if altitude[0] > 20000:
+        # No point plotting SkewT plots for data only gathered above 10km altitude...
+        return []
+
+    _skewt = []
+
+    # Make sure we start on index one.
+    i = -1*decimation + 1
+
+    while i < _burst_idx:
+        i += decimation
+        try:
+            if temperature[i] < -260.0:
+                # If we don't have any valid temp data, just skip this point
+                # to avoid doing un-necessary calculations
+                continue
+
+            _time_delta = (parse(datetime[i]) - parse(datetime[i - 1])).total_seconds()
+            if _time_delta == 0:
+                continue
+
+            _old_pos = (latitude[i - 1], longitude[i - 1], altitude[i - 1])
+            _new_pos = (latitude[i], longitude[i], altitude[i])
+
+            _pos_delta = position_info(_old_pos, _new_pos)
+
+            _speed = _pos_delta["great_circle_distance"] / _time_delta
+            _bearing = (_pos_delta["bearing"] + 180.0) % 360.0
+
+            if pressure is None:
+                _pressure = getDensity(altitude[i], get_pressure=True) / 100.0
+            elif pressure[i] < 0.0:
+                _pressure = getDensity(altitude[i], get_pressure=True) / 100.0
+            else:
+                _pressure = pressure[i]
+
+            _temp = temperature[i]
+
+            if humidity[i] >= 0.0:
+                _rh = humidity[i]
+
+                _dp = (
+                    243.04
+                    * (np.log(_rh / 100) + ((17.625 * _temp) / (243.04 + _temp)))
+                    / (
+                        17.625
+                        - np.log(_rh / 100)
+                        - ((17.625 * _temp) / (243.04 + _temp))
+                    )
+                )
+            else:
+                _dp = -999.0
+
+            if np.isnan(_dp):
+                continue
+
+            _skewt.append(
+                {
+                    "press": _pressure,
+                    "hght": altitude[i],
+                    "temp": _temp,
+                    "dwpt": _dp,
+                    "wdir": _bearing,
+                    "wspd": _speed,
+                }
+            )
+
+            # Only produce data up to 50hPa (~20km alt), which is the top of the skewt plot.
+            # We *could* go above this, but the data becomes less useful at those altitudes.
+            if _pressure < 50.0:
+                break
+
+        except Exception as e:
+            pass
+
+        # Continue through the data..
+
+    return _skewt
+
+
+def generate_flight(
+    points=10800,
+    burst=6000,
+    start_alt=100.0,
+    pressure=True,
+    humidity_offset=0.0,
+    duplicate_times=False,
+    invalid_temps=False,
+    timestamp_format="%Y-%m-%dT%H:%M:%S.%fZ",
+):
+    """ Generate a synthetic flight, as a set of columns. """
+    _rng = np.random.default_rng(points + burst)
+    _t = np.arange(points, dtype=np.float64)
+    if duplicate_times:
+        # Repeat some timestamps, to exercise the zero time-delta check.
+        _t[::7] = _t[::7] - 1
+
+    _alt = np.where(_t < burst, start_alt + 5.0 * _t, start_alt + 5.0 * burst - 15.0 * (_t - burst))
+    _lat = -34.9 + np.cumsum(_rng.normal(0, 1e-4, points))
+    _lon = 138.5 + np.cumsum(_rng.normal(0, 1e-4, points))
+    _temp = 20.0 - 0.0065 * _alt
+    if invalid_temps:
+        _temp[::5] = -273.0
+    _humidity = np.clip(80.0 - 0.004 * _alt + humidity_offset, -1.0, 100.0)
+
+    _datetimes = np.array(
+        [
+            (np.datetime64("2021-06-01T11:00:00") + np.timedelta64(int(_s * 1e6), "us"))
+            .astype(object)
+            .strftime(timestamp_format)
+            for _s in _t
+        ]
+    )
+
+    if pressure:
+        _press = 1013.25 * np.exp(-_alt / 8000.0)
+        # Some sondes report a pressure of -1 when no pressure sensor is fitted.
+        _press[_alt > 15000] = -1.0
+    else:
+        _press = None
+
+    return (_datetimes, _lat, _lon, _alt, _temp, _humidity, _press)
+
+
+def compare(name, args, decimation):
+    """ Compare the outputs of the reference and new implementations. """
+    _start = time.perf_counter()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        _ref = reference_skewt_data(*args, decimation=decimation)
+    _ref_time = time.perf_counter() - _start
+
+    _start = time.perf_counter()
+    _new = autorx.log_files.calculate_skewt_data(*args, decimation=decimation)
+    _new_time = time.perf_counter() - _start
+
+    _ok = len(_ref) == len(_new)
+    _max_error = 0.0
+    if _ok:
+        for _a, _b in zip(_ref, _new):
+            if list(_a.keys()) != list(_b.keys()):
+                _ok = False
+                break
+            for _key in _a:
+                _error = abs(float(_a[_key]) - float(_b[_key]))
+                _max_error = max(_max_error, _error / max(1.0, abs(float(_a[_key]))))
+
+    # Allow for last-bit differences between the numpy and math module trig functions.
+    _ok = _ok and (_max_error < 1e-9)
+
+    print(
+        "%-40s %s  points: %4d/%4d  max rel. error: %.1e  reference: %7.1f ms  new: %6.2f ms"
+        % (
+            name,
+            "PASS" if _ok else "FAIL",
+            len(_ref),
+            len(_new),
+            _max_error,
+            _ref_time * 1e3,
+            _new_time * 1e3,
+        )
+    )
+    return _ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("logs", nargs="*", help="Sonde log files to test with.")
+    args = parser.parse_args()
+
+    _tests = {
+        "Full flight": generate_flight(),
+        "No pressure sensor": generate_flight(pressure=False),
+        "Dry (zero/negative humidity)": generate_flight(humidity_offset=-60.0),
+        "Duplicate timestamps": generate_flight(duplicate_times=True),
+        "Invalid temperatures": generate_flight(invalid_temps=True),
+        "Early burst": generate_flight(points=500, burst=137),
+        "Burst at end of data": generate_flight(points=3000, burst=5000),
+        "Descent only": generate_flight(points=500, burst=0),
+        "Starts above 20km": generate_flight(points=500, start_alt=21000.0),
+        "Too few points": generate_flight(points=9),
+        "Non-ISO timestamps": generate_flight(points=600, timestamp_format="%d %b %Y %H:%M:%S"),
+    }
+
+    for _log in args.logs:
+        (_data, _metadata) = autorx.log_files.read_log_columns(_log)
+        _tests[os.path.basename(_log)] = (
+            autorx.log_files.timestamps_to_log_datetimes(_data["timestamp"]),
+            _data["latitude"],
+            _data["longitude"],
+            _data["altitude"],
+            autorx.log_files.log_sensor_column(_data["temp"]),
+            autorx.log_files.log_sensor_column(_data["humidity"]),
+            autorx.log_files.log_sensor_column(_data["pressure"]) if "pressure" in _data else None,
+        )
+
+    _passed = True
+    for _name, _args in _tests.items():
+        for _decimation in [1, 5, 10, 25]:
+            _passed &= compare("%s (decimation %d)" % (_name, _decimation), _args, _decimation)
+
+    print("All tests passed." if _passed else "Some tests FAILED.")
+    sys.exit(0 if _passed else 1)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+#
+#   Coverage Map Test
+#
+#   Copyright (C) 2021  Mark Jessop <vk5qi@rfhead.net>
+#   Released under GNU GPL v3 or later
+#
+#   Logs a flight with the coverage map enabled, and checks that the flight is only counted once when the
+#   coverage map is then updated from the log directory (i.e. on the next start-up), for both CSV log
+#   files and telemetry journals.
+#
+#   Run from this directory with:
+#   python test_coverage.py
+#
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import autorx
+import autorx.config
+from autorx.coverage import CoverageMap
+from autorx.log_archive import list_log_paths, log_name
+from autorx.logger import TelemetryLogger
+
+
+def telemetry(serial, frame):
+    """ Produce a fake telemetry dictionary, for a sonde 20-60 km from the station. """
+    _time = datetime.datetime(2021, 1, 1) + datetime.timedelta(seconds=frame)
+    return {
+        "id": serial,
+        "type": "RS41",
+        "subtype": "RS41-SGP",
+        "frame": frame,
+        "datetime": _time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "datetime_dt": _time,
+        "lat": -34.7 + frame * 1e-2,
+        "lon": 138.6,
+        "alt": 1000.0 + frame * 500,
+        "vel_v": 5.0,
+        "vel_h": 1.0,
+        "heading": 0.0,
+        "temp": -10.0,
+        "humidity": 50.0,
+        "pressure": 1000.0,
+        "freq_float": 401.5,
+        "freq": "401.500 MHz",
+        "snr": 10.0 + frame,
+    }
+
+
+def run_test(journal):
+    _dir = tempfile.mkdtemp()
+    autorx.logging_path = _dir
+    autorx.config.global_config = {
+        "station_lat": -34.9,
+        "station_lon": 138.6,
+        "station_alt": 0.0,
+    }
+
+    _logger = None
+    try:
+        _logger = TelemetryLogger(log_directory=_dir, journal=journal, coverage_map=True)
+        _logger.FILE_ACTIVITY_TIMEOUT = 1
+
+        for _frame in range(20):
+            _logger.add(telemetry("S1000001", _frame))
+
+        # Wait for the telemetry to be written, and the log file to be closed.
+        _start = time.time()
+        while (_logger.input_queue.qsize() > 0) and (time.time() - _start) < 10:
+            time.sleep(0.1)
+        time.sleep(1)
+        while _logger.open_logs and (time.time() - _start) < 10:
+            time.sleep(0.1)
+
+        _logger.close()
+        _logger.log_process_thread.join()
+
+        _logs = list_log_paths(_dir)
+        assert len(_logs) == 1, "Expected 1 log file, found %s" % str(_logs)
+
+        _count = int(_logger.coverage.count.sum())
+        assert _count == 20, "Expected 20 observations from the received telemetry, found %d" % _count
+        assert _logger.coverage.logs == {log_name(_logs[0])}, "Unexpected logs %s" % str(
+            _logger.coverage.logs
+        )
+
+        # Updating the map from the log directory must not add the flight again.
+        assert _logger.coverage.update() == 0, "Log file added to the coverage map twice."
+        assert int(_logger.coverage.count.sum()) == _count, "Observations added twice."
+
+        # A map loaded from the saved file must not add the flight again either.
+        _map = CoverageMap(_dir)
+        assert _map.update() == 0, "Log file added to the saved coverage map twice."
+        assert int(_map.count.sum()) == _count, "Observations added twice to the saved map."
+
+        # A new map built from the log directory has the same observations.
+        os.unlink(_map.filename())
+        _map = CoverageMap(_dir)
+        assert _map.update() == 1, "Log file not added to a new coverage map."
+        assert int(_map.count.sum()) == _count, "Expected %d observations from the log file, found %d" % (
+            _count,
+            int(_map.count.sum()),
+        )
+
+        print("Journal mode: %s - OK" % journal)
+
+    finally:
+        if _logger is not None:
+            _logger.close()
+            _logger.log_process_thread.join()
+        shutil.rmtree(_dir)
+
+
+if __name__ == "__main__":
+    run_test(journal=False)
+    run_test(journal=True)
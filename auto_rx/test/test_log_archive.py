@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+#
+#   Log Archiver / Telemetry Logger Test
+#
+#   Copyright (C) 2021  Mark Jessop <vk5qi@rfhead.net>
+#   Released under GNU GPL v3 or later
+#
+#   Runs the log archiver while a TelemetryLogger is running, and checks that a sonde heard again after
+#   its log file was compressed and bundled is appended to its (restored) original log file, and that a
+#   sonde whose log file has disappeared gets a new log file, with a header.
+#
+#   Run from this directory with:
+#   python test_log_archive.py
+#
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import autorx
+import autorx.config
+from autorx.log_archive import LogArchiver, list_log_paths, open_log_file
+from autorx.logger import TelemetryLogger
+
+
+def telemetry(serial, frame):
+    """ Produce a fake telemetry dictionary """
+    _time = datetime.datetime(2021, 1, 1) + datetime.timedelta(seconds=frame)
+    return {
+        "id": serial,
+        "type": "RS41",
+        "subtype": "RS41-SGP",
+        "frame": frame,
+        "datetime": _time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "datetime_dt": _time,
+        "lat": -34.9 + frame * 1e-4,
+        "lon": 138.6,
+        "alt": 100.0 + frame * 5,
+        "vel_v": 5.0,
+        "vel_h": 1.0,
+        "heading": 0.0,
+        "temp": -10.0,
+        "humidity": 50.0,
+        "pressure": 1000.0,
+        "freq_float": 401.5,
+        "freq": "401.500 MHz",
+        "snr": 10.0,
+    }
+
+
+def wait_for_close(logger, timeout=10):
+    """ Wait for the logger to write out all queued telemetry, and close all of its open log files. """
+    _start = time.time()
+    while (logger.input_queue.qsize() > 0) and (time.time() - _start) < timeout:
+        time.sleep(0.1)
+    # Allow the last item to be written.
+    time.sleep(1)
+    while logger.open_logs and (time.time() - _start) < timeout:
+        time.sleep(0.1)
+    assert not logger.open_logs, "Logger did not close its log files."
+
+
+def read_lines(filename):
+    with open_log_file(filename) as _f:
+        return _f.read().splitlines()
+
+
+def run_test(journal):
+    _dir = tempfile.mkdtemp()
+    autorx.logging_path = _dir
+    autorx.config.global_config = {
+        "station_lat": -34.9,
+        "station_lon": 138.6,
+        "station_alt": 0.0,
+    }
+
+    _logger = None
+    try:
+        _logger = TelemetryLogger(log_directory=_dir, journal=journal)
+        _logger.FILE_ACTIVITY_TIMEOUT = 1
+
+        for _frame in range(10):
+            _logger.add(telemetry("S1000001", _frame))
+            _logger.add(telemetry("S1000002", _frame))
+        wait_for_close(_logger)
+
+        # Age the log files, and archive them while the logger is still running.
+        for _path in list_log_paths(_dir):
+            os.utime(_path, (time.time() - 40 * 86400,) * 2)
+
+        _archiver = LogArchiver(_dir, compress_days=30, compression="gzip", bundle_days=30)
+        assert _archiver.archive() == 2, "Expected both log files to be archived."
+        _archiver.close()
+
+        # Remove one of the archived logs entirely.
+        for _path in list_log_paths(_dir):
+            if "S1000002" in _path:
+                os.unlink(_path)
+
+        # Both sondes are heard again.
+        for _frame in range(10, 20):
+            _logger.add(telemetry("S1000001", _frame))
+            _logger.add(telemetry("S1000002", _frame))
+        wait_for_close(_logger)
+        _logger.close()
+        _logger.log_process_thread.join()
+
+        _logs = sorted(list_log_paths(_dir))
+        assert len(_logs) == 2, "Expected 2 log files, found %s" % str(_logs)
+
+        for _path in _logs:
+            _lines = read_lines(_path)
+            assert _lines[0] == TelemetryLogger.LOG_HEADER.strip(), "Missing header in %s" % _path
+            assert _lines.count(_lines[0]) == 1, "Repeated header in %s" % _path
+
+            if "S1000001" in _path:
+                # Restored into the log directory, with all the telemetry.
+                assert os.path.dirname(_path) == _dir, "Log not restored to the log directory."
+                assert len(_lines) == 21, "Expected 20 lines of telemetry, found %d" % (len(_lines) - 1)
+            else:
+                # New log file.
+                assert len(_lines) == 11, "Expected 10 lines of telemetry, found %d" % (len(_lines) - 1)
+
+        print("Journal mode: %s - OK" % journal)
+
+    finally:
+        if _logger is not None:
+            _logger.close()
+            _logger.log_process_thread.join()
+        shutil.rmtree(_dir)
+
+
+if __name__ == "__main__":
+    run_test(journal=False)
+    run_test(journal=True)
@@ -15,11 +15,15 @@ import datetime
 import traceback
 import argparse
 import glob
+import logging
 import os
 import fastkml
 from dateutil.parser import *
 from shapely.geometry import Point, LineString
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from autorx.batch import batch_process
+
 def read_telemetry_csv(filename,
     datetime_field = 0,
     latitude_field = 3,
@@ -244,18 +248,20 @@ if __name__ == "__main__":
     parser.add_argument('--clamp', action="store_false", default=True, help="Clamp tracks to ground instead of showing absolute altitudes.")
     parser.add_argument('--noextrude', action="store_false", default=True, help="Disable Extrusions for absolute flight paths.")
     parser.add_argument('--lastonly', action="store_true", default=False, help="Only plot last-seen sonde positions, not the flight paths.")
+    parser.add_argument('--workers', type=int, default=None, help="Number of log files to process in parallel. Default: Number of CPUs")
     args = parser.parse_args()
 
-    _file_list = glob.glob(args.input)
+    logging.basicConfig(format='%(asctime)s %(levelname)s:%(message)s', level=logging.INFO)
 
-    _placemarks = []
+    _file_list = sorted(glob.glob(args.input))
 
-    for _file in _file_list:
-        print("Processing: %s" % _file)
-        try:
-            _placemarks.append(convert_single_file(_file, absolute=args.clamp, tessellate=args.noextrude, last_only=args.lastonly))
-        except:
-            print("Failed to process: %s" % _file)
+    # Convert the log files in parallel. Files which fail to convert are logged and skipped.
+    _results = {}
+    for (_file, _placemark) in batch_process(convert_single_file, _file_list, args=(args.clamp, args.noextrude, args.lastonly), workers=args.workers):
+        _results[_file] = _placemark
+
+    # Keep the placemarks in file order, regardless of the order they were processed in.
+    _placemarks = [_results[_file] for _file in _file_list if _file in _results]
 
     write_kml(_placemarks, filename=args.output)
 
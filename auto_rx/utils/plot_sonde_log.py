@@ -57,6 +57,7 @@ import argparse
 import datetime
 import glob
 import json
+import logging
 import os.path
 import pytz
 import sys
@@ -72,6 +73,9 @@ import metpy.calc as mpcalc
 from metpy.plots import SkewT
 from metpy.units import units
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from autorx.batch import batch_process
+
 # Earthmaths code by Daniel Richman (thanks!)
 # Copyright 2012 (C) Daniel Richman; GNU GPL 3
 def position_info(listener, balloon):
@@ -345,97 +349,61 @@ def plot_metpy(data, title="", saveplot=None, showplot=True):
     if saveplot != None:
         fig.savefig(saveplot, bbox_inches='tight')
 
+    if not showplot:
+        # Free up the figure, as many plots may be generated by a single process.
+        plt.close(fig)
+
 
 
 #
-#   Status file handling.
+#   Directory processing.
+#   Log files are processed in parallel (refer autorx.batch), with progress tracked in a status file.
 #   The status file contains a JSON blob with one entry per filename that has been opened.
 #   Each entry contains if the flight is considered to be 'finished', which is when either
 #   the payload has started to descend, or no data has been received for ~10 min.
 #
 
-def read_status_file(filename):
-    # Check the file exists..
+def process_file(filename, output_dir, time_limit = 60):
+    """ Plot a single log file. Run in a worker process by process_directory. """
+    _basename = os.path.basename(filename)
 
-    if not os.path.isfile(filename):
-        # File does not exist, create a blank one.
-        write_status_file(filename, {})
+    # Read in the file!
+    (data, burst, startalt,  last_time, snr, ferror) = read_log_file(filename, decimation=10)
 
+    # Don't process files with a starting altitude well above ground.
+    # This indicates it's likely a sonde from a long way away.
+    if startalt > 2000:
+        print("Not processing %s." % _basename)
+        return {'complete': True}
 
-    # Now open and read the file.
-    try:
-        _f = open(filename,'r')
-        data = json.loads(_f.read())
-        _f.close()
-        return data
-    except Exception as e:
-        print("Error reading status file - %s" % str(e))
-        return None
+    # Calculate the age of the last data point in minutes.
+    _data_age = (pytz.utc.localize(datetime.datetime.utcnow()) - parse(last_time)).total_seconds() / 60.0
 
+    # We consider this file to be finished if the sonde has burst, or we haven't heard it for a while.
+    _complete = burst or (_data_age > time_limit)
 
-def write_status_file(filename, data):
-    _f = open(filename, 'w')
-    _f.write(json.dumps(data))
-    _f.close()
+    # Plot the data, and save to disk.
+    _out_file = os.path.join(output_dir, _basename[:-4]+".png")
+    _file_timestamp = _basename.split('_')[0]
+    _sonde_serial = _basename.split('_')[1]
+    _title = _file_timestamp + " " + _sonde_serial
 
+    print("Generating plot for: %s" % _basename)
+    plot_metpy(data, title=_title, saveplot=_out_file, showplot=False)
 
+    return {'complete': _complete}
 
-def process_directory(log_dir, output_dir, status_file, time_limit = 60):
 
-    # Load the status file.
-    _log_status = read_status_file(status_file)
-    if _log_status is None:
-        return
+def process_directory(log_dir, output_dir, status_file, time_limit = 60, workers = None):
+    """ Plot all log files in a directory, using a pool of worker processes. """
 
     # Get a list of log files in the directory.
     _files = glob.glob(os.path.join(log_dir, "*_sonde.log"))
 
-    for _file in _files:
-        _basename = os.path.basename(_file)
-        # Check if we have touched this file before.
-        if _basename in _log_status:
-            if _log_status[_basename]['complete']:
-                print("Already finished processing %s" % _basename)
-                continue
-            else:
-                # This file needs to be re-processed
-                pass
-        else:
-            # Add an entry for this file.
-            _log_status[_basename] = {'complete': False}
-
-        # Read in the file!
-        try:
-            (data, burst, startalt,  last_time, snr, ferror) = read_log_file(_file, decimation=10)
-
-            # Don't process files with a starting altitude well above ground.
-            # This indicates it's likely a sonde from a long way away.
-            if startalt > 2000:
-                _log_status[_basename]['complete'] = True
-                print("Not processing %s." % _basename)
-                continue
-
-
-            # Calculate the age of the last data point in minutes.
-            _data_age = (pytz.utc.localize(datetime.datetime.utcnow()) - parse(last_time)).total_seconds() / 60.0
-            if burst or (_data_age > time_limit):
-                # We consider this file to be finished.
-                _log_status[_basename]['complete'] = True
-
-            # Plot the data, and save to disk.
-            _out_file = os.path.join(output_dir, _basename[:-4]+".png")
-            _file_timestamp = _basename.split('_')[0]
-            _sonde_serial = _basename.split('_')[1]
-            _title = _file_timestamp + " " + _sonde_serial
-
-            print("Generating plot for: %s" % _basename)
-            plot_metpy(data, title=_title, saveplot=_out_file, showplot=False)
-        except Exception as e:
-            traceback.print_exc()
-            print("Error processing file %s - %s" % (_basename, str(e)))
-
-    # Write out the status file
-    write_status_file(status_file, _log_status)
+    # Files already marked as complete in the status file are skipped, and the status file
+    # is updated as files are processed.
+    for (_file, _result) in batch_process(process_file, _files, args=(output_dir, time_limit), workers=workers, status_file=status_file):
+        pass
 
 
 if __name__ == "__main__":
@@ -452,6 +420,7 @@ if __name__ == "__main__":
     parser.add_argument("--log-dir", default="../log/", type=str, help="Directory containing sonde logs to process.")
     parser.add_argument("--output-dir", default="./plots/", type=str, help="Output directory to save plots to.")
     parser.add_argument("--plot-status-file", default="plot_status.txt", type=str, help="Plotting status file.")
+    parser.add_argument("--workers", default=None, type=int, help="Number of worker processes to use when processing a directory. (Default = one per CPU)")
     parser.add_argument("--snr", default=False, action='store_true', help="Plot SNR vs time.")
     parser.add_argument("--ferror", default=False, action='store_true', help="Plot Frequency Error vs time.")
     args = parser.parse_args()
@@ -486,7 +455,8 @@ if __name__ == "__main__":
 
     else:
         # do a batch process run.
-        process_directory(args.log_dir, args.output_dir, args.plot_status_file)
+        logging.basicConfig(format="%(asctime)s %(levelname)s:%(message)s", level=logging.INFO)
+        process_directory(args.log_dir, args.output_dir, args.plot_status_file, workers=args.workers)
 
 
 